@@ -0,0 +1,265 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import fast_path
+from nodes import fetch_data
+from utils.config import pinned_config
+from utils.helpers import BOResultCache, get_result_cache, set_result_cache
+from utils.instrumentation import write_report
+from utils.metrics_cache import MetricsCache
+from utils.results_sink import COLUMNAR_SUFFIXES, results_sink
+from utils.snapshots import COMPRESSIONS, SegmentSnapshotWriter
+
+logger = logging.getLogger("batch-runner")
+
+DEFAULT_MAX_CONCURRENCY = 16
+CHUNK_SIZE = 1000  # agents handed to app.batch at a time (bounds in-flight state)
+
+
+class AgentOutcome(NamedTuple):
+    agent_id: str
+    thread_id: str
+    ok: bool
+    final_priority_order: Optional[List[str]]
+    bo_results: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+
+class BatchReport(NamedTuple):
+    date: str
+    outcomes: List[AgentOutcome]
+    elapsed: float
+
+    @property
+    def failed(self) -> List[AgentOutcome]:
+        return [o for o in self.outcomes if not o.ok]
+
+    def summary(self) -> Dict[str, Any]:
+        n = len(self.outcomes)
+        return {
+            "date": self.date,
+            "agents": n,
+            "succeeded": n - len(self.failed),
+            "failed": len(self.failed),
+            "elapsed_s": round(self.elapsed, 3),
+            "agents_per_s": round(n / self.elapsed, 1) if self.elapsed else None,
+        }
+
+
+def thread_id_for(agent_id: str, date: str) -> str:
+    """One checkpoint thread per (date, agent), so reruns land on the same thread."""
+    return f"{date}:{agent_id}"
+
+
+def _initial_state(agent_id: str, date: str, config_version: str = None) -> Dict[str, Any]:
+    state = {"agent_id": agent_id, "date": date, "raw_metrics": {}, "bo_results": {}, "final_priority_order": []}
+    if config_version:
+        state["config_version"] = config_version
+    return state
+
+
+def _outcome(agent_id: str, date: str, result: Any) -> AgentOutcome:
+    thread_id = thread_id_for(agent_id, date)
+    if isinstance(result, Exception):
+        return AgentOutcome(agent_id, thread_id, False, None, None, f"{type(result).__name__}: {result}")
+    return AgentOutcome(agent_id, thread_id, True, result.get("final_priority_order"), result.get("bo_results"), None)
+
+
+def _record(sink, outcomes: List[AgentOutcome], new: List[AgentOutcome], date: str) -> None:
+    outcomes.extend(new)
+    if sink is not None:
+        for o in new:
+            sink.add_outcome(o, date)
+
+
+def _chunks(items: Sequence[str], size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _prepare(date: str, agent_ids: Optional[Sequence[str]], columnar: bool):
+    # One shared snapshot serves every agent's fetch node
+    snapshot = fetch_data.prefetch(date, columnar=columnar)
+    agents = [str(a) for a in agent_ids] if agent_ids is not None else snapshot.agent_ids()
+    logger.info("Scoring %d agents for %s", len(agents), date)
+    return agents
+
+
+def _configs(agents: Sequence[str], date: str, max_concurrency: int, durability: Optional[str] = None):
+    extra = {"durability": durability} if durability else {}
+    return [{"configurable": {"thread_id": thread_id_for(a, date), **extra}, "max_concurrency": max_concurrency}
+            for a in agents]
+
+
+def _flush(app):
+    # Buffered checkpointers (utils.checkpointing) write their batch now
+    flush = getattr(app.checkpointer, "flush", None)
+    if flush is not None:
+        flush()
+
+
+async def _aflush(app):
+    aflush = getattr(app.checkpointer, "aflush", None)
+    if aflush is not None:
+        await aflush()
+
+
+async def _aclose(app):
+    # A pooled Postgres checkpointer keeps one async pool per event loop; release this loop's
+    aclose = getattr(app.checkpointer, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+def _fast_batch(app, states, configs) -> List[Any]:
+    results = []
+    for state, config in zip(states, configs):
+        try:
+            results.append(fast_path.invoke(state, config, app=app))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+async def _afast_batch(app, states, configs, max_concurrency: int) -> List[Any]:
+    sem = asyncio.Semaphore(max_concurrency)
+
+    async def one(state, config):
+        async with sem:
+            return await fast_path.ainvoke(state, config, app=app)
+
+    return await asyncio.gather(*(one(s, c) for s, c in zip(states, configs)), return_exceptions=True)
+
+
+def run_batch(date: str, agent_ids: Sequence[str] = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+              columnar: bool = True, app=None, fast: bool = False, durability: str = None,
+              sink=None) -> BatchReport:
+    """Run the compiled graph for many agents (all agents in the date's
+    snapshot when `agent_ids` is None) with bounded concurrency. A failing
+    agent is recorded in the report and does not abort the batch.
+
+    With `fast=True` each agent goes through the in-process fast path
+    (fast_path.invoke: same nodes and results, one checkpoint per agent)
+    instead of LangGraph. `durability` ("full", "batched" or "final")
+    overrides the checkpoint durability for these runs when the app uses
+    a BufferedCheckpointSaver; buffered checkpoints are flushed per chunk.
+
+    Each agent's summary is added to `sink` (utils.results_sink.ResultsSink)
+    if given; the caller closes it to write the last batch."""
+    if app is None:
+        from main import get_app
+        app = get_app()
+    start = time.perf_counter()
+    agents = _prepare(date, agent_ids, columnar)
+    outcomes = []
+    # One config snapshot for the whole batch, however often the file is reloaded meanwhile
+    with pinned_config() as config_version:
+        try:
+            for chunk in _chunks(agents, CHUNK_SIZE):
+                states = [_initial_state(a, date, config_version) for a in chunk]
+                configs = _configs(chunk, date, max_concurrency, durability)
+                if fast:
+                    results = _fast_batch(app, states, configs)
+                else:
+                    results = app.batch(states, configs, return_exceptions=True)
+                _flush(app)
+                _record(sink, outcomes, [_outcome(a, date, r) for a, r in zip(chunk, results)], date)
+                logger.info("Scored %d/%d agents", len(outcomes), len(agents))
+        finally:
+            fetch_data.release(date)
+    return BatchReport(date, outcomes, time.perf_counter() - start)
+
+
+async def arun_batch(date: str, agent_ids: Sequence[str] = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                     columnar: bool = True, app=None, fast: bool = False, durability: str = None,
+                     sink=None) -> BatchReport:
+    """Async `run_batch` using `app.abatch` (single event loop, async fetch node)."""
+    if app is None:
+        from main import get_app
+        app = get_app()
+    start = time.perf_counter()
+    await fetch_data.aprefetch(date, columnar=columnar)
+    agents = _prepare(date, agent_ids, columnar)
+    outcomes = []
+    # One config snapshot for the whole batch, however often the file is reloaded meanwhile
+    with pinned_config() as config_version:
+        try:
+            for chunk in _chunks(agents, CHUNK_SIZE):
+                states = [_initial_state(a, date, config_version) for a in chunk]
+                configs = _configs(chunk, date, max_concurrency, durability)
+                if fast:
+                    results = await _afast_batch(app, states, configs, max_concurrency)
+                else:
+                    results = await app.abatch(states, configs, return_exceptions=True)
+                await _aflush(app)
+                _record(sink, outcomes, [_outcome(a, date, r) for a, r in zip(chunk, results)], date)
+                logger.info("Scored %d/%d agents", len(outcomes), len(agents))
+        finally:
+            fetch_data.release(date)
+            await _aclose(app)
+    return BatchReport(date, outcomes, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="Score many agents for one date through the LangGraph workflow")
+    p.add_argument("--date", required=True, help="workflow date (YYYY-MM-DD)")
+    p.add_argument("--agents", default=None, help="comma-separated agent ids (default: every agent in the snapshot)")
+    p.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENCY, help="graph runs in flight at once")
+    p.add_argument("--async", dest="use_async", action="store_true", help="use app.abatch and the async fetch node")
+    p.add_argument("--fast", action="store_true", help="use the in-process fast path instead of LangGraph")
+    p.add_argument("--durability", choices=("full", "batched", "final"), default=None,
+                   help="checkpoint durability for this run (default: CHECKPOINT_DURABILITY, else full)")
+    p.add_argument("--row-snapshot", action="store_true", help="keep row dicts instead of the columnar snapshot")
+    p.add_argument("--cache-dir", default=None, help="on-disk metrics cache directory")
+    p.add_argument("--offline", action="store_true", help="serve metrics from the cache only")
+    p.add_argument("--report", default=None, help="optional path to write the per-agent JSON report")
+    p.add_argument("--results-db", action="store_true",
+                   help="upsert each agent's summary into workflow_runs (POSTGRES_* settings) in bulk")
+    p.add_argument("--results-file", default=None,
+                   help=f"optional columnar results file ({', '.join(COLUMNAR_SUFFIXES)}; needs pyarrow)")
+    p.add_argument("--timings-out", default=None,
+                   help="optional path for per-node timings and counters (*.prom: Prometheus text, else JSON)")
+    p.add_argument("--snapshots", default=None,
+                   help="optional snapshot segment (.seg) to append each agent's result to, keyed by thread id")
+    p.add_argument("--compress", choices=[c for c in COMPRESSIONS if c], default=None,
+                   help="compress records when creating a new --snapshots segment")
+    args = p.parse_args()
+
+    # Agents with identical inputs share BO results for the rest of this run
+    set_result_cache(BOResultCache())
+    if args.cache_dir or args.offline:
+        fetch_data.set_cache(MetricsCache(args.cache_dir, offline=args.offline))
+        fetch_data.warm_from_cache([args.date], columnar=not args.row_snapshot)
+    agents = args.agents.split(",") if args.agents else None
+    run = arun_batch if args.use_async else run_batch
+    with results_sink(args.results_db, args.results_file) or contextlib.nullcontext() as sink:
+        report = run(args.date, agents, args.max_concurrency, columnar=not args.row_snapshot, fast=args.fast,
+                     durability=args.durability, sink=sink)
+        if args.use_async:
+            report = asyncio.run(report)
+
+    logger.info("Batch summary: %s", report.summary())
+    if get_result_cache() is not None:
+        logger.info("BO result cache: %s", get_result_cache().stats())
+    for o in report.failed:
+        logger.warning("Agent %s failed: %s", o.agent_id, o.error)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump({"summary": report.summary(), "agents": [o._asdict() for o in report.outcomes]}, fh, indent=2)
+        logger.info("Wrote batch report to %s", args.report)
+    if args.timings_out:
+        write_report(args.timings_out)
+        logger.info("Wrote timings to %s", args.timings_out)
+    if args.snapshots:
+        with SegmentSnapshotWriter(args.snapshots, compression=args.compress) as writer:
+            for o in report.outcomes:
+                if o.ok:
+                    writer.write(o.thread_id, {"agent_id": o.agent_id, "date": report.date, "bo_results": o.bo_results,
+                                               "final_priority_order": o.final_priority_order})
+        logger.info("Appended %d snapshots to %s", writer.records, args.snapshots)
@@ -0,0 +1,371 @@
+"""Throughput benchmark for every scoring path over synthetic fleets.
+
+For each fleet size a synthetic fleet (synthetic_fleet.py) is served by a
+local sebo API stub, and each path runs in a fresh subprocess. That keeps
+peak RSS per case, with no state carried between cases. Every case
+prefetches the date's snapshot through the stub and then scores every agent:
+
+    graph            batch_runner.run_batch: LangGraph app from main.py
+    graph_async      batch_runner.arun_batch: app.abatch
+    fast             batch_runner.run_batch(fast=True): fast_path, one checkpoint per agent
+    sharded          sharded_runner.run_sharded: process pool, no LangGraph
+    mock             run_workflow_mock.run_mock per agent
+    mock_parallel    mock_parallel_runner.run_parallel_mock per agent
+    calculate_scores nodes.calculate_scores + prioritize per agent
+    batch_scores     nodes.batch_scores vectorized scoring + prioritize
+
+Each case reports agents/sec, peak RSS, a per-stage breakdown (prefetch,
+scoring, and per-node totals and p50/p95 from utils.instrumentation), and a
+digest of every agent's results. The digests of all paths should agree.
+
+Two baselines, and a regression in either makes the exit status 1:
+
+* `--baseline`: results digests per case. They depend only on the fleet
+  seed and the scoring code, so benchmark_baseline.json is committed and
+  gates every run.
+* `--perf-baseline`: agents/sec and peak RSS per case. These only mean
+  something on the machine that recorded them, so each machine or CI
+  runner keeps its own file outside the repo. Throughput or peak RSS
+  worse than `--tolerance` is a regression; a file recorded on another
+  machine is skipped with a warning.
+
+`--update-baseline` writes this run into whichever of the two are given.
+
+    python benchmark.py --sizes 1000,10000 --baseline benchmark_baseline.json
+    python benchmark.py --sizes 1000,10000 --perf-baseline ~/.cache/sebo/perf.json --update-baseline
+    python benchmark.py --sizes 100000 --paths fast,sharded,batch_scores
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("benchmark")
+
+PATHS = ("graph", "graph_async", "fast", "sharded", "mock", "mock_parallel", "calculate_scores", "batch_scores")
+DEFAULT_SIZES = (1000,)
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_SEED = 0
+
+
+# -- one case, in its own process ---------------------------------------------
+
+def _peak_rss_mb(who: str = "self") -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rusage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return round(rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _exact(value: Any) -> Any:
+    # float.hex keeps every bit and reads the same for Python and numpy floats
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    try:
+        return float(value).hex()
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def results_digest(results: Dict[str, Any]) -> str:
+    """Fingerprint of each agent's final_priority_order and bo_results (exact values)."""
+    from utils.helpers import fingerprint
+
+    return fingerprint({agent: [list(order or []), {bo: {k: _exact(v) for k, v in r.items()} for bo, r in (bo or {}).items()}]
+                        for agent, (order, bo) in results.items()})
+
+
+def _score_in_process(path: str, date: str, snapshot, agents: List[str]) -> Dict[str, Any]:
+    from nodes.resolve_priority import prioritize
+
+    results = {}
+    states = [{"agent_id": a, "date": date, "raw_metrics": snapshot.raw_metrics_for(a), "bo_results": {},
+               "final_priority_order": []} for a in agents]
+    if path == "calculate_scores":
+        from nodes.calculate_scores import calculate_scores
+
+        for state in states:
+            state = prioritize(calculate_scores(state))
+            results[state["agent_id"]] = (state["final_priority_order"], state["bo_results"])
+    elif path == "batch_scores":
+        from nodes.batch_scores import metrics_to_columns, score_batch, to_bo_results
+
+        scores = score_batch(metrics_to_columns([s["raw_metrics"] for s in states]))
+        for i, state in enumerate(states):
+            state = prioritize({**state, "bo_results": to_bo_results(scores, i)})
+            results[state["agent_id"]] = (state["final_priority_order"], state["bo_results"])
+    elif path == "mock":
+        from run_workflow_mock import run_mock
+
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            for state in states:
+                state = run_mock(replay=state)
+                results[state["agent_id"]] = (state["final_priority_order"], state["bo_results"])
+    elif path == "mock_parallel":
+        from mock_parallel_runner import run_parallel_mock
+        from utils.snapshots import SegmentSnapshotWriter, SegmentReader, set_snapshot_writer
+
+        # the runner persists each final state; collect them from a scratch segment
+        with tempfile.TemporaryDirectory() as tmp:
+            seg = os.path.join(tmp, "states.seg")
+            with SegmentSnapshotWriter(seg) as writer:
+                set_snapshot_writer(writer)
+                try:
+                    for state in states:
+                        run_parallel_mock(state["agent_id"], replay=state)
+                finally:
+                    set_snapshot_writer(None)
+            for agent, state in SegmentReader(seg):
+                results[agent] = (state["final_priority_order"], state["bo_results"])
+    return results
+
+
+# Paths whose runner CLIs memoize BO results (see batch_runner and sharded_runner)
+MEMO_PATHS = ("graph", "graph_async", "fast", "sharded")
+
+
+@contextlib.contextmanager
+def _result_cache_for(path: str):
+    # A fresh memo per path, as its runner would have: no results carried over from another path
+    from utils.helpers import BOResultCache, get_result_cache, set_result_cache
+
+    previous = get_result_cache()
+    set_result_cache(BOResultCache() if path in MEMO_PATHS else None)
+    try:
+        yield
+    finally:
+        set_result_cache(previous)
+
+
+def score_path(path: str, date: str, snapshot, agents: List[str], workers: Optional[int] = None) -> Dict[str, Any]:
+    """Score `agents` for `date` through `path`: agent id -> (final_priority_order, bo_results).
+
+    `snapshot` must be the date's prefetched snapshot; in-process paths take
+    each agent's raw_metrics from it, so every path scores the same inputs.
+    Each call starts with its own BO result memo (or none), so a path is
+    never served results another path computed.
+    """
+    with _result_cache_for(path):
+        return _score_path(path, date, snapshot, agents, workers)
+
+
+def _score_path(path: str, date: str, snapshot, agents: List[str], workers: Optional[int]) -> Dict[str, Any]:
+    if path not in ("graph", "graph_async", "fast", "sharded"):
+        return _score_in_process(path, date, snapshot, agents)
+    if path == "sharded":
+        import sharded_runner
+
+        outcomes = sharded_runner.run_sharded(date, agents, workers=workers).outcomes
+    else:
+        import batch_runner
+
+        if path == "graph_async":
+            outcomes = asyncio.run(batch_runner.arun_batch(date, agents)).outcomes
+        else:
+            outcomes = batch_runner.run_batch(date, agents, fast=path == "fast").outcomes
+    failed = [o for o in outcomes if not o.ok]
+    if failed:
+        raise RuntimeError(f"{path}: {len(failed)} agents failed, e.g. {failed[0].agent_id}: {failed[0].error}")
+    return {o.agent_id: (o.final_priority_order, o.bo_results) for o in outcomes}
+
+
+def run_case(path: str, base_url: str, date: str, workers: Optional[int] = None) -> Dict[str, Any]:
+    """Prefetch `date` from `base_url`, score every agent through `path`, and measure it."""
+    from nodes import fetch_data
+    from utils.instrumentation import get_registry
+
+    fetch_data.BASE_URL = base_url
+    logging.getLogger().setLevel(logging.WARNING)  # the runners log per agent/chunk at INFO
+    registry = get_registry()
+    registry.reset()
+
+    start = time.perf_counter()
+    snapshot = fetch_data.prefetch(date, columnar=True)
+    prefetched = time.perf_counter()
+    agents = snapshot.agent_ids()
+
+    results = score_path(path, date, snapshot, agents, workers)
+    end = time.perf_counter()
+
+    timings = registry.report()
+    return {
+        "path": path,
+        "agents": len(results),
+        "elapsed_s": round(end - start, 3),
+        "agents_per_s": round(len(results) / (end - prefetched), 1),
+        "peak_rss_mb": _peak_rss_mb(),
+        "children_peak_rss_mb": _peak_rss_mb("children") if path == "sharded" else None,
+        "stages": {
+            "prefetch_s": round(prefetched - start, 3),
+            "score_s": round(end - prefetched, 3),
+            "nodes": {node: {k: t[k] for k in ("total_s", "p50_ms", "p95_ms")} for node, t in timings["nodes"].items()},
+        },
+        "http_bytes": timings["counters"].get("http_bytes", 0),
+        "digest": results_digest(results),
+    }
+
+
+# -- the harness ----------------------------------------------------------------
+
+def _spawn_case(path: str, base_url: str, date: str, workers: Optional[int]) -> Dict[str, Any]:
+    cmd = [sys.executable, os.path.abspath(__file__), "--case", path, "--base-url", base_url, "--date", date]
+    if workers:
+        cmd += ["--workers", str(workers)]
+    env = {**os.environ, "LANGCHAIN_TRACING_V2": "false"}  # keep benchmark runs out of LangSmith
+    proc = subprocess.run(cmd, capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        raise RuntimeError(f"{path} case failed:\n{proc.stderr[-4000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, paths=PATHS, seed: int = DEFAULT_SEED, workers: Optional[int] = None) -> Dict[str, Any]:
+    from synthetic_fleet import generate_fleet, serve
+
+    cases = {}
+    for n in sizes:
+        fleet = generate_fleet(n, seed)
+        server, base_url = serve(fleet)
+        try:
+            for path in paths:
+                logger.info("Running %s on %d agents", path, n)
+                case = _spawn_case(path, base_url, fleet.date, workers)
+                logger.info("  %s/%d: %.1f agents/s, peak RSS %s MB", path, n, case["agents_per_s"], case["peak_rss_mb"])
+                cases[f"{path}/{n}"] = case
+        finally:
+            server.shutdown()
+        digests = {c["digest"] for key, c in cases.items() if key.endswith(f"/{n}")}
+        if len(digests) > 1:
+            logger.warning("Paths disagree on the results for %d agents (see equivalence_check.py)", n)
+    return {
+        "meta": {"seed": seed, "python": platform.python_version(), "platform": platform.platform(),
+                 "cpu_count": os.cpu_count(), "machine": platform.node()},
+        "cases": cases,
+    }
+
+
+def compare(run: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = DEFAULT_TOLERANCE,
+            perf_baseline: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Regressions of `run`: results that differ from `baseline`'s digests,
+    and, only against a `perf_baseline` from this machine, lower throughput
+    or higher peak RSS."""
+    regressions = []
+    for key, case in run["cases"].items():
+        base = baseline.get("cases", {}).get(key)
+        if base is not None and base.get("digest") and case["digest"] != base["digest"]:
+            regressions.append(f"{key}: results changed (digest {case['digest']} vs baseline {base['digest']})")
+        perf = (perf_baseline or {}).get("cases", {}).get(key)
+        if perf is None:
+            continue
+        if perf.get("agents_per_s") and case["agents_per_s"] < perf["agents_per_s"] * (1 - tolerance):
+            regressions.append(f"{key}: {case['agents_per_s']} agents/s vs baseline {perf['agents_per_s']}")
+        if case.get("peak_rss_mb") and perf.get("peak_rss_mb") and case["peak_rss_mb"] > perf["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak RSS {case['peak_rss_mb']} MB vs baseline {perf['peak_rss_mb']} MB")
+    return regressions
+
+
+def same_machine(meta: Dict[str, Any], other: Optional[Dict[str, Any]]) -> bool:
+    """Whether two runs' meta describe the same machine and interpreter."""
+    keys = ("machine", "platform", "cpu_count", "python")
+    return other is not None and all(meta.get(k) == other.get(k) for k in keys)
+
+
+def _load(path: str, default: Dict[str, Any]) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _save(path: str, baseline: Dict[str, Any]) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(baseline, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    logger.info("Updated baseline %s", path)
+
+
+def _table(run: Dict[str, Any]) -> str:
+    lines = [f"{'case':<24}{'agents/s':>12}{'peak MB':>10}{'prefetch s':>12}{'score s':>10}  slowest nodes (total s)"]
+    for key, c in run["cases"].items():
+        nodes = sorted(c["stages"]["nodes"].items(), key=lambda kv: -kv[1]["total_s"])[:3]
+        slowest = ", ".join(f"{name} {t['total_s']:.3f}" for name, t in nodes)
+        lines.append(f"{key:<24}{c['agents_per_s']:>12.1f}{c['peak_rss_mb'] or 0:>10.1f}"
+                     f"{c['stages']['prefetch_s']:>12.3f}{c['stages']['score_s']:>10.3f}  {slowest}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="Benchmark every scoring path on synthetic fleets")
+    p.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated fleet sizes")
+    p.add_argument("--paths", default=",".join(PATHS), help=f"comma-separated subset of {', '.join(PATHS)}")
+    p.add_argument("--seed", type=int, default=DEFAULT_SEED, help="fleet generator seed")
+    p.add_argument("--workers", type=int, default=None, help="sharded path worker processes (default: CPU count)")
+    p.add_argument("--out", default=None, help="optional path to write the full results as JSON")
+    p.add_argument("--baseline", default=None, help="results digest baseline JSON (committed) to compare against")
+    p.add_argument("--perf-baseline", default=None,
+                   help="this machine's throughput / peak RSS baseline JSON (kept outside the repo)")
+    p.add_argument("--update-baseline", action="store_true",
+                   help="merge this run's cases into --baseline and/or --perf-baseline instead of comparing")
+    p.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                   help="allowed fractional throughput drop / peak RSS growth vs --perf-baseline")
+    # internal: run one case in this process (used by the harness)
+    p.add_argument("--case", choices=PATHS, help=argparse.SUPPRESS)
+    p.add_argument("--base-url", help=argparse.SUPPRESS)
+    p.add_argument("--date", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.base_url, args.date, args.workers)))
+        sys.exit(0)
+
+    unknown = set(args.paths.split(",")) - set(PATHS)
+    if unknown:
+        p.error(f"unknown paths: {', '.join(sorted(unknown))}")
+    run = run_benchmark([int(n) for n in args.sizes.split(",")], args.paths.split(","), args.seed, args.workers)
+    print(_table(run))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(run, fh, indent=2)
+        logger.info("Wrote benchmark results to %s", args.out)
+
+    if args.update_baseline:
+        if args.baseline:
+            baseline = _load(args.baseline, {"cases": {}})
+            baseline["meta"] = {"seed": run["meta"]["seed"]}
+            baseline["cases"].update({key: {"digest": c["digest"]} for key, c in run["cases"].items()})
+            _save(args.baseline, baseline)
+        if args.perf_baseline:
+            perf = _load(args.perf_baseline, {"cases": {}})
+            if not same_machine(run["meta"], perf.get("meta")):
+                perf = {"cases": {}}  # numbers from another machine are not comparable; start over
+            perf["meta"] = run["meta"]
+            perf["cases"].update(run["cases"])
+            _save(args.perf_baseline, perf)
+    elif args.baseline or args.perf_baseline:
+        baseline = _load(args.baseline, {"cases": {}}) if args.baseline else {"cases": {}}
+        if baseline.get("meta", {}).get("seed", run["meta"]["seed"]) != run["meta"]["seed"]:
+            logger.warning("Baseline %s was recorded with seed %s; digests not compared",
+                           args.baseline, baseline["meta"]["seed"])
+            baseline = {"cases": {}}
+        perf = _load(args.perf_baseline, None) if args.perf_baseline else None
+        if perf is not None and not same_machine(run["meta"], perf.get("meta")):
+            logger.warning("Perf baseline %s was recorded on another machine (%s); throughput not compared",
+                           args.perf_baseline, perf.get("meta"))
+            perf = None
+        regressions = compare(run, baseline, args.tolerance, perf)
+        for r in regressions:
+            logger.error("REGRESSION %s", r)
+        if regressions:
+            sys.exit(1)
+        logger.info("No regressions against %s", " and ".join(filter(None, (args.baseline, args.perf_baseline))))
@@ -0,0 +1,106 @@
+"""Apply the numbered SQL files in database/migrations/ in order.
+
+Applied versions are recorded in `schema_migrations`. A database created
+from the 1.0 schema.sql (a `checkpoints` table but no schema_migrations) is
+treated as being at 001. A fresh install from the current schema.sql
+records every version it contains, so this is a no-op there.
+
+    python database/migrate.py            # apply pending migrations
+    python database/migrate.py --list     # show applied / pending
+"""
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Set
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from utils.postgres import postgres_dsn
+
+logger = logging.getLogger("migrate")
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+BASELINE = "001"
+
+
+class Migration(NamedTuple):
+    version: str  # "001"
+    name: str  # "initial_schema"
+    path: Path
+
+    def sql(self) -> str:
+        return self.path.read_text(encoding="utf-8")
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """The NNN_name.sql files in `directory`, in version order."""
+    migrations = []
+    for path in sorted(directory.glob("[0-9][0-9][0-9]_*.sql")):
+        version, _, name = path.stem.partition("_")
+        migrations.append(Migration(version, name, path))
+    return migrations
+
+
+def applied_versions(conn) -> Set[str]:
+    """Versions already applied; creates schema_migrations on first use."""
+    with conn.transaction():
+        exists = conn.execute("SELECT to_regclass('schema_migrations') IS NOT NULL").fetchone()[0]
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version VARCHAR(16) PRIMARY KEY,"
+            " name VARCHAR(255) NOT NULL,"
+            " applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP)"
+        )
+        if not exists and conn.execute("SELECT to_regclass('checkpoints') IS NOT NULL").fetchone()[0]:
+            # Pre-migrations database created from the 1.0 schema.sql
+            conn.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                         (BASELINE, "initial_schema"))
+            logger.info("Existing 1.0 schema found; recorded %s as applied", BASELINE)
+        return {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+
+
+def migrate(conn, target: Optional[str] = None, migrations: Optional[List[Migration]] = None) -> List[Migration]:
+    """Apply every pending migration up to `target` (inclusive), each in its
+    own transaction. Returns the migrations applied."""
+    migrations = load_migrations() if migrations is None else migrations
+    done = applied_versions(conn)
+    ran = []
+    for m in migrations:
+        if m.version in done or (target is not None and m.version > target):
+            continue
+        logger.info("Applying %s_%s", m.version, m.name)
+        with conn.transaction():
+            conn.execute(m.sql())
+            conn.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (m.version, m.name))
+        ran.append(m)
+    return ran
+
+
+def main():
+    p = argparse.ArgumentParser(description="Apply pending database/migrations/*.sql")
+    p.add_argument("--dsn", default=None, help="Postgres connection string (default: POSTGRES_* env vars)")
+    p.add_argument("--target", default=None, help="stop after this version (e.g. 002)")
+    p.add_argument("--list", action="store_true", help="list applied and pending migrations and exit")
+    args = p.parse_args()
+
+    import psycopg
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    dsn = args.dsn or postgres_dsn()
+    if not dsn:
+        p.error("no connection string: pass --dsn or set POSTGRES_CONNECTION_STRING / POSTGRES_*")
+
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        if args.list:
+            done = applied_versions(conn)
+            for m in load_migrations():
+                print(f"{m.version}_{m.name}: {'applied' if m.version in done else 'pending'}")
+            return
+        ran = migrate(conn, args.target)
+        logger.info("Applied %d migration(s)", len(ran))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    main()
@@ -0,0 +1,77 @@
+-- Migration 001: initial schema (schema version 1.0, 2025-01-07)
+--
+-- Baseline for databases created from the original database/schema.sql.
+-- migrate.py records it as applied, without running it, when it finds an
+-- existing `checkpoints` table and no schema_migrations table.
+--
+-- The 1.0 schema also declared idx_checkpoints_state_agent_id as a GIN index
+-- on (checkpoint_state->>'agent_id'). Text has no default GIN operator class,
+-- so that statement always failed and the index never existed. It is left out
+-- here; 002 adds B-tree indexes for agent lookups.
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    checkpoint_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    thread_id VARCHAR(255) NOT NULL,
+    checkpoint_ns VARCHAR(255) NOT NULL DEFAULT '',
+    parent_checkpoint_id UUID REFERENCES checkpoints(checkpoint_id) ON DELETE CASCADE,
+    checkpoint_state JSONB NOT NULL,
+    metadata JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT checkpoints_thread_ns_unique UNIQUE (thread_id, checkpoint_ns)
+);
+
+CREATE INDEX IF NOT EXISTS idx_checkpoints_thread_id ON checkpoints(thread_id);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_parent_id ON checkpoints(parent_checkpoint_id);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_created_at ON checkpoints(created_at);
+
+CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+    blob_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    checkpoint_id UUID NOT NULL REFERENCES checkpoints(checkpoint_id) ON DELETE CASCADE,
+    blob_data BYTEA,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_checkpoint_blobs_checkpoint_id ON checkpoint_blobs(checkpoint_id);
+
+CREATE TABLE IF NOT EXISTS workflow_runs (
+    run_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    thread_id VARCHAR(255) NOT NULL UNIQUE,
+    agent_id VARCHAR(255),
+    workflow_date DATE,
+    status VARCHAR(50) DEFAULT 'running',
+    error_message TEXT,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    completed_at TIMESTAMP WITH TIME ZONE,
+    final_priority_order JSONB,
+    bo_results_summary JSONB,
+    latest_checkpoint_id UUID REFERENCES checkpoints(checkpoint_id) ON DELETE SET NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_thread_id ON workflow_runs(thread_id);
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_agent_id ON workflow_runs(agent_id);
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_status ON workflow_runs(status);
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_started_at ON workflow_runs(started_at);
+
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_checkpoints_updated_at ON checkpoints;
+CREATE TRIGGER update_checkpoints_updated_at BEFORE UPDATE ON checkpoints
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+CREATE OR REPLACE VIEW latest_checkpoints AS
+SELECT DISTINCT ON (thread_id)
+    checkpoint_id,
+    thread_id,
+    checkpoint_ns,
+    checkpoint_state,
+    metadata,
+    created_at
+FROM checkpoints
+ORDER BY thread_id, created_at DESC;
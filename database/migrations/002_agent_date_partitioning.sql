@@ -0,0 +1,164 @@
+-- Migration 002: agent/date indexes and date-partitioned checkpoints (schema version 2.0)
+--
+-- * checkpoints becomes a table partitioned by RANGE (workflow_date), one
+--   partition per month plus a default partition. workflow_date is the
+--   AgentState.date the run scores. Rows are copied over from the 1.0 table,
+--   taking the date from checkpoint_state->>'date' and falling back to
+--   created_at.
+-- * B-tree indexes replace the GIN expression index that never got created:
+--   (workflow_date, checkpoint_state->>'agent_id', created_at DESC) serves
+--   "latest checkpoint for agent X on date D" and "all agents for date D";
+--   (thread_id, created_at DESC) serves latest_checkpoints and per-thread history.
+-- * workflow_runs gets (agent_id, workflow_date, started_at DESC) and
+--   (workflow_date, agent_id). The redundant thread_id index (the UNIQUE
+--   constraint already has one) and agent_id index (a prefix of the new
+--   composite) are dropped.
+-- * Postgres cannot enforce a foreign key to checkpoint_id alone on a
+--   partitioned table, and dropping old partitions would have to cascade
+--   through them. parent_checkpoint_id, checkpoint_blobs.checkpoint_id and
+--   workflow_runs.latest_checkpoint_id are therefore plain (unenforced)
+--   references from here on.
+--
+-- Requires PostgreSQL 13+ (row triggers on partitioned tables). Runs in one
+-- transaction via migrate.py; the copy rewrites the whole table, so plan a
+-- maintenance window on large databases.
+
+-- Dependents of the 1.0 table
+DROP VIEW IF EXISTS latest_checkpoints;
+ALTER TABLE checkpoint_blobs DROP CONSTRAINT IF EXISTS checkpoint_blobs_checkpoint_id_fkey;
+ALTER TABLE workflow_runs DROP CONSTRAINT IF EXISTS workflow_runs_latest_checkpoint_id_fkey;
+
+-- Move the 1.0 table (and its index names) out of the way
+ALTER TABLE checkpoints RENAME TO checkpoints_v1;
+ALTER TABLE checkpoints_v1 RENAME CONSTRAINT checkpoints_pkey TO checkpoints_v1_pkey;
+ALTER TABLE checkpoints_v1 RENAME CONSTRAINT checkpoints_thread_ns_unique TO checkpoints_v1_thread_ns_unique;
+DROP INDEX IF EXISTS idx_checkpoints_thread_id;
+DROP INDEX IF EXISTS idx_checkpoints_parent_id;
+DROP INDEX IF EXISTS idx_checkpoints_created_at;
+DROP INDEX IF EXISTS idx_checkpoints_state_agent_id;
+
+CREATE TABLE checkpoints (
+    checkpoint_id UUID NOT NULL DEFAULT gen_random_uuid(),
+    thread_id VARCHAR(255) NOT NULL,
+    checkpoint_ns VARCHAR(255) NOT NULL DEFAULT '',
+    parent_checkpoint_id UUID,
+    workflow_date DATE NOT NULL,
+    checkpoint_state JSONB NOT NULL,
+    metadata JSONB DEFAULT '{}'::jsonb,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    -- Unique keys on a partitioned table must include the partition key
+    CONSTRAINT checkpoints_pkey PRIMARY KEY (workflow_date, checkpoint_id),
+    CONSTRAINT checkpoints_thread_ns_unique UNIQUE (workflow_date, thread_id, checkpoint_ns)
+) PARTITION BY RANGE (workflow_date);
+
+-- Catches dates with no monthly partition yet; keep it empty by creating
+-- partitions ahead of time (a new partition cannot be added for a range
+-- that already has rows here).
+CREATE TABLE checkpoints_default PARTITION OF checkpoints DEFAULT;
+
+-- Create the monthly partitions covering [from_date, to_date]. Idempotent;
+-- returns the number of partitions created. Partitions are named
+-- checkpoints_pYYYY_MM.
+CREATE OR REPLACE FUNCTION create_checkpoint_partitions(from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', from_date)::date;
+    part TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= to_date LOOP
+        part := format('checkpoints_p%s', to_char(month, 'YYYY_MM'));
+        IF to_regclass(part) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF checkpoints FOR VALUES FROM (%L) TO (%L)',
+                part, month, (month + INTERVAL '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
+
+-- Copy the 1.0 rows, with partitions for every month they cover and the
+-- next three months
+CREATE TEMPORARY VIEW checkpoints_v1_dated AS
+SELECT
+    c.*,
+    COALESCE(
+        CASE WHEN c.checkpoint_state->>'date' ~ '^\d{4}-\d{2}-\d{2}$'
+             THEN (c.checkpoint_state->>'date')::date END,
+        c.created_at::date,
+        CURRENT_DATE
+    ) AS workflow_date
+FROM checkpoints_v1 c;
+
+SELECT create_checkpoint_partitions(
+    LEAST(COALESCE(MIN(workflow_date), CURRENT_DATE), CURRENT_DATE),
+    GREATEST(COALESCE(MAX(workflow_date), CURRENT_DATE), CURRENT_DATE) + 90
+)
+FROM checkpoints_v1_dated;
+
+INSERT INTO checkpoints (checkpoint_id, thread_id, checkpoint_ns, parent_checkpoint_id, workflow_date,
+                         checkpoint_state, metadata, created_at, updated_at)
+SELECT checkpoint_id, thread_id, checkpoint_ns, parent_checkpoint_id, workflow_date,
+       checkpoint_state, metadata, created_at, updated_at
+FROM checkpoints_v1_dated;
+
+DROP VIEW checkpoints_v1_dated;
+DROP TABLE checkpoints_v1;
+
+-- Indexes are declared on the parent and created on every partition
+CREATE INDEX IF NOT EXISTS idx_checkpoints_date_agent
+    ON checkpoints (workflow_date, (checkpoint_state->>'agent_id'), created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_thread_created ON checkpoints (thread_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_parent_id ON checkpoints (parent_checkpoint_id);
+
+CREATE TRIGGER update_checkpoints_updated_at BEFORE UPDATE ON checkpoints
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Latest checkpoint per thread. Filters on thread_id are pushed into the
+-- DISTINCT ON and use idx_checkpoints_thread_created, so
+-- `WHERE thread_id = ...` reads one index entry instead of the whole table.
+CREATE OR REPLACE VIEW latest_checkpoints AS
+SELECT DISTINCT ON (thread_id)
+    checkpoint_id,
+    thread_id,
+    checkpoint_ns,
+    checkpoint_state,
+    metadata,
+    created_at,
+    workflow_date,
+    checkpoint_state->>'agent_id' AS agent_id
+FROM checkpoints
+ORDER BY thread_id, created_at DESC;
+
+-- Latest checkpoint per (date, agent). Filters on workflow_date (and
+-- agent_id) prune to one partition and use idx_checkpoints_date_agent.
+CREATE OR REPLACE VIEW latest_agent_checkpoints AS
+SELECT DISTINCT ON (workflow_date, checkpoint_state->>'agent_id')
+    workflow_date,
+    checkpoint_state->>'agent_id' AS agent_id,
+    checkpoint_id,
+    thread_id,
+    checkpoint_ns,
+    checkpoint_state,
+    metadata,
+    created_at
+FROM checkpoints
+ORDER BY workflow_date, checkpoint_state->>'agent_id', created_at DESC;
+
+-- workflow_runs
+DROP INDEX IF EXISTS idx_workflow_runs_thread_id;
+DROP INDEX IF EXISTS idx_workflow_runs_agent_id;
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_agent_date ON workflow_runs (agent_id, workflow_date, started_at DESC);
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_date_agent ON workflow_runs (workflow_date, agent_id);
+
+COMMENT ON TABLE checkpoints IS 'Stores workflow state snapshots at each execution step for resume/replay/debugging; partitioned by month of workflow_date';
+COMMENT ON COLUMN checkpoints.workflow_date IS 'Workflow date the run scores (AgentState.date); partition key';
+COMMENT ON COLUMN checkpoints.checkpoint_state IS 'Serialized AgentState: agent_id, date, raw_metrics, bo_results, final_priority_order';
+COMMENT ON COLUMN checkpoints.metadata IS 'Additional checkpoint metadata: node name, edge info, errors, etc.';
+COMMENT ON COLUMN checkpoints.parent_checkpoint_id IS 'Parent checkpoint (same thread and date); not enforced by a foreign key';
+COMMENT ON VIEW latest_agent_checkpoints IS 'Most recent checkpoint per (workflow_date, agent_id); filter on workflow_date';
@@ -0,0 +1,27 @@
+-- Migration 003: bookkeeping for the checkpoint retention job (database/retention.py)
+--
+-- * checkpoint_blobs can hold compressed archives of pruned checkpoints:
+--   kind = 'archive', one row per thread per compaction pass, keyed by the
+--   thread and date it came from. checkpoint_id is the checkpoint that was
+--   kept for the thread.
+-- * workflow_runs.compacted_at marks runs whose intermediate checkpoints
+--   have been pruned, so each pass only looks at runs not yet compacted.
+
+ALTER TABLE checkpoint_blobs
+    ADD COLUMN IF NOT EXISTS kind VARCHAR(32) NOT NULL DEFAULT 'blob',
+    ADD COLUMN IF NOT EXISTS thread_id VARCHAR(255),
+    ADD COLUMN IF NOT EXISTS workflow_date DATE,
+    ADD COLUMN IF NOT EXISTS encoding VARCHAR(32);
+
+CREATE INDEX IF NOT EXISTS idx_checkpoint_blobs_archive_thread
+    ON checkpoint_blobs (thread_id, workflow_date) WHERE kind = 'archive';
+
+ALTER TABLE workflow_runs ADD COLUMN IF NOT EXISTS compacted_at TIMESTAMP WITH TIME ZONE;
+
+-- Completed runs still to be compacted, oldest first
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_compaction
+    ON workflow_runs (workflow_date) WHERE status = 'completed' AND compacted_at IS NULL;
+
+COMMENT ON COLUMN checkpoint_blobs.kind IS 'blob: large state object; archive: compressed checkpoints pruned by the retention job';
+COMMENT ON COLUMN checkpoint_blobs.encoding IS 'Encoding of blob_data, e.g. json+gzip for archives';
+COMMENT ON COLUMN workflow_runs.compacted_at IS 'When the retention job pruned this run''s intermediate checkpoints';
@@ -0,0 +1,103 @@
+-- Migration 004: tables of LangGraph's Postgres checkpointer, in their own schema
+--
+-- PooledPostgresSaver (utils/checkpointing.py) reads and writes LangGraph's
+-- checkpoints / checkpoint_blobs / checkpoint_writes layout. Those names
+-- clash with the repo's own public.checkpoints and public.checkpoint_blobs
+-- (a different layout, see schema.sql), so the saver's tables live in
+-- schema `langgraph` and the saver's connections set search_path to it.
+--
+-- * The columns are those of langgraph-checkpoint-postgres's migrations
+--   0-9, and checkpoint_migrations records all ten, so
+--   PostgresSaver.setup() finds nothing to do.
+-- * The saver only ever sets thread_id, checkpoint_ns and its own ids, so
+--   the tables are partitioned by RANGE (thread_id). Batch runs use thread
+--   ids "<YYYY-MM-DD>:<agent_id>" (batch_runner.thread_id_for), so a
+--   partition per month, FROM ('YYYY-MM') TO (next month) in the "C"
+--   collation, holds every checkpoint, blob and write of that month's
+--   runs; other thread ids go to the default partitions.
+-- * Every primary key starts with thread_id, which serves LangGraph's
+--   per-thread lookups; its separate thread_id indexes (migrations 6-8,
+--   CREATE INDEX CONCURRENTLY, not allowed on partitioned tables) are not
+--   created.
+
+CREATE SCHEMA IF NOT EXISTS langgraph;
+
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_migrations (
+    v INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS langgraph.checkpoints (
+    thread_id TEXT COLLATE "C" NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint JSONB NOT NULL,
+    metadata JSONB NOT NULL DEFAULT '{}',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) PARTITION BY RANGE (thread_id);
+
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_blobs (
+    thread_id TEXT COLLATE "C" NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BYTEA,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+) PARTITION BY RANGE (thread_id);
+
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_writes (
+    thread_id TEXT COLLATE "C" NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BYTEA NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) PARTITION BY RANGE (thread_id);
+
+-- Thread ids that are not date-prefixed, and months with no partition yet
+CREATE TABLE IF NOT EXISTS langgraph.checkpoints_default PARTITION OF langgraph.checkpoints DEFAULT;
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_blobs_default PARTITION OF langgraph.checkpoint_blobs DEFAULT;
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_writes_default PARTITION OF langgraph.checkpoint_writes DEFAULT;
+
+-- Create the monthly partitions of all three tables covering [from_date,
+-- to_date]. Idempotent; returns the number of months added. Partitions are
+-- named <table>_pYYYY_MM.
+CREATE OR REPLACE FUNCTION langgraph.create_checkpoint_partitions(from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', from_date)::date;
+    tbl TEXT;
+    part TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= to_date LOOP
+        IF to_regclass(format('langgraph.checkpoints_p%s', to_char(month, 'YYYY_MM'))) IS NULL THEN
+            created := created + 1;
+        END IF;
+        FOREACH tbl IN ARRAY ARRAY['checkpoints', 'checkpoint_blobs', 'checkpoint_writes'] LOOP
+            part := format('%s_p%s', tbl, to_char(month, 'YYYY_MM'));
+            IF to_regclass(format('langgraph.%I', part)) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE langgraph.%I PARTITION OF langgraph.%I FOR VALUES FROM (%L) TO (%L)',
+                    part, tbl, to_char(month, 'YYYY-MM'), to_char(month + INTERVAL '1 month', 'YYYY-MM')
+                );
+            END IF;
+        END LOOP;
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
+
+-- This month and the next three
+SELECT langgraph.create_checkpoint_partitions(CURRENT_DATE, CURRENT_DATE + 90);
+
+INSERT INTO langgraph.checkpoint_migrations (v)
+SELECT generate_series(0, 9)
+ON CONFLICT (v) DO NOTHING;
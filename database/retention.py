@@ -0,0 +1,526 @@
+"""Checkpoint retention: compact old runs, archive what is pruned, drop expired partitions.
+
+Works on the LangGraph checkpointer's tables (langgraph.checkpoints,
+checkpoint_blobs and checkpoint_writes, see migrations/004), keyed by
+thread_id, checkpoint_ns, checkpoint_id and, for channel values, channel
+and version. Each pass:
+
+1. Compact. For completed workflow_runs whose workflow_date is older than
+   `--keep-days`, keep only the run's final checkpoint per namespace
+   (workflow_runs.latest_checkpoint_id, else the thread's newest), the
+   channel blobs it references and its pending writes, and delete the
+   rest. Delta-encoded blobs of the kept checkpoint (see
+   utils/checkpointing.py) are rebased to full values before their bases
+   go. The deleted rows are archived first, gzip-compressed, into
+   public.checkpoint_blobs (kind = 'archive') or into files under
+   `--archive-dir`.
+2. Drop. Monthly partitions lying wholly before `--drop-after-days` are
+   archived (whatever is left in them, thread by thread) and then
+   detached and dropped, all three tables' partitions of a month together.
+3. Create partitions for the next three months
+   (langgraph.create_checkpoint_partitions).
+
+Work is done `--batch-size` threads at a time, one short transaction per
+batch. A compaction batch row-locks only its workflow_runs rows (SKIP
+LOCKED, so passes can overlap) and the rows it rewrites or deletes. DETACH
+needs a brief exclusive lock on the parent tables; it runs under
+`--lock-timeout` and is retried on the next pass if the lock is busy.
+
+    python database/retention.py --keep-days 30 --dry-run
+    python database/retention.py --keep-days 30 --drop-after-days 400
+"""
+import argparse
+import base64
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Sequence
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from utils.checkpointing import CHECKPOINT_SCHEMA, _is_delta, patch
+from utils.postgres import postgres_dsn
+
+logger = logging.getLogger("retention")
+
+ARCHIVE_TARGETS = ("blobs", "files", "none")
+ARCHIVE_ENCODING = "json+gzip"
+ARCHIVE_FORMAT = 2  # 1: rows of the old public.checkpoints layout
+DEFAULT_KEEP_DAYS = 30
+DEFAULT_BATCH_SIZE = 500  # threads per transaction
+DEFAULT_LOCK_TIMEOUT = "5s"
+PARTITIONS_AHEAD_DAYS = 90
+
+CHECKPOINTS = f"{CHECKPOINT_SCHEMA}.checkpoints"
+BLOBS = f"{CHECKPOINT_SCHEMA}.checkpoint_blobs"
+WRITES = f"{CHECKPOINT_SCHEMA}.checkpoint_writes"
+_TABLES = ("checkpoints", "checkpoint_blobs", "checkpoint_writes")
+
+_PARTITION_NAME = re.compile(r"^checkpoints_p(\d{4})_(\d{2})$")
+_THREAD_DATE = re.compile(r"^(\d{4}-\d{2}-\d{2}):")
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]")
+
+_CHECKPOINT_COLUMNS = ("thread_id", "checkpoint_ns", "checkpoint_id", "parent_checkpoint_id", "type", "checkpoint",
+                       "metadata")
+_BLOB_COLUMNS = ("thread_id", "checkpoint_ns", "channel", "version", "type", "blob")
+_WRITE_COLUMNS = ("thread_id", "checkpoint_ns", "checkpoint_id", "task_id", "idx", "channel", "type", "blob",
+                  "task_path")
+
+
+class RetentionReport(NamedTuple):
+    runs_compacted: int
+    checkpoints_deleted: int
+    checkpoints_archived: int
+    archive_bytes: int
+    partitions_dropped: List[str]
+
+
+class _Pruned(NamedTuple):
+    """One thread's rows to archive and delete."""
+    thread_id: str
+    workflow_date: Any
+    kept_checkpoint_id: Optional[str]
+    checkpoints: List[Mapping[str, Any]]
+    blobs: List[Mapping[str, Any]]
+    writes: List[Mapping[str, Any]]
+
+
+# -- pure helpers -------------------------------------------------------------
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"__bytes__": base64.b64encode(bytes(value)).decode("ascii")}
+    return str(value)
+
+
+def _from_json(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def encode_archive(thread_id: str, workflow_date: Any, checkpoints: Sequence[Mapping[str, Any]],
+                   blobs: Sequence[Mapping[str, Any]] = (), writes: Sequence[Mapping[str, Any]] = ()) -> bytes:
+    """Gzip-compressed JSON of a thread's pruned checkpoint, blob and write rows (bytes base64-encoded)."""
+    doc = {"format": ARCHIVE_FORMAT, "thread_id": thread_id, "workflow_date": str(workflow_date),
+           "checkpoints": [dict(r) for r in checkpoints], "blobs": [dict(r) for r in blobs],
+           "writes": [dict(r) for r in writes]}
+    return gzip.compress(json.dumps(doc, default=_to_json, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+
+
+def decode_archive(data: bytes) -> Dict[str, Any]:
+    return json.loads(gzip.decompress(data).decode("utf-8"), object_hook=_from_json)
+
+
+def materialize(values: Mapping[str, Any], values_by_id: Mapping[str, Mapping[str, Any]]) -> Dict[str, Any]:
+    """`values` (channel -> value) with every delta-encoded value replaced by its full value.
+
+    Patches are resolved against the same channel of their base checkpoints
+    in `values_by_id` (checkpoint_id -> channel values); raises LookupError
+    if a base is not there.
+    """
+    out = dict(values)
+    for key, value in values.items():
+        chain = []
+        while _is_delta(value):
+            chain.append(value["patch"])
+            base = values_by_id.get(str(value["base"]))
+            if base is None:
+                raise LookupError(f"delta base checkpoint {value['base']} for {key!r} is missing")
+            value = base.get(key) or {}
+        for p in reversed(chain):
+            value = patch(value, p)
+        out[key] = value
+    return out
+
+
+def final_checkpoint(rows: Sequence[Mapping[str, Any]], latest_id: Any = None) -> Optional[Mapping[str, Any]]:
+    """The row to keep: `latest_id` if present, else the newest (LangGraph's
+    checkpoint ids sort by time)."""
+    if latest_id is not None:
+        for r in rows:
+            if str(r["checkpoint_id"]) == str(latest_id):
+                return r
+    return max(rows, key=lambda r: r["checkpoint_id"]) if rows else None
+
+
+def thread_date(thread_id: str) -> Optional[datetime.date]:
+    """The date of a batch thread id ("<YYYY-MM-DD>:<agent_id>"), else None."""
+    m = _THREAD_DATE.match(thread_id)
+    try:
+        return datetime.date.fromisoformat(m.group(1)) if m else None
+    except ValueError:
+        return None
+
+
+def expired_partitions(names: Iterable[str], cutoff: datetime.date) -> List[str]:
+    """Monthly partitions (checkpoints_pYYYY_MM) whose whole range is before `cutoff`."""
+    expired = []
+    for name in names:
+        m = _PARTITION_NAME.match(name)
+        if not m:
+            continue  # checkpoints_default and anything not created by create_checkpoint_partitions
+        year, month = int(m.group(1)), int(m.group(2))
+        end = datetime.date(year + month // 12, month % 12 + 1, 1)
+        if end <= cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+# -- archiving ----------------------------------------------------------------
+
+class _Archiver:
+    """Writes one archive per thread of pruned rows."""
+
+    def __init__(self, target: str, archive_dir: Optional[str] = None):
+        if target not in ARCHIVE_TARGETS:
+            raise ValueError(f"archive target must be one of {ARCHIVE_TARGETS}, got {target!r}")
+        if target == "files" and not archive_dir:
+            raise ValueError("archive target 'files' needs an archive directory")
+        self.target = target
+        self.root = Path(archive_dir) if archive_dir else None
+        self.archived = 0
+        self.bytes = 0
+
+    def write(self, conn, groups: Sequence[_Pruned]) -> None:
+        if self.target == "none":
+            return
+        blobs = []
+        for g in groups:
+            if not (g.checkpoints or g.blobs or g.writes):
+                continue
+            data = encode_archive(g.thread_id, g.workflow_date, g.checkpoints, g.blobs, g.writes)
+            if self.target == "blobs":
+                blobs.append((g.kept_checkpoint_id, data, g.thread_id, g.workflow_date, ARCHIVE_ENCODING))
+            else:
+                first = min((r["checkpoint_id"] for r in g.checkpoints), default=g.kept_checkpoint_id)
+                self._write_file(g.thread_id, g.workflow_date, first, data)
+            self.archived += len(g.checkpoints)
+            self.bytes += len(data)
+        if blobs:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    "INSERT INTO public.checkpoint_blobs (checkpoint_id, blob_data, kind, thread_id, workflow_date, encoding)"
+                    " VALUES (%s::uuid, %s, 'archive', %s, %s, %s)",
+                    blobs,
+                )
+
+    def _write_file(self, thread_id: str, wdate: Any, first_id: Any, data: bytes) -> None:
+        # Named after the first archived checkpoint, so a retried batch overwrites its own file
+        directory = self.root / str(wdate)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{_UNSAFE.sub('_', thread_id)}-{first_id}.json.gz"
+        tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        try:
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+
+def load_archive(conn, thread_id: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Every archived checkpoint, blob and write row of a thread from
+    public.checkpoint_blobs; checkpoints oldest first."""
+    out: Dict[str, List[Dict[str, Any]]] = {"checkpoints": [], "blobs": [], "writes": []}
+    for (data,) in conn.execute(
+        "SELECT blob_data FROM public.checkpoint_blobs WHERE kind = 'archive' AND thread_id = %s", (thread_id,)
+    ):
+        doc = decode_archive(bytes(data))
+        for key in out:
+            out[key].extend(doc.get(key, ()))
+    out["checkpoints"].sort(key=lambda r: r["checkpoint_id"])
+    return out
+
+
+# -- database passes ----------------------------------------------------------
+
+def _lock_timeout(conn, timeout: str) -> None:
+    conn.execute("SELECT set_config('lock_timeout', %s, true)", (timeout,))
+
+
+def _select(conn, columns: Sequence[str], table, threads: Sequence[str], order: str) -> List[Dict[str, Any]]:
+    from psycopg import sql
+    from psycopg.rows import dict_row
+
+    if isinstance(table, str):
+        table = sql.SQL(table)
+    query = sql.SQL("SELECT {} FROM {} WHERE thread_id = ANY(%s) ORDER BY " + order).format(
+        sql.SQL(", ").join(map(sql.Identifier, columns)), table)
+    with conn.cursor(row_factory=dict_row) as cur:
+        return cur.execute(query, (list(threads),)).fetchall()
+
+
+def _by_key(rows: Iterable[Mapping[str, Any]], *key: str) -> Dict[tuple, List[Mapping[str, Any]]]:
+    groups: Dict[tuple, List[Mapping[str, Any]]] = {}
+    for r in rows:
+        groups.setdefault(tuple(r[k] for k in key), []).append(r)
+    return groups
+
+
+def _rebased(serde, final: Mapping[str, Any], checkpoints: Sequence[Mapping[str, Any]],
+             blobs: Mapping[tuple, Mapping[str, Any]]) -> List[tuple]:
+    """(type, blob, channel, version) of each delta-encoded blob the `final`
+    checkpoint references, rebased to the full value. Raises LookupError if
+    a delta's base is not among `checkpoints`."""
+    loaded: Dict[tuple, Any] = {}
+
+    def value(channel: str, version: Any) -> Any:
+        key = (channel, str(version))
+        if key not in loaded:
+            row = blobs.get(key)
+            loaded[key] = None if row is None or row["blob"] is None else serde.loads_typed((row["type"], bytes(row["blob"])))
+        return loaded[key]
+
+    kept = final["checkpoint"].get("channel_versions", {})
+    deltas = {ch: value(ch, v) for ch, v in kept.items()}
+    deltas = {ch: v for ch, v in deltas.items() if _is_delta(v)}
+    if not deltas:
+        return []
+    values_by_id = {r["checkpoint_id"]: {ch: value(ch, r["checkpoint"]["channel_versions"][ch])
+                                         for ch in deltas if ch in r["checkpoint"].get("channel_versions", {})}
+                    for r in checkpoints}
+    full = materialize(deltas, values_by_id)
+    return [(*serde.dumps_typed(full[ch]), ch, str(kept[ch])) for ch in deltas]
+
+
+def _delete_rows(conn, table: str, key: Sequence[str], rows: Sequence[Mapping[str, Any]]) -> int:
+    if not rows:
+        return 0
+    cur = conn.execute(
+        f"DELETE FROM {table} t USING unnest({', '.join(['%s::text[]'] * len(key))}) AS d({', '.join(key)})"
+        f" WHERE {' AND '.join(f't.{k} = d.{k}' for k in key)}",
+        [[str(r[k]) for r in rows] for k in key],
+    )
+    return cur.rowcount
+
+
+def compact_batch(conn, cutoff: datetime.date, archiver: _Archiver, batch_size: int = DEFAULT_BATCH_SIZE,
+                  lock_timeout: str = DEFAULT_LOCK_TIMEOUT, serde=None) -> tuple:
+    """Compact up to `batch_size` completed runs dated before `cutoff` in one
+    transaction. Returns (runs, checkpoints deleted); (0, 0) when done.
+    `serde` must match the saver's (LangGraph's JsonPlusSerializer by default)."""
+    serde = serde or JsonPlusSerializer()
+    with conn.transaction():
+        _lock_timeout(conn, lock_timeout)
+        runs = conn.execute(
+            "SELECT run_id, thread_id, workflow_date, latest_checkpoint_id FROM workflow_runs"
+            " WHERE status = 'completed' AND compacted_at IS NULL AND workflow_date < %s"
+            " ORDER BY workflow_date LIMIT %s FOR UPDATE SKIP LOCKED",
+            (cutoff, batch_size),
+        ).fetchall()
+        if not runs:
+            return 0, 0
+        threads = [r[1] for r in runs]
+        checkpoints = _by_key(_select(conn, _CHECKPOINT_COLUMNS, CHECKPOINTS, threads,
+                                      "thread_id, checkpoint_ns, checkpoint_id"), "thread_id", "checkpoint_ns")
+        blobs = _by_key(_select(conn, _BLOB_COLUMNS, BLOBS, threads, "thread_id, checkpoint_ns, channel, version"),
+                        "thread_id", "checkpoint_ns")
+        writes = _by_key(_select(conn, _WRITE_COLUMNS, WRITES, threads, "thread_id, checkpoint_ns, checkpoint_id"),
+                         "thread_id", "checkpoint_ns")
+        namespaces: Dict[str, List[str]] = {}
+        for thread_id, ns in {*checkpoints, *blobs, *writes}:
+            namespaces.setdefault(thread_id, []).append(ns)
+
+        kept, rebased, groups = [], [], []
+        for run_id, thread_id, wdate, latest_id in runs:
+            steps = []
+            try:
+                for ns in sorted(namespaces.get(thread_id, ())):
+                    rows = checkpoints.get((thread_id, ns), [])
+                    final = final_checkpoint(rows, latest_id if ns == "" else None)
+                    ns_blobs = blobs.get((thread_id, ns), [])
+                    ns_writes = writes.get((thread_id, ns), [])
+                    if final is None:  # blobs or writes without a checkpoint: nothing to keep
+                        steps.append((ns, None, rows, [], ns_blobs, ns_writes))
+                        continue
+                    versions = {(ch, str(v)) for ch, v in final["checkpoint"].get("channel_versions", {}).items()}
+                    by_version = {(b["channel"], b["version"]): b for b in ns_blobs}
+                    steps.append((ns, final, [r for r in rows if r is not final],
+                                  _rebased(serde, final, rows, by_version),
+                                  [b for b in ns_blobs if (b["channel"], b["version"]) not in versions],
+                                  [w for w in ns_writes if w["checkpoint_id"] != final["checkpoint_id"]]))
+            except LookupError as e:
+                # Marked compacted all the same, so later passes do not pick it up again
+                logger.warning("Run %s (%s) not compacted: %s", run_id, thread_id, e)
+                kept.append((run_id, None))
+                continue
+            root = next((p[1] for p in steps if p[0] == "" and p[1] is not None), None)
+            kept_id = root["checkpoint_id"] if root is not None else None
+            pruned = _Pruned(thread_id, wdate, kept_id, [], [], [])
+            for ns, _final, rows, new_blobs, old_blobs, old_writes in steps:
+                rebased.extend((t, b, thread_id, ns, ch, v) for t, b, ch, v in new_blobs)
+                pruned.checkpoints.extend(rows)
+                pruned.blobs.extend(old_blobs)
+                pruned.writes.extend(old_writes)
+            groups.append(pruned)
+            kept.append((run_id, kept_id))
+
+        archiver.write(conn, groups)
+        if rebased:
+            with conn.cursor() as cur:
+                cur.executemany(
+                    f"UPDATE {BLOBS} SET type = %s, blob = %s"
+                    " WHERE thread_id = %s AND checkpoint_ns = %s AND channel = %s AND version = %s",
+                    rebased,
+                )
+        deleted = _delete_rows(conn, CHECKPOINTS, ("thread_id", "checkpoint_ns", "checkpoint_id"),
+                               [r for g in groups for r in g.checkpoints])
+        _delete_rows(conn, BLOBS, ("thread_id", "checkpoint_ns", "channel", "version"), [r for g in groups for r in g.blobs])
+        _delete_rows(conn, WRITES, ("thread_id", "checkpoint_ns", "checkpoint_id", "task_id"),
+                     [r for g in groups for r in g.writes])
+        conn.execute(
+            "UPDATE workflow_runs r SET compacted_at = CURRENT_TIMESTAMP,"
+            " latest_checkpoint_id = COALESCE(k.checkpoint_id, r.latest_checkpoint_id)"
+            " FROM unnest(%s::uuid[], %s::uuid[]) AS k(run_id, checkpoint_id) WHERE r.run_id = k.run_id",
+            ([k[0] for k in kept], [k[1] for k in kept]),
+        )
+    return len(runs), deleted
+
+
+def partitions(conn) -> List[str]:
+    return [row[0] for row in conn.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid"
+        " WHERE i.inhparent = %s::regclass ORDER BY c.relname", (CHECKPOINTS,)
+    )]
+
+
+def drop_partition(conn, name: str, archiver: _Archiver, batch_size: int = DEFAULT_BATCH_SIZE,
+                   lock_timeout: str = DEFAULT_LOCK_TIMEOUT) -> bool:
+    """Archive what is left in the month of partition `name` (a
+    checkpoints_pYYYY_MM) a batch of threads at a time (deleting as it
+    goes, so an interrupted pass resumes), then detach and drop that
+    month's partitions of all three tables. Returns False if the detach
+    lock could not be taken."""
+    import psycopg
+    from psycopg import sql
+
+    suffix = name[len("checkpoints"):]
+    parts = {t: sql.Identifier(CHECKPOINT_SCHEMA, t + suffix) for t in _TABLES}
+    while archiver.target != "none":
+        with conn.transaction():
+            threads = [row[0] for row in conn.execute(
+                sql.SQL("SELECT thread_id FROM {} UNION SELECT thread_id FROM {} UNION SELECT thread_id FROM {}"
+                        " ORDER BY thread_id LIMIT %s").format(*parts.values()), (batch_size,)
+            )]
+            if not threads:
+                break
+            checkpoints = _by_key(_select(conn, _CHECKPOINT_COLUMNS, parts["checkpoints"], threads,
+                                          "thread_id, checkpoint_ns, checkpoint_id"), "thread_id")
+            blobs = _by_key(_select(conn, _BLOB_COLUMNS, parts["checkpoint_blobs"], threads,
+                                    "thread_id, checkpoint_ns, channel, version"), "thread_id")
+            writes = _by_key(_select(conn, _WRITE_COLUMNS, parts["checkpoint_writes"], threads,
+                                     "thread_id, checkpoint_ns, checkpoint_id"), "thread_id")
+            groups = []
+            for thread_id in threads:
+                rows = checkpoints.get((thread_id,), [])
+                final = final_checkpoint([r for r in rows if r["checkpoint_ns"] == ""])
+                groups.append(_Pruned(thread_id, thread_date(thread_id), final["checkpoint_id"] if final else None,
+                                      rows, blobs.get((thread_id,), []), writes.get((thread_id,), [])))
+            archiver.write(conn, groups)
+            for part in parts.values():
+                conn.execute(sql.SQL("DELETE FROM {} WHERE thread_id = ANY(%s)").format(part), (threads,))
+    try:
+        with conn.transaction():
+            _lock_timeout(conn, lock_timeout)
+            for table, part in parts.items():
+                conn.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+                    sql.Identifier(CHECKPOINT_SCHEMA, table), part))
+                conn.execute(sql.SQL("DROP TABLE {}").format(part))
+    except psycopg.errors.LockNotAvailable:
+        logger.warning("Could not lock the checkpoint tables to detach %s within %s; will retry next pass",
+                       name, lock_timeout)
+        return False
+    return True
+
+
+def run(conn, keep_days: int = DEFAULT_KEEP_DAYS, drop_after_days: Optional[int] = None, archive: str = "blobs",
+        archive_dir: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE, max_batches: Optional[int] = None,
+        lock_timeout: str = DEFAULT_LOCK_TIMEOUT, today: Optional[datetime.date] = None) -> RetentionReport:
+    """One retention pass; `conn` must be in autocommit mode (each batch is its own transaction)."""
+    today = today or datetime.date.today()
+    archiver = _Archiver(archive, archive_dir)
+
+    runs = deleted = batches = 0
+    cutoff = today - datetime.timedelta(days=keep_days)
+    while max_batches is None or batches < max_batches:
+        n, d = compact_batch(conn, cutoff, archiver, batch_size, lock_timeout)
+        if not n:
+            break
+        runs, deleted, batches = runs + n, deleted + d, batches + 1
+        logger.info("Compacted %d runs (%d checkpoints pruned so far)", runs, deleted)
+
+    dropped = []
+    if drop_after_days is not None:
+        for name in expired_partitions(partitions(conn), today - datetime.timedelta(days=drop_after_days)):
+            if drop_partition(conn, name, archiver, batch_size, lock_timeout):
+                dropped.append(name)
+                logger.info("Dropped partition %s", name)
+
+    conn.execute(f"SELECT {CHECKPOINT_SCHEMA}.create_checkpoint_partitions(%s, %s)",
+                 (today, today + datetime.timedelta(days=PARTITIONS_AHEAD_DAYS)))
+    return RetentionReport(runs, deleted, archiver.archived, archiver.bytes, dropped)
+
+
+def plan(conn, keep_days: int = DEFAULT_KEEP_DAYS, drop_after_days: Optional[int] = None,
+         today: Optional[datetime.date] = None) -> Dict[str, Any]:
+    """What `run` would do, without changing anything."""
+    today = today or datetime.date.today()
+    runs, prunable = conn.execute(
+        "SELECT count(*), COALESCE(sum(GREATEST(n - 1, 0)), 0) FROM ("
+        f" SELECT (SELECT count(*) FROM {CHECKPOINTS} c WHERE c.thread_id = r.thread_id) AS n"
+        " FROM workflow_runs r"
+        " WHERE r.status = 'completed' AND r.compacted_at IS NULL AND r.workflow_date < %s) t",
+        (today - datetime.timedelta(days=keep_days),),
+    ).fetchone()
+    expired = []
+    if drop_after_days is not None:
+        expired = expired_partitions(partitions(conn), today - datetime.timedelta(days=drop_after_days))
+    return {"runs_to_compact": runs, "checkpoints_to_prune": int(prunable), "partitions_to_drop": expired}
+
+
+def main():
+    p = argparse.ArgumentParser(description="Prune, archive and drop old checkpoints")
+    p.add_argument("--dsn", default=None, help="Postgres connection string (default: POSTGRES_* env vars)")
+    p.add_argument("--keep-days", type=int, default=DEFAULT_KEEP_DAYS,
+                   help="keep every checkpoint of runs newer than this; older completed runs keep only their final one")
+    p.add_argument("--drop-after-days", type=int, default=None,
+                   help="drop monthly partitions wholly older than this (default: never)")
+    p.add_argument("--archive", choices=ARCHIVE_TARGETS, default="blobs",
+                   help="where pruned checkpoints go: checkpoint_blobs, gzip files, or nowhere")
+    p.add_argument("--archive-dir", default=None, help="directory for --archive files")
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="threads per transaction")
+    p.add_argument("--max-batches", type=int, default=None, help="stop compacting after this many batches")
+    p.add_argument("--lock-timeout", default=DEFAULT_LOCK_TIMEOUT, help="lock_timeout for each batch and detach")
+    p.add_argument("--dry-run", action="store_true", help="report what would be pruned and dropped, and exit")
+    args = p.parse_args()
+    if args.drop_after_days is not None and args.drop_after_days < args.keep_days:
+        p.error("--drop-after-days must not be shorter than --keep-days")
+
+    import psycopg
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    dsn = args.dsn or postgres_dsn()
+    if not dsn:
+        p.error("no connection string: pass --dsn or set POSTGRES_CONNECTION_STRING / POSTGRES_*")
+
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        if args.dry_run:
+            logger.info("Retention plan: %s", plan(conn, args.keep_days, args.drop_after_days))
+            return
+        report = run(conn, args.keep_days, args.drop_after_days, args.archive, args.archive_dir,
+                     args.batch_size, args.max_batches, args.lock_timeout)
+    logger.info("Retention summary: %s", report._asdict())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    main()
@@ -1,87 +1,161 @@
 -- PostgreSQL Schema for BOS Workflow State Persistence
 -- This schema stores workflow execution state snapshots for resume, replay, and debugging
--- 
--- Schema Version: 1.0
+--
+-- Schema Version: 2.2
 -- Created: 2025-01-07
 -- Purpose: Persist LangGraph workflow state at each step
+--
+-- For fresh installs. Databases created from an earlier version are upgraded
+-- with `python database/migrate.py` (see database/migrations/); this file is
+-- the result of applying every migration and records them as applied.
+-- Requires PostgreSQL 13+.
+
+-- Migrations applied to this schema (see database/migrate.py)
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version VARCHAR(16) PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
 
 -- Main table for storing workflow checkpoints
 -- Each row represents a state snapshot at a specific point in workflow execution
+-- Partitioned by month of workflow_date (see create_checkpoint_partitions)
 CREATE TABLE IF NOT EXISTS checkpoints (
-    -- Primary key: unique identifier for each checkpoint
-    checkpoint_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    
+    -- Unique identifier for each checkpoint (unique together with workflow_date)
+    checkpoint_id UUID NOT NULL DEFAULT gen_random_uuid(),
+
     -- Thread/Session identifier: groups checkpoints from the same workflow run
     thread_id VARCHAR(255) NOT NULL,
-    
+
     -- Checkpoint sequence number: order of checkpoints within a thread
     checkpoint_ns VARCHAR(255) NOT NULL DEFAULT '',
-    
-    -- Parent checkpoint reference: for checkpoint lineage/tree structure
-    parent_checkpoint_id UUID REFERENCES checkpoints(checkpoint_id) ON DELETE CASCADE,
-    
+
+    -- Parent checkpoint reference: for checkpoint lineage/tree structure.
+    -- Same thread and date; not enforced (a foreign key to a partitioned
+    -- table must include the partition key, and would block dropping partitions)
+    parent_checkpoint_id UUID,
+
+    -- Workflow date the run scores (AgentState.date); partition key
+    workflow_date DATE NOT NULL,
+
     -- Workflow state: serialized JSON of AgentState at this checkpoint
     -- Stores: agent_id, date, raw_metrics, bo_results, final_priority_order
     checkpoint_state JSONB NOT NULL,
-    
+
     -- Metadata: additional information about the checkpoint
     -- Can store: node name, edge info, error details, etc.
     metadata JSONB DEFAULT '{}'::jsonb,
-    
+
     -- Timestamps
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    
-    -- Indexes for efficient querying
-    CONSTRAINT checkpoints_thread_ns_unique UNIQUE (thread_id, checkpoint_ns)
-);
 
--- Indexes for performance
-CREATE INDEX IF NOT EXISTS idx_checkpoints_thread_id ON checkpoints(thread_id);
-CREATE INDEX IF NOT EXISTS idx_checkpoints_parent_id ON checkpoints(parent_checkpoint_id);
-CREATE INDEX IF NOT EXISTS idx_checkpoints_created_at ON checkpoints(created_at);
-CREATE INDEX IF NOT EXISTS idx_checkpoints_state_agent_id ON checkpoints USING GIN ((checkpoint_state->>'agent_id'));
+    -- Unique keys on a partitioned table must include the partition key
+    CONSTRAINT checkpoints_pkey PRIMARY KEY (workflow_date, checkpoint_id),
+    CONSTRAINT checkpoints_thread_ns_unique UNIQUE (workflow_date, thread_id, checkpoint_ns)
+) PARTITION BY RANGE (workflow_date);
+
+-- Catches dates with no monthly partition yet; keep it empty by creating
+-- partitions ahead of time (a new partition cannot be added for a range
+-- that already has rows here)
+CREATE TABLE IF NOT EXISTS checkpoints_default PARTITION OF checkpoints DEFAULT;
+
+-- Create the monthly partitions covering [from_date, to_date]. Idempotent;
+-- returns the number of partitions created. Partitions are named
+-- checkpoints_pYYYY_MM.
+CREATE OR REPLACE FUNCTION create_checkpoint_partitions(from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', from_date)::date;
+    part TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= to_date LOOP
+        part := format('checkpoints_p%s', to_char(month, 'YYYY_MM'));
+        IF to_regclass(part) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF checkpoints FOR VALUES FROM (%L) TO (%L)',
+                part, month, (month + INTERVAL '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
+
+-- This month and the next three
+SELECT create_checkpoint_partitions(CURRENT_DATE, CURRENT_DATE + 90);
+
+-- Indexes for performance (declared on the parent, created on every partition)
+-- "Latest checkpoint for agent X on date D" and "all agents for date D"
+CREATE INDEX IF NOT EXISTS idx_checkpoints_date_agent
+    ON checkpoints (workflow_date, (checkpoint_state->>'agent_id'), created_at DESC);
+-- Latest checkpoint / history for a thread
+CREATE INDEX IF NOT EXISTS idx_checkpoints_thread_created ON checkpoints (thread_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_checkpoints_parent_id ON checkpoints (parent_checkpoint_id);
 
 -- Table for storing checkpoint blobs (for large state objects if needed)
 CREATE TABLE IF NOT EXISTS checkpoint_blobs (
     blob_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    checkpoint_id UUID NOT NULL REFERENCES checkpoints(checkpoint_id) ON DELETE CASCADE,
+    -- References checkpoints.checkpoint_id; not enforced (see parent_checkpoint_id)
+    checkpoint_id UUID NOT NULL,
     blob_data BYTEA,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+
+    -- 'blob' for large state objects; 'archive' for checkpoints pruned by the
+    -- retention job (database/retention.py), one row per thread per pass,
+    -- with checkpoint_id = the checkpoint kept for the thread
+    kind VARCHAR(32) NOT NULL DEFAULT 'blob',
+    thread_id VARCHAR(255),
+    workflow_date DATE,
+    encoding VARCHAR(32) -- e.g. json+gzip
 );
 
 CREATE INDEX IF NOT EXISTS idx_checkpoint_blobs_checkpoint_id ON checkpoint_blobs(checkpoint_id);
+CREATE INDEX IF NOT EXISTS idx_checkpoint_blobs_archive_thread
+    ON checkpoint_blobs (thread_id, workflow_date) WHERE kind = 'archive';
 
 -- Table for storing workflow execution metadata
 -- Tracks high-level information about workflow runs
 CREATE TABLE IF NOT EXISTS workflow_runs (
     run_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     thread_id VARCHAR(255) NOT NULL UNIQUE,
-    
+
     -- Workflow identification
     agent_id VARCHAR(255),
     workflow_date DATE,
-    
+
     -- Execution status
     status VARCHAR(50) DEFAULT 'running', -- running, completed, failed, cancelled
     error_message TEXT,
-    
+
     -- Timestamps
     started_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     completed_at TIMESTAMP WITH TIME ZONE,
-    
+
     -- Final state summary (for quick access without loading full checkpoint)
     final_priority_order JSONB,
     bo_results_summary JSONB,
-    
-    -- Foreign key to latest checkpoint
-    latest_checkpoint_id UUID REFERENCES checkpoints(checkpoint_id) ON DELETE SET NULL
+
+    -- Latest checkpoint (checkpoints.checkpoint_id); not enforced (see parent_checkpoint_id)
+    latest_checkpoint_id UUID,
+
+    -- Set by the retention job once the run's intermediate checkpoints are pruned
+    compacted_at TIMESTAMP WITH TIME ZONE
 );
 
-CREATE INDEX IF NOT EXISTS idx_workflow_runs_thread_id ON workflow_runs(thread_id);
-CREATE INDEX IF NOT EXISTS idx_workflow_runs_agent_id ON workflow_runs(agent_id);
+-- thread_id lookups use the UNIQUE constraint's index
+-- "Latest result for agent X on date D" (and agent history: agent_id prefix)
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_agent_date ON workflow_runs(agent_id, workflow_date, started_at DESC);
+-- "All agents for date D"
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_date_agent ON workflow_runs(workflow_date, agent_id);
 CREATE INDEX IF NOT EXISTS idx_workflow_runs_status ON workflow_runs(status);
 CREATE INDEX IF NOT EXISTS idx_workflow_runs_started_at ON workflow_runs(started_at);
+-- Completed runs still to be compacted, oldest first
+CREATE INDEX IF NOT EXISTS idx_workflow_runs_compaction
+    ON workflow_runs (workflow_date) WHERE status = 'completed' AND compacted_at IS NULL;
 
 -- Function to update updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
@@ -93,10 +167,13 @@ END;
 $$ language 'plpgsql';
 
 -- Trigger to auto-update updated_at
+DROP TRIGGER IF EXISTS update_checkpoints_updated_at ON checkpoints;
 CREATE TRIGGER update_checkpoints_updated_at BEFORE UPDATE ON checkpoints
     FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
--- View for easy querying of latest checkpoint per thread
+-- View for easy querying of latest checkpoint per thread.
+-- `WHERE thread_id = ...` is pushed into the DISTINCT ON and reads one
+-- entry of idx_checkpoints_thread_created.
 CREATE OR REPLACE VIEW latest_checkpoints AS
 SELECT DISTINCT ON (thread_id)
     checkpoint_id,
@@ -104,16 +181,134 @@ SELECT DISTINCT ON (thread_id)
     checkpoint_ns,
     checkpoint_state,
     metadata,
-    created_at
+    created_at,
+    workflow_date,
+    checkpoint_state->>'agent_id' AS agent_id
 FROM checkpoints
 ORDER BY thread_id, created_at DESC;
 
+-- View of the latest checkpoint per (date, agent). Filter on workflow_date
+-- (and agent_id): the date prunes to one partition and the rest is a walk
+-- of idx_checkpoints_date_agent.
+CREATE OR REPLACE VIEW latest_agent_checkpoints AS
+SELECT DISTINCT ON (workflow_date, checkpoint_state->>'agent_id')
+    workflow_date,
+    checkpoint_state->>'agent_id' AS agent_id,
+    checkpoint_id,
+    thread_id,
+    checkpoint_ns,
+    checkpoint_state,
+    metadata,
+    created_at
+FROM checkpoints
+ORDER BY workflow_date, checkpoint_state->>'agent_id', created_at DESC;
+
+-- LangGraph's Postgres checkpointer tables (PooledPostgresSaver, utils/checkpointing.py).
+-- Their names clash with the tables above (a different layout), so they live in
+-- schema langgraph; the saver's connections set search_path to it.
+-- Partitioned by RANGE (thread_id), one partition per month of the
+-- "<YYYY-MM-DD>:<agent_id>" batch thread ids (see migrations/004).
+-- checkpoint_migrations records LangGraph's migrations 0-9 as applied.
+CREATE SCHEMA IF NOT EXISTS langgraph;
+
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_migrations (
+    v INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS langgraph.checkpoints (
+    thread_id TEXT COLLATE "C" NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint JSONB NOT NULL,
+    metadata JSONB NOT NULL DEFAULT '{}',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+) PARTITION BY RANGE (thread_id);
+
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_blobs (
+    thread_id TEXT COLLATE "C" NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BYTEA,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+) PARTITION BY RANGE (thread_id);
+
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_writes (
+    thread_id TEXT COLLATE "C" NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    blob BYTEA NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+) PARTITION BY RANGE (thread_id);
+
+-- Thread ids that are not date-prefixed, and months with no partition yet
+CREATE TABLE IF NOT EXISTS langgraph.checkpoints_default PARTITION OF langgraph.checkpoints DEFAULT;
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_blobs_default PARTITION OF langgraph.checkpoint_blobs DEFAULT;
+CREATE TABLE IF NOT EXISTS langgraph.checkpoint_writes_default PARTITION OF langgraph.checkpoint_writes DEFAULT;
+
+-- Create the monthly partitions of all three tables covering [from_date,
+-- to_date]. Idempotent; returns the number of months added. Partitions are
+-- named <table>_pYYYY_MM.
+CREATE OR REPLACE FUNCTION langgraph.create_checkpoint_partitions(from_date DATE, to_date DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    month DATE := date_trunc('month', from_date)::date;
+    tbl TEXT;
+    part TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month <= to_date LOOP
+        IF to_regclass(format('langgraph.checkpoints_p%s', to_char(month, 'YYYY_MM'))) IS NULL THEN
+            created := created + 1;
+        END IF;
+        FOREACH tbl IN ARRAY ARRAY['checkpoints', 'checkpoint_blobs', 'checkpoint_writes'] LOOP
+            part := format('%s_p%s', tbl, to_char(month, 'YYYY_MM'));
+            IF to_regclass(format('langgraph.%I', part)) IS NULL THEN
+                EXECUTE format(
+                    'CREATE TABLE langgraph.%I PARTITION OF langgraph.%I FOR VALUES FROM (%L) TO (%L)',
+                    part, tbl, to_char(month, 'YYYY-MM'), to_char(month + INTERVAL '1 month', 'YYYY-MM')
+                );
+            END IF;
+        END LOOP;
+        month := (month + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
+
+-- This month and the next three
+SELECT langgraph.create_checkpoint_partitions(CURRENT_DATE, CURRENT_DATE + 90);
+
+INSERT INTO langgraph.checkpoint_migrations (v)
+SELECT generate_series(0, 9)
+ON CONFLICT (v) DO NOTHING;
+
+INSERT INTO schema_migrations (version, name) VALUES
+    ('001', 'initial_schema'),
+    ('002', 'agent_date_partitioning'),
+    ('003', 'checkpoint_retention'),
+    ('004', 'langgraph_checkpointer')
+ON CONFLICT (version) DO NOTHING;
+
 -- Comments for documentation
-COMMENT ON TABLE checkpoints IS 'Stores workflow state snapshots at each execution step for resume/replay/debugging';
+COMMENT ON TABLE checkpoints IS 'Stores workflow state snapshots at each execution step for resume/replay/debugging; partitioned by month of workflow_date';
 COMMENT ON TABLE checkpoint_blobs IS 'Stores large binary data associated with checkpoints if needed';
 COMMENT ON TABLE workflow_runs IS 'Tracks high-level metadata about workflow executions';
+COMMENT ON COLUMN checkpoints.workflow_date IS 'Workflow date the run scores (AgentState.date); partition key';
 COMMENT ON COLUMN checkpoints.checkpoint_state IS 'Serialized AgentState: agent_id, date, raw_metrics, bo_results, final_priority_order';
 COMMENT ON COLUMN checkpoints.metadata IS 'Additional checkpoint metadata: node name, edge info, errors, etc.';
+COMMENT ON COLUMN checkpoints.parent_checkpoint_id IS 'Parent checkpoint (same thread and date); not enforced by a foreign key';
 COMMENT ON COLUMN workflow_runs.final_priority_order IS 'Final BO priority order for quick access';
 COMMENT ON COLUMN workflow_runs.bo_results_summary IS 'Summary of BO results (ratios, grades) for quick access';
-
+COMMENT ON COLUMN checkpoint_blobs.kind IS 'blob: large state object; archive: compressed checkpoints pruned by the retention job';
+COMMENT ON COLUMN checkpoint_blobs.encoding IS 'Encoding of blob_data, e.g. json+gzip for archives';
+COMMENT ON COLUMN workflow_runs.compacted_at IS 'When the retention job pruned this run''s intermediate checkpoints';
+COMMENT ON VIEW latest_agent_checkpoints IS 'Most recent checkpoint per (workflow_date, agent_id); filter on workflow_date';
@@ -0,0 +1,247 @@
+"""Differential check that every execution path scores a fleet identically.
+
+The LangGraph app (main.py), the fast and sharded runners, both mock
+runners, `calculate_scores` and the vectorized `batch_scores` all run the
+same BO logic, but each has its own merge code. This script feeds one fleet
+through every path and compares each path's `bo_results` and
+`final_priority_order` against a reference path (the LangGraph app by
+default). The fleet is synthetic (synthetic_fleet.py, served from a local
+stub of the sebo API), or the real API's data with `--base-url`. Every path
+reads the same prefetched snapshot, so the inputs are identical.
+
+Values are compared bit for bit. Each float difference is reported with its
+absolute and relative size and its distance in ULPs. A difference inside
+`--rel-tol`/`--abs-tol` is counted but tolerated, unless `--strict` is set.
+A different priority order, a missing BO, field or agent, a differing grade,
+or a float outside tolerance is a mismatch, and the exit status is 1.
+
+    python equivalence_check.py --agents 2000
+    python equivalence_check.py --paths fast,sharded,batch_scores --strict --report .\equivalence.json
+    python equivalence_check.py --base-url http://127.0.0.1:8000/api --date 2024-01-01
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import struct
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")  # keep check runs out of LangSmith
+
+from benchmark import PATHS, score_path
+
+logger = logging.getLogger("equivalence_check")
+
+REFERENCE = "graph"
+DEFAULT_REL_TOL = 1e-9
+DEFAULT_ABS_TOL = 1e-12
+MAX_EXAMPLES = 20
+
+
+class Difference(NamedTuple):
+    path: str
+    agent_id: str
+    field: str  # "final_priority_order", "BO1", "BO1.ratio", or "agent"
+    expected: Any
+    actual: Any
+    abs_diff: Optional[float]  # float fields only
+    rel_diff: Optional[float]
+    ulps: Optional[int]
+    within_tolerance: bool
+
+
+class PathReport(NamedTuple):
+    path: str
+    agents: int
+    identical: int  # agents whose results match the reference bit for bit
+    within_tolerance: int  # agents whose only differences are floats inside the tolerance
+    mismatched: int
+    max_abs_diff: float
+    max_rel_diff: float
+    max_ulps: int
+    differences: List[Difference]  # the first MAX_EXAMPLES
+
+    @property
+    def ok(self) -> bool:
+        return self.mismatched == 0
+
+
+def _is_number(value: Any) -> bool:
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return False
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _ordered_bits(x: float) -> int:
+    # IEEE 754 bits mapped to a monotonic integer line, so ULP distance is a subtraction
+    bits = struct.unpack("<q", struct.pack("<d", x))[0]
+    return bits if bits >= 0 else -(bits & 0x7FFFFFFFFFFFFFFF)
+
+
+def ulps(a: float, b: float) -> int:
+    """Number of representable doubles between `a` and `b`."""
+    return abs(_ordered_bits(float(a)) - _ordered_bits(float(b)))
+
+
+def _compare_value(path, agent, field, expected, actual, rel_tol, abs_tol) -> Optional[Difference]:
+    if _is_number(expected) and _is_number(actual):
+        a, b = float(expected), float(actual)
+        if a.hex() == b.hex() or (math.isnan(a) and math.isnan(b)):
+            return None
+        if math.isfinite(a) and math.isfinite(b):
+            diff = abs(a - b)
+            # 0.0 vs -0.0 differ only in sign: a zero distance, still reported
+            rel = 0.0 if diff == 0 else diff / max(abs(a), abs(b))
+        else:
+            # inf vs -inf, or a NaN/inf against a number: unbounded, and never NaN
+            # so max_abs_diff/max_rel_diff stay ordered
+            diff = rel = math.inf
+        within = math.isclose(a, b, rel_tol=rel_tol, abs_tol=abs_tol)
+        return Difference(path, agent, field, expected, actual, diff, rel, ulps(a, b), within)
+    if expected == actual:
+        return None
+    return Difference(path, agent, field, expected, actual, None, None, None, False)
+
+
+def compare_results(reference: Dict[str, Any], results: Dict[str, Any], path: str,
+                    rel_tol: float = DEFAULT_REL_TOL, abs_tol: float = DEFAULT_ABS_TOL) -> PathReport:
+    """Diff `results` against `reference` (both agent id -> (final_priority_order, bo_results))."""
+    identical = within = mismatched = 0
+    max_abs = max_rel = 0.0
+    max_ulps = 0
+    examples = []
+    for agent in sorted(set(reference) | set(results)):
+        if agent not in results or agent not in reference:
+            diffs = [Difference(path, agent, "agent", agent in reference, agent in results, None, None, None, False)]
+        else:
+            (exp_order, exp_bo), (act_order, act_bo) = reference[agent], results[agent]
+            exp_bo, act_bo = exp_bo or {}, act_bo or {}
+            diffs = []
+            if list(exp_order or []) != list(act_order or []):
+                diffs.append(Difference(path, agent, "final_priority_order", exp_order, act_order,
+                                        None, None, None, False))
+            for bo in sorted(set(exp_bo) | set(act_bo)):
+                if bo not in exp_bo or bo not in act_bo:
+                    diffs.append(Difference(path, agent, bo, exp_bo.get(bo), act_bo.get(bo), None, None, None, False))
+                    continue
+                for field in sorted(set(exp_bo[bo]) | set(act_bo[bo])):
+                    d = _compare_value(path, agent, f"{bo}.{field}", exp_bo[bo].get(field, "<missing>"),
+                                       act_bo[bo].get(field, "<missing>"), rel_tol, abs_tol)
+                    if d is not None:
+                        diffs.append(d)
+        if not diffs:
+            identical += 1
+            continue
+        if all(d.within_tolerance for d in diffs):
+            within += 1
+        else:
+            mismatched += 1
+        for d in diffs:
+            if d.abs_diff is not None:
+                max_abs, max_rel, max_ulps = max(max_abs, d.abs_diff), max(max_rel, d.rel_diff), max(max_ulps, d.ulps)
+        examples.extend(diffs[:MAX_EXAMPLES - len(examples)])
+    return PathReport(path, len(results), identical, within, mismatched, max_abs, max_rel, max_ulps, examples)
+
+
+def run_paths(date: str, paths: Sequence[str] = PATHS, workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """Every path's results for every agent in `date`'s snapshot (fetched from fetch_data.BASE_URL)."""
+    from nodes import fetch_data
+
+    results = {}
+    for path in paths:
+        snapshot = fetch_data.prefetch(date, columnar=True)
+        try:
+            results[path] = score_path(path, date, snapshot, snapshot.agent_ids(), workers)
+        finally:
+            fetch_data.release(date)
+        logger.info("Scored %d agents through %s", len(results[path]), path)
+    return results
+
+
+def check(date: str, paths: Sequence[str] = PATHS, reference: str = REFERENCE, workers: Optional[int] = None,
+          rel_tol: float = DEFAULT_REL_TOL, abs_tol: float = DEFAULT_ABS_TOL) -> List[PathReport]:
+    """Run `reference` and `paths` for `date` and diff each path against the reference."""
+    order = [reference] + [p for p in paths if p != reference]
+    results = run_paths(date, order, workers)
+    return [compare_results(results[reference], results[p], p, rel_tol, abs_tol) for p in order[1:]]
+
+
+def check_fleet(n: int, seed: int = 0, **kwargs) -> List[PathReport]:
+    """`check` over a synthetic fleet of `n` agents served from a local API stub."""
+    from nodes import fetch_data
+    from synthetic_fleet import generate_fleet, serve
+
+    fleet = generate_fleet(n, seed)
+    server, base_url = serve(fleet)
+    previous, fetch_data.BASE_URL = fetch_data.BASE_URL, base_url
+    try:
+        return check(fleet.date, **kwargs)
+    finally:
+        fetch_data.BASE_URL = previous
+        server.shutdown()
+
+
+def _table(reports: List[PathReport], reference: str) -> str:
+    lines = [f"vs {reference:<16}{'agents':>8}{'identical':>11}{'within tol':>12}{'mismatched':>12}"
+             f"{'max abs':>12}{'max rel':>12}{'max ulps':>10}"]
+    for r in reports:
+        lines.append(f"{r.path:<19}{r.agents:>8}{r.identical:>11}{r.within_tolerance:>12}{r.mismatched:>12}"
+                     f"{r.max_abs_diff:>12.3g}{r.max_rel_diff:>12.3g}{r.max_ulps:>10}")
+    for r in reports:
+        for d in r.differences:
+            extra = f" (abs {d.abs_diff:.3g}, rel {d.rel_diff:.3g}, {d.ulps} ulps)" if d.abs_diff is not None else ""
+            lines.append(f"  {d.path} agent {d.agent_id} {d.field}: {d.expected!r} != {d.actual!r}{extra}"
+                         f"{'' if not d.within_tolerance else ' [within tolerance]'}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="Check that every execution path scores a fleet identically")
+    p.add_argument("--agents", type=int, default=1000, help="synthetic fleet size")
+    p.add_argument("--seed", type=int, default=0, help="synthetic fleet seed")
+    p.add_argument("--base-url", default=None, help="score the real API's data instead of a synthetic fleet")
+    p.add_argument("--date", default=None, help="workflow date with --base-url (YYYY-MM-DD)")
+    p.add_argument("--paths", default=",".join(PATHS), help=f"comma-separated subset of {', '.join(PATHS)}")
+    p.add_argument("--reference", choices=PATHS, default=REFERENCE, help="the path the others are compared with")
+    p.add_argument("--workers", type=int, default=None, help="sharded path worker processes (default: CPU count)")
+    p.add_argument("--rel-tol", type=float, default=DEFAULT_REL_TOL, help="tolerated relative float difference")
+    p.add_argument("--abs-tol", type=float, default=DEFAULT_ABS_TOL, help="tolerated absolute float difference")
+    p.add_argument("--strict", action="store_true", help="fail on any difference, including ones within tolerance")
+    p.add_argument("--report", default=None, help="optional path to write every path's summary and examples as JSON")
+    args = p.parse_args()
+
+    paths = args.paths.split(",")
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        p.error(f"unknown paths: {', '.join(sorted(unknown))}")
+    if args.base_url and not args.date:
+        p.error("--base-url needs --date")
+    logging.getLogger().setLevel(logging.WARNING)  # the runners log per agent/chunk at INFO
+    logger.setLevel(logging.INFO)
+
+    options = dict(paths=paths, reference=args.reference, workers=args.workers, rel_tol=args.rel_tol, abs_tol=args.abs_tol)
+    if args.base_url:
+        from nodes import fetch_data
+
+        fetch_data.BASE_URL = args.base_url
+        reports = check(args.date, **options)
+    else:
+        reports = check_fleet(args.agents, args.seed, **options)
+    print(_table(reports, args.reference))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump([{**r._asdict(), "differences": [d._asdict() for d in r.differences]} for r in reports],
+                      fh, indent=2, default=repr)
+        logger.info("Wrote equivalence report to %s", args.report)
+
+    failed = [r.path for r in reports if not r.ok or (args.strict and r.within_tolerance)]
+    if failed:
+        logger.error("Paths differ from %s: %s", args.reference, ", ".join(failed))
+        raise SystemExit(1)
+    logger.info("All paths match %s", args.reference)
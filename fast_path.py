@@ -0,0 +1,98 @@
+"""In-process executor for the fixed fetch -> b01..b05 -> merge -> prioritize DAG.
+
+Runs the same node functions as the LangGraph app in `main.py`, applying
+their updates with the same reducers (AgentState's Annotated fields), but
+without per-node channel bookkeeping, tasks or checkpoints. A run on a
+checkpointed app reads the thread's last checkpoint once at the start (so
+unchanged BOs can still be reused, see utils.helpers.depends_on) and
+writes a single checkpoint at the end via `app.update_state`, leaving the
+thread exactly where `app.invoke` would.
+
+Use LangGraph for debug and trace runs; use this for bulk scoring.
+"""
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from state import AgentState
+from nodes.fetch_data import fetch_data, afetch_data
+from nodes.b01 import b01
+from nodes.b02 import b02
+from nodes.b03 import b03
+from nodes.b04 import b04
+from nodes.b05 import b05
+from nodes.merge_bo_results import merge_bo_results
+from nodes.resolve_priority import prioritize
+
+BO_NODES = (b01, b02, b03, b04, b05)
+FINAL_NODE = "prioritize"
+
+# State keys with a reducer (bo_results, bo_fingerprints); the rest are overwritten
+REDUCERS: Dict[str, Callable] = {
+    key: hint.__metadata__[0]
+    for key, hint in AgentState.__annotations__.items()
+    if getattr(hint, "__metadata__", None)
+}
+
+
+def apply_update(state: Dict[str, Any], update: Optional[Mapping[str, Any]]) -> Dict[str, Any]:
+    """Fold a node's return value into `state` the way LangGraph's channels do."""
+    for key, value in (update or {}).items():
+        reducer = REDUCERS.get(key)
+        state[key] = reducer(state[key], value) if reducer is not None and key in state else value
+    return state
+
+
+def _score(state: Dict[str, Any]) -> Dict[str, Any]:
+    # Fan-out: every BO node sees the same post-fetch state, and the updates
+    # are applied together afterwards, as in one LangGraph superstep
+    for update in [fn(state) for fn in BO_NODES]:
+        apply_update(state, update)
+    apply_update(state, merge_bo_results(state))
+    return apply_update(state, prioritize(state))
+
+
+def run_pipeline(state: Mapping[str, Any]) -> Dict[str, Any]:
+    """Run the whole DAG on a copy of `state`; no checkpointing."""
+    state = dict(state)
+    return _score(apply_update(state, fetch_data(state)))
+
+
+async def arun_pipeline(state: Mapping[str, Any]) -> Dict[str, Any]:
+    """`run_pipeline` with the async fetch body."""
+    state = dict(state)
+    return _score(apply_update(state, await afetch_data(state)))
+
+
+def _checkpointed(app, config: Optional[Mapping[str, Any]]) -> bool:
+    return getattr(app, "checkpointer", None) is not None and bool((config or {}).get("configurable", {}).get("thread_id"))
+
+
+def _default_app():
+    from main import get_app
+    return get_app()
+
+
+def invoke(state: Mapping[str, Any], config: Optional[Mapping[str, Any]] = None, app=None) -> Dict[str, Any]:
+    """Fast-path equivalent of `app.invoke(state, config)`.
+
+    With a checkpointer and a thread_id the thread's previous values are the
+    starting point (the input is applied on top through the reducers) and
+    the final state is saved as one checkpoint attributed to the last node.
+    """
+    app = app if app is not None else _default_app()
+    if not _checkpointed(app, config):
+        return run_pipeline(state)
+    start = apply_update(dict(app.get_state(config).values), state)
+    final = run_pipeline(start)
+    app.update_state(config, final, as_node=FINAL_NODE)
+    return final
+
+
+async def ainvoke(state: Mapping[str, Any], config: Optional[Mapping[str, Any]] = None, app=None) -> Dict[str, Any]:
+    """Async `invoke`: async fetch body and async checkpointer calls."""
+    app = app if app is not None else _default_app()
+    if not _checkpointed(app, config):
+        return await arun_pipeline(state)
+    start = apply_update(dict((await app.aget_state(config)).values), state)
+    final = await arun_pipeline(start)
+    await app.aupdate_state(config, final, as_node=FINAL_NODE)
+    return final
@@ -1,110 +1,228 @@
+"""The LangGraph BO workflow: fetch -> b01..b05 -> merge_bo_results -> prioritize.
+
+Importing this module is cheap: it does not load dotenv or LangGraph, does
+not connect a checkpointer and does not compile the graph. All of that
+happens behind `get_app()` on first use, once per process:
+
+* `build_workflow()` assembles the StateGraph;
+* `make_checkpointer()` connects the configured saver (CHECKPOINT_BACKEND);
+* `build_app(checkpointer)` compiles a fresh app (tests pass their own saver).
+
+`main.app`, `main.workflow` and `main.checkpointer` are still available
+(`from main import app` works) and are built on first access.
+"""
+import atexit
 import os
-from dotenv import load_dotenv
+import threading
+
+_lock = threading.RLock()
+_env_loaded = False
+_workflow = None
+_app = None
+
+
+def load_environment() -> None:
+    """Load `.env` and report the tracing setup (once per process).
+
+    Runs before LangGraph is imported and before the first graph run, which
+    is critical for LangSmith tracing to pick up the settings.
+    """
+    global _env_loaded
+    with _lock:
+        if _env_loaded:
+            return
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _env_loaded = True
+
+    # Verify tracing is enabled (AIarm account)
+    tracing_enabled = os.getenv("LANGCHAIN_TRACING_V2", "").lower() in ("true", "1", "yes")
+    api_key = os.getenv("LANGCHAIN_API_KEY") or os.getenv("LANGSMITH_API_KEY")
+    project = os.getenv("LANGCHAIN_PROJECT", "bos-workflow-aiarm")
+
+    if tracing_enabled and api_key:
+        print(f"[OK] LangSmith tracing enabled for project: {project} (AIarm account)")
+    else:
+        print("[WARNING] LangSmith tracing not enabled. Set LANGCHAIN_TRACING_V2=true and LANGCHAIN_API_KEY in .env")
 
-# 1. Load Environment variables FIRST (before any LangGraph imports)
-# This is critical for LangSmith tracing to work
-load_dotenv()
 
-# Verify tracing is enabled (AIarm account)
-tracing_enabled = os.getenv("LANGCHAIN_TRACING_V2", "").lower() in ("true", "1", "yes")
-api_key = os.getenv("LANGCHAIN_API_KEY") or os.getenv("LANGSMITH_API_KEY")
-project = os.getenv("LANGCHAIN_PROJECT", "bos-workflow-aiarm")
+CHECKPOINT_BACKENDS = ("auto", "postgres", "memory")
 
-if tracing_enabled and api_key:
-    print(f"[OK] LangSmith tracing enabled for project: {project} (AIarm account)")
-else:
-    print("[WARNING] LangSmith tracing not enabled. Set LANGCHAIN_TRACING_V2=true and LANGCHAIN_API_KEY in .env")
 
-from langgraph.graph import StateGraph, END
+def _postgres_checkpointer(dsn: str):
+    """A PooledPostgresSaver on `dsn`, sized by the CHECKPOINT_POOL_* env vars."""
+    try:
+        from psycopg import OperationalError
+        from psycopg.conninfo import conninfo_to_dict
+        from psycopg_pool import PoolTimeout
+
+        from utils.checkpointing import DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_SIZE, DEFAULT_POOL_TIMEOUT, PooledPostgresSaver
+    except ImportError as e:
+        raise RuntimeError(f"Postgres persistence is configured but its packages are missing ({e}). "
+                           "Install: pip install langgraph-checkpoint-postgres psycopg-pool, "
+                           "or set CHECKPOINT_BACKEND=memory") from e
 
-# 2. Setup Persistence - Use Postgres for production
-# Fallback to MemorySaver if Postgres not configured
-try:
-    # Try different import paths for PostgresSaver
+    db = conninfo_to_dict(dsn).get("dbname", "?")
+    pool_size = int(os.getenv("CHECKPOINT_POOL_SIZE", str(DEFAULT_POOL_SIZE)))
     try:
-        from langgraph.checkpoint.postgres import PostgresSaver
-    except ImportError:
-        # Alternative import path (if package structure differs)
-        from langgraph_checkpoint_postgres import PostgresSaver
-    
-    # Get Postgres connection string from environment
-    postgres_conn = os.getenv("POSTGRES_CONNECTION_STRING")
-    
-    if postgres_conn:
-        # Initialize Postgres checkpointer
-        checkpointer = PostgresSaver.from_conn_string(postgres_conn)
-        print(f"[OK] Postgres persistence enabled: {os.getenv('POSTGRES_DB', 'bos_workflow_db')}")
+        saver = PooledPostgresSaver(
+            dsn,
+            max_size=pool_size,
+            min_size=int(os.getenv("CHECKPOINT_POOL_MIN_SIZE", "1")),
+            timeout=float(os.getenv("CHECKPOINT_POOL_TIMEOUT", str(DEFAULT_POOL_TIMEOUT))),
+            connect_timeout=float(os.getenv("CHECKPOINT_CONNECT_TIMEOUT", str(DEFAULT_CONNECT_TIMEOUT))),
+        )
+    except (OperationalError, PoolTimeout) as e:
+        raise RuntimeError(f"Postgres checkpointer could not connect to {db} ({e}); "
+                           "check POSTGRES_* or set CHECKPOINT_BACKEND=memory to run without persistence") from e
+    atexit.register(saver.close)
+    print(f"[OK] Postgres persistence enabled: {db} (pool of up to {pool_size} connections)")
+    return saver
+
+
+def make_checkpointer():
+    """The configured checkpointer, wrapped for delta encoding and buffered durability.
+
+    CHECKPOINT_BACKEND picks the saver: "postgres" (a connection-pooled
+    PooledPostgresSaver), "memory" (MemorySaver, nothing persisted) or
+    "auto" (default: Postgres when POSTGRES_CONNECTION_STRING or
+    POSTGRES_PASSWORD is set, else memory). Configured Postgres that cannot
+    be reached is an error, never a silent fallback to memory.
+    """
+    load_environment()
+    from utils.postgres import postgres_dsn
+
+    backend = os.getenv("CHECKPOINT_BACKEND", "auto").lower()
+    if backend not in CHECKPOINT_BACKENDS:
+        raise ValueError(f"CHECKPOINT_BACKEND must be one of {', '.join(CHECKPOINT_BACKENDS)}, got {backend!r}")
+    dsn = postgres_dsn() if backend != "memory" else None
+    if backend == "postgres" and dsn is None:
+        raise RuntimeError("CHECKPOINT_BACKEND=postgres but Postgres is not configured: "
+                           "set POSTGRES_CONNECTION_STRING or POSTGRES_* env vars")
+
+    if dsn is not None:
+        checkpointer = _postgres_checkpointer(dsn)
     else:
-        # Fallback: construct from individual env vars
-        postgres_host = os.getenv("POSTGRES_HOST", "localhost")
-        postgres_port = os.getenv("POSTGRES_PORT", "5432")
-        postgres_db = os.getenv("POSTGRES_DB", "bos_workflow_db")
-        postgres_user = os.getenv("POSTGRES_USER", "postgres")
-        postgres_password = os.getenv("POSTGRES_PASSWORD")
-        
-        if postgres_password:
-            conn_string = f"postgresql://{postgres_user}:{postgres_password}@{postgres_host}:{postgres_port}/{postgres_db}"
-            checkpointer = PostgresSaver.from_conn_string(conn_string)
-            print(f"[OK] Postgres persistence enabled: {postgres_db}")
+        from langgraph.checkpoint.memory import MemorySaver
+        checkpointer = MemorySaver()
+        if backend == "memory":
+            print("[OK] In-memory checkpoints (CHECKPOINT_BACKEND=memory)")
         else:
-            raise ValueError("Postgres password not set")
-            
-except (ImportError, ValueError, Exception) as e:
-    # Fallback to in-memory if Postgres not available
-    from langgraph.checkpoint.memory import MemorySaver
-    checkpointer = MemorySaver()
-    print(f"[WARNING] Postgres persistence not available, using in-memory: {e}")
-    print("  Install: pip install langgraph-checkpoint-postgres psycopg2-binary")
-    print("  Set POSTGRES_CONNECTION_STRING or POSTGRES_* env vars to enable Postgres persistence")
-
-from state import AgentState
-from nodes.fetch_data import fetch_data
-from nodes.resolve_priority import prioritize
-
-# New BO nodes
-from nodes.b01 import b01
-from nodes.b02 import b02
-from nodes.b03 import b03
-from nodes.b04 import b04
-from nodes.b05 import b05
-from nodes.merge_bo_results import merge_bo_results
-
-# 3. Create Workflow Graph
-workflow = StateGraph(AgentState)
-
-# Add Nodes
-workflow.add_node("fetch", fetch_data)
-workflow.add_node("b01", b01)
-workflow.add_node("b02", b02)
-workflow.add_node("b03", b03)
-workflow.add_node("b04", b04)
-workflow.add_node("b05", b05)
-workflow.add_node("merge_bo_results", merge_bo_results)
-workflow.add_node("prioritize", prioritize)
-
-# Define Edges
-workflow.set_entry_point("fetch")
-
-workflow.add_edge("fetch", "b01")
-workflow.add_edge("fetch", "b02")
-workflow.add_edge("fetch", "b03")
-workflow.add_edge("fetch", "b04")
-workflow.add_edge("fetch", "b05")
-
-workflow.add_edge("b01", "merge_bo_results")
-workflow.add_edge("b02", "merge_bo_results")
-workflow.add_edge("b03", "merge_bo_results")
-workflow.add_edge("b04", "merge_bo_results")
-workflow.add_edge("b05", "merge_bo_results")
-
-workflow.add_edge("merge_bo_results", "prioritize")
-workflow.add_edge("prioritize", END)
-
-# 4. Compile with Checkpointer
-# This enables the "persistence" requirement for resume/replay/debugging
-app = workflow.compile(checkpointer=checkpointer)
+            print("[WARNING] Postgres persistence not configured, using in-memory checkpoints")
+            print("  Set POSTGRES_CONNECTION_STRING or POSTGRES_* env vars to enable Postgres persistence")
+
+    # Opt-in: dict channels (bo_results, raw_metrics, ...) are stored as patches against the
+    # previous checkpoint, with a full copy every CHECKPOINT_DELTA_DEPTH steps (0 = off, the default).
+    from utils.checkpointing import BufferedCheckpointSaver, DeltaCheckpointSaver
+    delta_depth = int(os.getenv("CHECKPOINT_DELTA_DEPTH", "0"))
+    if delta_depth > 0:
+        checkpointer = DeltaCheckpointSaver(checkpointer, max_depth=delta_depth)
+
+    # Checkpoint durability: "full" writes every superstep (default, for debug runs),
+    # "batched" buffers them, "final" keeps only each run's last checkpoint.
+    # Runs can override it with config["configurable"]["durability"].
+    return BufferedCheckpointSaver(
+        checkpointer,
+        durability=os.getenv("CHECKPOINT_DURABILITY", "full"),
+        batch_size=int(os.getenv("CHECKPOINT_BATCH_SIZE", "500")),
+    )
+
+
+def build_workflow():
+    """A new, uncompiled StateGraph of the BO workflow."""
+    load_environment()
+    from langchain_core.runnables import RunnableLambda
+    from langgraph.graph import StateGraph, END
+
+    from state import AgentState
+    from nodes.fetch_data import fetch_data, afetch_data
+    from nodes.resolve_priority import prioritize
+
+    # New BO nodes
+    from nodes.b01 import b01
+    from nodes.b02 import b02
+    from nodes.b03 import b03
+    from nodes.b04 import b04
+    from nodes.b05 import b05
+    from nodes.merge_bo_results import merge_bo_results
+
+    workflow = StateGraph(AgentState)
+
+    # Add Nodes
+    # fetch has a sync and an async body: invoke() uses the pooled session,
+    # ainvoke()/abatch() issue the endpoint calls concurrently on the event loop
+    workflow.add_node("fetch", RunnableLambda(fetch_data, afunc=afetch_data, name="fetch"))
+    workflow.add_node("b01", b01)
+    workflow.add_node("b02", b02)
+    workflow.add_node("b03", b03)
+    workflow.add_node("b04", b04)
+    workflow.add_node("b05", b05)
+    workflow.add_node("merge_bo_results", merge_bo_results)
+    workflow.add_node("prioritize", prioritize)
+
+    # Define Edges
+    workflow.set_entry_point("fetch")
+
+    workflow.add_edge("fetch", "b01")
+    workflow.add_edge("fetch", "b02")
+    workflow.add_edge("fetch", "b03")
+    workflow.add_edge("fetch", "b04")
+    workflow.add_edge("fetch", "b05")
+
+    workflow.add_edge("b01", "merge_bo_results")
+    workflow.add_edge("b02", "merge_bo_results")
+    workflow.add_edge("b03", "merge_bo_results")
+    workflow.add_edge("b04", "merge_bo_results")
+    workflow.add_edge("b05", "merge_bo_results")
+
+    workflow.add_edge("merge_bo_results", "prioritize")
+    workflow.add_edge("prioritize", END)
+    return workflow
+
+
+def get_workflow():
+    """The process-wide workflow graph, built on first use."""
+    global _workflow
+    with _lock:
+        if _workflow is None:
+            _workflow = build_workflow()
+        return _workflow
+
+
+def build_app(checkpointer=None):
+    """Compile the workflow with `checkpointer` (default: `make_checkpointer()`).
+
+    The checkpointer enables the "persistence" requirement for resume/replay/debugging.
+    """
+    if checkpointer is None:
+        checkpointer = make_checkpointer()
+    return get_workflow().compile(checkpointer=checkpointer)
+
+
+def get_app():
+    """The process-wide compiled app, built (and its checkpointer connected) on first use."""
+    global _app
+    with _lock:
+        if _app is None:
+            _app = build_app()
+        return _app
+
+
+def __getattr__(name):
+    # Module attributes built on first access (PEP 562)
+    if name == "app":
+        return get_app()
+    if name == "workflow":
+        return get_workflow()
+    if name == "checkpointer":
+        return get_app().checkpointer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    app = get_app()
+
     # Example usage with Persistence
     initial_state = {
         "agent_id": "123",
@@ -113,7 +231,7 @@ if __name__ == "__main__":
         "bo_results": {},
         "final_priority_order": []
     }
-    
+
     # 4. Use a thread_id config
     # This ID tracks the specific workflow session in the database
     config = {"configurable": {"thread_id": "session_1"}}
@@ -124,11 +242,11 @@ if __name__ == "__main__":
         # Traces will appear in the project specified by LANGCHAIN_PROJECT
         # invoke now takes the config argument
         result = app.invoke(initial_state, config=config)
-        
+
         print("Workflow executed successfully!")
         print(f"Final priority order: {result.get('final_priority_order', [])}")
         print(f"BO Results: {result.get('bo_results', {})}")
-        
+
         # Verify Persistence: You can now query the state later using:
         # snapshot = app.get_state(config)
         # print("Saved State Snapshot:", snapshot.values)
@@ -136,4 +254,4 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Error running workflow: {e}")
         print("\nNote: Make sure the FastAPI backend is running on http://localhost:8000")
-        raise
\ No newline at end of file
+        raise
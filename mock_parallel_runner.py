@@ -1,7 +1,6 @@
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
-import json
 import logging
 import os
 from dotenv import load_dotenv
@@ -13,6 +12,8 @@ from nodes.b04 import b04
 from nodes.b05 import b05
 from nodes.merge_bo_results import merge_bo_results
 from nodes.resolve_priority import prioritize
+from utils.instrumentation import write_report
+from utils.snapshots import COMPRESSIONS, load_snapshot, save_snapshot
 
 # load env for optional tracing integrations (e.g. LANGCHAIN_API_KEY or LANGSMITH_API_KEY)
 load_dotenv()
@@ -28,24 +29,22 @@ def _merge_into(state: dict, partial: dict, lock: threading.Lock):
         return
     with lock:
         for k, v in partial.items():
-            if k == "bo_results":
-                state.setdefault("bo_results", {}).update(v)
+            if k in ("bo_results", "bo_fingerprints"):
+                state.setdefault(k, {}).update(v)
             else:
                 state[k] = v
 
 
-def _save_state(state: dict, thread_id: str, path: str = None):
-    if path is None:
-        path = f"mock_parallel_state_{thread_id}.json"
+def _save_state(state: dict, thread_id: str, path: str = None, compression: str = None):
     try:
-        with open(path, "w", encoding="utf-8") as fh:
-            json.dump(state, fh, indent=2, ensure_ascii=False)
+        path = save_snapshot(state, thread_id, path, "mock_parallel_state_{thread_id}.json", compression)
         logger.info("Saved parallel-run state to %s", path)
     except Exception as e:
         logger.warning("Failed to save parallel-run state: %s", e)
 
 
-def run_parallel_mock(thread_id: str = "session_1", persist_path: str = None):
+def run_parallel_mock(thread_id: str = "session_1", persist_path: str = None, replay: dict = None,
+                      compression: str = None):
     state = {
         "agent_id": "123",
         "date": "2024-01-01",
@@ -81,6 +80,8 @@ def run_parallel_mock(thread_id: str = "session_1", persist_path: str = None):
         "bo_results": {},
         "final_priority_order": []
     }
+    if replay is not None:
+        state.update(agent_id=replay["agent_id"], date=replay["date"], raw_metrics=replay["raw_metrics"])
 
     lock = threading.Lock()
     funcs = [b01, b02, b03, b04, b05]
@@ -117,12 +118,22 @@ def run_parallel_mock(thread_id: str = "session_1", persist_path: str = None):
     logger.info("Final priority order: %s", state.get("final_priority_order"))
 
     # persist snapshot
-    _save_state(state, thread_id, persist_path)
+    _save_state(state, thread_id, persist_path, compression)
 
 
 if __name__ == "__main__":
     p = argparse.ArgumentParser(description="Run mock parallel workflow with optional persistence/tracing")
     p.add_argument("--thread-id", default=os.environ.get("THREAD_ID", "session_1"), help="thread/session id to tag persisted state")
-    p.add_argument("--persist-path", default=None, help="optional path to save state snapshot (JSON)")
+    p.add_argument("--persist-path", default=None,
+                   help="optional path to save state snapshot (JSON; *.seg appends to a binary snapshot segment)")
+    p.add_argument("--compress", choices=[c for c in COMPRESSIONS if c], default=None,
+                   help="compress records when creating a new .seg segment")
+    p.add_argument("--replay-from", default=None,
+                   help="re-run from the inputs of a saved snapshot (JSON file, or the --thread-id record of a .seg)")
+    p.add_argument("--timings-out", default=None,
+                   help="optional path for per-node timings (*.prom: Prometheus text, else JSON)")
     args = p.parse_args()
-    run_parallel_mock(args.thread_id, args.persist_path)
+    replay = load_snapshot(args.replay_from, args.thread_id) if args.replay_from else None
+    run_parallel_mock(args.thread_id, args.persist_path, replay, args.compress)
+    if args.timings_out:
+        write_report(args.timings_out)
@@ -1,22 +1,26 @@
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from state import AgentState
-from utils.config import get_config
+from utils.helpers import depends_on
+from utils.instrumentation import timed
+from utils.config import config_for
 
 
+@timed("b01")
+@depends_on(
+    "BO1",
+    metrics=(
+        "performance.pl_sales_last_12m",
+        "performance.mtd_sales_value",
+    ),
+    config=("benchmark",),
+)
 def b01(state: AgentState):
     """Return partial state with BO1 results (no in-place mutation)."""
     metrics = state.get("raw_metrics", {})
     perf = metrics.get("performance", {})
 
-    # Load Config
-    config = get_config()
-    bo_conf = next((b for b in config.get("business_objectives", []) if b["bo_code"] == "BO1"), {})
-
-    # Benchmark params
-    bench_conf = bo_conf.get("benchmark", {})
-    growth_multiplier = bench_conf.get("growth_multiplier", 2.0)
+    # Benchmark params from the config snapshot this run is pinned to
+    bo_conf = config_for(state).bo("BO1")
+    growth_multiplier = bo_conf.benchmark.get("growth_multiplier", 2.0)
 
     last_12m_pl = perf.get("pl_sales_last_12m", 240)
     monthly_benchmark = (last_12m_pl * growth_multiplier) / 12.0
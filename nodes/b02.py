@@ -1,20 +1,29 @@
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from state import AgentState
-from utils.config import get_config
-
-
+from utils.helpers import depends_on
+from utils.instrumentation import timed
+from utils.config import config_for
+
+
+@timed("b02")
+@depends_on(
+    "BO2",
+    metrics=(
+        "dc_activity.last_month_unique_dcs",
+        "dc_activity.total_dcs",
+        "dc_activity.unique_dcs_visited",
+        "dc_activity.last_month_checkins",
+        "dc_activity.check_ins_count",
+    ),
+    config=("factors.B2A", "factors.B2B"),
+)
 def b02(state: AgentState):
     """Return partial state with BO2 results (no in-place mutation)."""
     metrics = state.get("raw_metrics", {})
     dc_data = metrics.get("dc_activity", {})
 
-    config = get_config()
-    bo_conf = next((b for b in config.get("business_objectives", []) if b["bo_code"] == "BO2"), {})
-    factors = {f["factor_code"]: f for f in bo_conf.get("factors", [])}
+    bo_conf = config_for(state).bo("BO2")
 
-    f_cov_conf = factors.get("B2A", {}).get("benchmark", {})
+    f_cov_conf = bo_conf.factor("B2A")
     multiplier_cov = f_cov_conf.get("multiplier", 1.5)
 
     last_month_unique = dc_data.get("last_month_unique_dcs", 20)
@@ -24,7 +33,7 @@ def b02(state: AgentState):
     actual_cov = dc_data.get("unique_dcs_visited", 0)
     ratio_cov = min(actual_cov / benchmark_cov, 1.5) if benchmark_cov > 0 else 0
 
-    f_eff_conf = factors.get("B2B", {}).get("benchmark", {})
+    f_eff_conf = bo_conf.factor("B2B")
     multiplier_eff = f_eff_conf.get("multiplier", 1.25)
 
     last_month_total = dc_data.get("last_month_checkins", 40)
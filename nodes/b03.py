@@ -1,19 +1,25 @@
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from state import AgentState
-from utils.config import get_config
-
-
+from utils.helpers import depends_on
+from utils.instrumentation import timed
+
+
+@timed("b03")
+@depends_on(
+    "BO3",
+    metrics=(
+        "outstanding.last_month_ar",
+        "outstanding.outstanding_amount",
+        "outstanding.ageing_index",
+        "performance.mtd_sales_value",
+        "performance.last_month_sales",
+    ),
+)
 def b03(state: AgentState):
     """Return partial state with BO3 results (no in-place mutation)."""
     metrics = state.get("raw_metrics", {})
     outstanding = metrics.get("outstanding", {})
     perf = metrics.get("performance", {})
 
-    config = get_config()
-    bo_conf = next((b for b in config.get("business_objectives", []) if b["bo_code"] == "BO3"), {})
-
     last_month_ar = outstanding.get("last_month_ar", 100000)
     sales_mtd = perf.get("mtd_sales_value", 0)
     last_month_sales = perf.get("last_month_sales", 1) or 1
@@ -1,21 +1,30 @@
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from state import AgentState
-from utils.config import get_config
-
-
+from utils.helpers import depends_on
+from utils.instrumentation import timed
+from utils.config import config_for
+
+
+@timed("b04")
+@depends_on(
+    "BO4",
+    metrics=(
+        "performance.last_month_sales",
+        "performance.mtd_sales_value",
+        "performance.last_month_active_dcs",
+        "performance.unique_transacting_dcs_mtd",
+        "dc_activity.total_dcs",
+    ),
+    config=("factors.B4A", "factors.B4B"),
+)
 def b04(state: AgentState):
     """Return partial state with BO4 results (no in-place mutation)."""
     metrics = state.get("raw_metrics", {})
     perf = metrics.get("performance", {})
     dc_data = metrics.get("dc_activity", {})
 
-    config = get_config()
-    bo_conf = next((b for b in config.get("business_objectives", []) if b["bo_code"] == "BO4"), {})
-    factors = {f["factor_code"]: f for f in bo_conf.get("factors", [])}
+    bo_conf = config_for(state).bo("BO4")
 
-    f_vel_conf = factors.get("B4A", {}).get("benchmark", {})
+    f_vel_conf = bo_conf.factor("B4A")
     vel_mult = f_vel_conf.get("multiplier", 1.15)
 
     last_month_sales = perf.get("last_month_sales", 1)
@@ -25,7 +34,7 @@ def b04(state: AgentState):
     ratio_vel = actual_sales / benchmark_vel if benchmark_vel > 0 else 0
     ratio_vel = min(ratio_vel, 1.5)
 
-    f_spr_conf = factors.get("B4B", {}).get("benchmark", {})
+    f_spr_conf = bo_conf.factor("B4B")
     mult_total = f_spr_conf.get("total_dcs_multiplier", 0.6)
     mult_active = f_spr_conf.get("active_dcs_multiplier", 1.2)
 
@@ -1,10 +1,20 @@
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from state import AgentState
-from utils.config import get_config
-
-
+from utils.helpers import depends_on
+from utils.instrumentation import timed
+from utils.config import config_for
+
+
+@timed("b05")
+@depends_on(
+    "BO5",
+    metrics=(
+        "performance.pl_active_dcs_last_quarter",
+        "meetings.farmer_meetings_mtd",
+        "dc_activity.total_dcs",
+        "onboarding.new_retailers_mtd",
+    ),
+    config=("factors.B5A", "factors.B5B", "combine_logic"),
+)
 def b05(state: AgentState):
     """Return partial state with BO5 results (no in-place mutation)."""
     metrics = state.get("raw_metrics", {})
@@ -12,11 +22,9 @@ def b05(state: AgentState):
     perf = metrics.get("performance", {})
     dc_data = metrics.get("dc_activity", {})
 
-    config = get_config()
-    bo_conf = next((b for b in config.get("business_objectives", []) if b["bo_code"] == "BO5"), {})
-    factors = {f["factor_code"]: f for f in bo_conf.get("factors", [])}
+    bo_conf = config_for(state).bo("BO5")
 
-    f_meet_conf = factors.get("B5A", {}).get("benchmark", {})
+    f_meet_conf = bo_conf.factor("B5A")
     mult_pl = f_meet_conf.get("pl_dcs_multiplier", 0.25)
     cap_meetings = f_meet_conf.get("cap", 6)
 
@@ -25,7 +33,7 @@ def b05(state: AgentState):
     actual_meet = metrics.get("meetings", {}).get("farmer_meetings_mtd", 0)
     ratio_meet = actual_meet / benchmark_meet if benchmark_meet > 0 else 0
 
-    f_new_conf = factors.get("B5B", {}).get("benchmark", {})
+    f_new_conf = bo_conf.factor("B5B")
     mult_dcs = f_new_conf.get("total_dcs_multiplier", 0.02)
     min_floor = f_new_conf.get("min_floor", 1)
 
@@ -34,7 +42,7 @@ def b05(state: AgentState):
     actual_new = onboarding.get("new_retailers_mtd", 0)
     ratio_new = actual_new / benchmark_new if benchmark_new > 0 else 0
 
-    weights = bo_conf.get("combine_logic", {}).get("weights", {"B5A": 0.6, "B5B": 0.4})
+    weights = bo_conf.combine_logic.get("weights", {"B5A": 0.6, "B5B": 0.4})
     wa = weights.get("B5A", 0.6)
     wb = weights.get("B5B", 0.4)
 
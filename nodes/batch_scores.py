@@ -0,0 +1,129 @@
+from typing import Dict, List, Any
+
+import numpy as np
+
+from utils.config import CompiledConfig, get_compiled_config
+
+# Every raw_metrics field read by b01..b05, as "section.field" column names
+METRIC_FIELDS = (
+    "performance.pl_sales_last_12m",
+    "performance.mtd_sales_value",
+    "performance.last_month_sales",
+    "performance.unique_transacting_dcs_mtd",
+    "performance.last_month_active_dcs",
+    "performance.pl_active_dcs_last_quarter",
+    "dc_activity.last_month_unique_dcs",
+    "dc_activity.total_dcs",
+    "dc_activity.unique_dcs_visited",
+    "dc_activity.last_month_checkins",
+    "dc_activity.check_ins_count",
+    "outstanding.last_month_ar",
+    "outstanding.outstanding_amount",
+    "outstanding.ageing_index",
+    "onboarding.new_retailers_mtd",
+    "meetings.farmer_meetings_mtd",
+)
+
+# Per-agent output keys, in the same shape the BO nodes return
+RESULT_KEYS = {
+    "BO1": ("ratio", "actual", "benchmark"),
+    "BO2": ("ratio", "coverage_ratio", "effort_ratio"),
+    "BO3": ("ratio", "quantum_ratio"),
+    "BO4": ("ratio", "velocity", "spread"),
+    "BO5": ("ratio", "meeting_ratio", "onboarding_ratio"),
+}
+
+
+def metrics_to_columns(raw_metrics: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+    """Turn per-agent nested raw_metrics into float64 columns (NaN = missing)."""
+    columns = {}
+    for name in METRIC_FIELDS:
+        section, field = name.split(".")
+        col = np.full(len(raw_metrics), np.nan)
+        for i, metrics in enumerate(raw_metrics):
+            value = (metrics.get(section) or {}).get(field)
+            if value is not None:
+                col[i] = value
+        columns[name] = col
+    return columns
+
+
+def _col(columns, name, default, n):
+    col = columns.get(name)
+    if col is None:
+        return np.full(n, float(default))
+    col = np.asarray(col, dtype=np.float64)
+    return np.where(np.isnan(col), default, col)
+
+
+def _div(num, den):
+    """num / den where den > 0, else 0 (the nodes' divide-by-zero fallback)."""
+    return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+
+def score_batch(columns: Dict[str, np.ndarray], config: CompiledConfig = None) -> Dict[str, Dict[str, np.ndarray]]:
+    """Score BO1..BO5 for N agents at once.
+
+    `columns` maps METRIC_FIELDS names to length-N arrays; missing columns or
+    NaN entries take the same defaults the per-agent nodes use. Results are
+    bit-for-bit equal to calling b01..b05 on each agent.
+    """
+    cfg = config if config is not None else get_compiled_config()
+    n = len(next(iter(columns.values()))) if columns else 0
+
+    def col(name, default):
+        return _col(columns, name, default, n)
+
+    # BO1 - Private Label Sales
+    growth_multiplier = cfg.bo("BO1").benchmark.get("growth_multiplier", 2.0)
+    monthly_benchmark = (col("performance.pl_sales_last_12m", 240) * growth_multiplier) / 12.0
+    actual_mtd = col("performance.mtd_sales_value", 0)
+    bo1 = {"ratio": _div(actual_mtd, monthly_benchmark), "actual": actual_mtd, "benchmark": monthly_benchmark}
+
+    # BO2 - DC Check-ins (coverage x effort, each capped at 1.5)
+    bo2_conf = cfg.bo("BO2")
+    benchmark_cov = np.minimum(col("dc_activity.last_month_unique_dcs", 20) * bo2_conf.factor("B2A").get("multiplier", 1.5),
+                               col("dc_activity.total_dcs", 1))
+    ratio_cov = np.minimum(_div(col("dc_activity.unique_dcs_visited", 0), benchmark_cov), 1.5)
+    benchmark_eff = col("dc_activity.last_month_checkins", 40) * bo2_conf.factor("B2B").get("multiplier", 1.25)
+    ratio_eff = np.minimum(_div(col("dc_activity.check_ins_count", 0), benchmark_eff), 1.5)
+    bo2 = {"ratio": ratio_cov * ratio_eff, "coverage_ratio": ratio_cov, "effort_ratio": ratio_eff}
+
+    # BO3 - AR Control (quantum clamped to [0.5, 1.5], times ageing)
+    last_month_sales = col("performance.last_month_sales", 1)
+    target_ar = col("outstanding.last_month_ar", 100000) * (actual_mtd / np.where(last_month_sales == 0, 1.0, last_month_sales))
+    actual_ar = col("outstanding.outstanding_amount", 0)
+    ratio_quantum = np.where(actual_ar > 0, _div(target_ar, actual_ar), 2.0)
+    ratio_quantum = np.maximum(0.5, np.minimum(ratio_quantum, 1.5))
+    bo3 = {"ratio": ratio_quantum * col("outstanding.ageing_index", 1.0), "quantum_ratio": ratio_quantum}
+
+    # BO4 - Overall Sales (velocity x spread, each capped at 1.5)
+    bo4_conf = cfg.bo("BO4")
+    spread_conf = bo4_conf.factor("B4B")
+    ratio_vel = np.minimum(_div(actual_mtd, last_month_sales * bo4_conf.factor("B4A").get("multiplier", 1.15)), 1.5)
+    benchmark_spread = np.minimum(col("dc_activity.total_dcs", 10) * spread_conf.get("total_dcs_multiplier", 0.6),
+                                  col("performance.last_month_active_dcs", 5) * spread_conf.get("active_dcs_multiplier", 1.2))
+    ratio_spread = np.minimum(_div(col("performance.unique_transacting_dcs_mtd", 0), benchmark_spread), 1.5)
+    bo4 = {"ratio": ratio_vel * ratio_spread, "velocity": ratio_vel, "spread": ratio_spread}
+
+    # BO5 - Market Development (weighted sum of meetings and onboarding)
+    bo5_conf = cfg.bo("BO5")
+    meet_conf, new_conf = bo5_conf.factor("B5A"), bo5_conf.factor("B5B")
+    benchmark_meet = np.minimum(col("performance.pl_active_dcs_last_quarter", 20) * meet_conf.get("pl_dcs_multiplier", 0.25),
+                                meet_conf.get("cap", 6))
+    ratio_meet = _div(col("meetings.farmer_meetings_mtd", 0), benchmark_meet)
+    benchmark_new = np.maximum(new_conf.get("min_floor", 1), col("dc_activity.total_dcs", 20) * new_conf.get("total_dcs_multiplier", 0.02))
+    ratio_new = _div(col("onboarding.new_retailers_mtd", 0), benchmark_new)
+    weights = bo5_conf.combine_logic.get("weights", {"B5A": 0.6, "B5B": 0.4})
+    bo5 = {
+        "ratio": (ratio_meet * weights.get("B5A", 0.6)) + (ratio_new * weights.get("B5B", 0.4)),
+        "meeting_ratio": ratio_meet,
+        "onboarding_ratio": ratio_new,
+    }
+
+    return {"BO1": bo1, "BO2": bo2, "BO3": bo3, "BO4": bo4, "BO5": bo5}
+
+
+def to_bo_results(scores: Dict[str, Dict[str, np.ndarray]], i: int) -> Dict[str, Dict[str, float]]:
+    """Row `i` of a score_batch result, shaped like the merged node output."""
+    return {bo: {key: float(cols[key][i]) for key in RESULT_KEYS[bo]} for bo, cols in scores.items()}
@@ -1,6 +1,3 @@
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
 from state import AgentState
 
 # Backwards-compatible wrapper: call individual BO nodes so older callers still work
@@ -18,8 +15,8 @@ def calculate_scores(state: AgentState):
         if not partial:
             return state
         for k, v in partial.items():
-            if k == "bo_results":
-                state.setdefault("bo_results", {}).update(v)
+            if k in ("bo_results", "bo_fingerprints"):
+                state.setdefault(k, {}).update(v)
             else:
                 state[k] = v
         return state
@@ -1,8 +1,46 @@
-import requests
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent.parent))
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from state import AgentState
+from utils import http_client
+from utils.columnar import ColumnarTable
+from utils.config import pin_config
+from utils.instrumentation import count, timed
+from utils.metrics_cache import MetricsCache
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "http://127.0.0.1:8000/api"
+
+# Snapshot table name -> API endpoint (discovered in /docs)
+ENDPOINTS = {
+    "perf": "sebo4overallsalesperformancedaily",
+    "dc_perf": "sebo2dccheckinsperformancedaily",
+    "dc_base": "sebo2dccheckinsbaselinemonthly",
+    "ar": "sebo3arcontrolperformancedaily",
+    "pl_perf": "sebo1plperformancedaily",
+}
+
+# Common identifier keys used by the API: 'se_id' or 'ff_agent_id'
+AGENT_KEYS = ('se_id', 'ff_agent_id', 'agent_id')
+
+# Server-side filter/pagination query parameters. A backend that ignores
+# them simply returns the full list, which is still matched client-side.
+AGENT_FILTER_PARAM = 'se_id'
+DATE_FILTER_PARAM = 'date'
+PAGE_SIZE = 1000
+
+# Fields each table contributes to raw_metrics (see _build_raw_metrics);
+# the columnar snapshot keeps only these
+SNAPSHOT_FIELDS = {
+    "perf": ('sales_mtd', 'active_days_mtd', 'unique_transacting_dcs_mtd', 'last12m_order_count'),
+    "dc_perf": ('unique_dcs_checked_in_mtd', 'total_checkins_mtd'),
+    "dc_base": ('total_dcs_in_portfolio', 'total_dcs', 'effort_benchmark_checkins'),
+    "ar": ('net_ar_today', 'ar_composite_score'),
+    "pl_perf": ('pl_unique_cart_orders_mtd',),
+}
 
 
 def _find_for_agent(items, agent_identifiers, agent_id):
@@ -15,25 +53,19 @@ def _find_for_agent(items, agent_identifiers, agent_id):
     return items[0] if items else {}
 
 
-def fetch_data(state: AgentState):
-    base_url = "http://127.0.0.1:8000/api"
-
-    # New API endpoints discovered in /docs
-    perf_list = requests.get(f"{base_url}/sebo4overallsalesperformancedaily/").json()
-    dc_perf_list = requests.get(f"{base_url}/sebo2dccheckinsperformancedaily/").json()
-    dc_baseline_list = requests.get(f"{base_url}/sebo2dccheckinsbaselinemonthly/").json()
-    ar_list = requests.get(f"{base_url}/sebo3arcontrolperformancedaily/").json()
-    pl_perf_list = requests.get(f"{base_url}/sebo1plperformancedaily/").json()
-
-    agent_id = state.get('agent_id')
+def _index_rows(items, agent_identifiers=AGENT_KEYS):
+    """Map str(agent id) -> row, keeping the first row that carries the id
+    under any identifier key (same match `_find_for_agent` would return).
+    A null id is no agent: it is not indexed as "None"."""
+    index = {}
+    for it in items:
+        for key in agent_identifiers:
+            if it.get(key) is not None:
+                index.setdefault(str(it[key]), it)
+    return index
 
-    # Try common identifier keys used by the API: 'se_id' or 'ff_agent_id'
-    perf = _find_for_agent(perf_list, ['se_id', 'ff_agent_id', 'agent_id'], agent_id)
-    dc_perf = _find_for_agent(dc_perf_list, ['se_id', 'ff_agent_id', 'agent_id'], agent_id)
-    dc_base = _find_for_agent(dc_baseline_list, ['se_id', 'ff_agent_id', 'agent_id'], agent_id)
-    ar = _find_for_agent(ar_list, ['se_id', 'ff_agent_id', 'agent_id'], agent_id)
-    pl_perf = _find_for_agent(pl_perf_list, ['se_id', 'ff_agent_id', 'agent_id'], agent_id)
 
+def _build_raw_metrics(perf, dc_perf, dc_base, ar, pl_perf):
     # Map API fields into the existing internal raw_metrics shape expected by nodes
     performance = {
         # prefer 'sales_mtd' from overall sales, fallback to PL 'pl_unique_cart_orders_mtd'
@@ -65,11 +97,384 @@ def fetch_data(state: AgentState):
         'new_retailers_last12m': 1
     }
 
-    state['raw_metrics'] = {
+    return {
         'performance': performance,
         'dc_activity': dc_activity,
         'outstanding': outstanding,
         'onboarding': onboarding
     }
 
-    return state
\ No newline at end of file
+
+class MetricsSnapshot:
+    """One download of every sebo endpoint for a date, indexed by agent id.
+
+    Lookups are O(1); an agent missing from a table falls back to that
+    table's first row, exactly like `_find_for_agent`.
+    """
+
+    def __init__(self, date, tables):
+        self.date = date
+        self._first = {name: (rows[0] if rows else {}) for name, rows in tables.items()}
+        self._index = {name: _index_rows(rows) for name, rows in tables.items()}
+
+    def rows_for(self, agent_id):
+        key = str(agent_id)
+        return {name: index.get(key, self._first[name]) for name, index in self._index.items()}
+
+    def raw_metrics_for(self, agent_id):
+        return _build_raw_metrics(**self.rows_for(agent_id))
+
+    def agent_ids(self):
+        """All agent ids seen in any table, in first-seen order."""
+        return _union_ids(self._index.values())
+
+    def metric_columns(self, agent_ids):
+        """batch_scores columns for `agent_ids` (built row by row)."""
+        from nodes.batch_scores import metrics_to_columns
+        return metrics_to_columns([self.raw_metrics_for(a) for a in agent_ids])
+
+
+def _union_ids(indexes):
+    seen = {}
+    for index in indexes:
+        for agent_id in index:
+            seen.setdefault(agent_id, None)
+    return list(seen)
+
+
+class ColumnarSnapshot:
+    """Drop-in MetricsSnapshot backed by ColumnarTables.
+
+    Rows are parsed straight into float64 columns, so a 20k-agent snapshot
+    costs a few bytes per field instead of a dict per row. Numeric values
+    come back as floats and null/non-numeric values count as missing.
+    """
+
+    def __init__(self, date, tables):
+        self.date = date
+        self.tables = tables
+
+    def rows_for(self, agent_id):
+        return {name: t.row(t.row_index(agent_id)) for name, t in self.tables.items()}
+
+    def raw_metrics_for(self, agent_id):
+        return _build_raw_metrics(**self.rows_for(agent_id))
+
+    def agent_ids(self):
+        return _union_ids(t.index for t in self.tables.values())
+
+    def metric_columns(self, agent_ids):
+        """batch_scores columns for `agent_ids`, gathered straight from the
+        stored arrays. Mirrors `_build_raw_metrics`; fields it never sets are
+        left out so the scorer applies the node defaults."""
+        import numpy as np
+
+        def col(name, field):
+            table = self.tables[name]
+            return table.column(field, [table.row_index(a) for a in agent_ids])
+
+        def present_or(values, fallback):
+            return np.where(np.isnan(values), fallback, values)
+
+        sales = col("perf", 'sales_mtd')
+        pl_orders = present_or(col("pl_perf", 'pl_unique_cart_orders_mtd'), 0.0)
+        return {
+            # `sales_mtd or pl_unique_cart_orders_mtd`: missing or zero falls back
+            "performance.mtd_sales_value": np.where(np.isnan(sales) | (sales == 0), pl_orders, sales),
+            "dc_activity.unique_dcs_visited": present_or(col("dc_perf", 'unique_dcs_checked_in_mtd'), 0.0),
+            "dc_activity.total_dcs": present_or(col("dc_base", 'total_dcs_in_portfolio'),
+                                                present_or(col("dc_base", 'total_dcs'), 0.0)),
+            "dc_activity.check_ins_count": present_or(col("dc_perf", 'total_checkins_mtd'), 0.0),
+            "outstanding.outstanding_amount": present_or(col("ar", 'net_ar_today'),
+                                                         present_or(col("ar", 'ar_composite_score'), 0.0)),
+            "onboarding.new_retailers_mtd": pl_orders,
+        }
+
+    @property
+    def nbytes(self):
+        return sum(t.nbytes for t in self.tables.values())
+
+
+def _endpoint_urls(base_url):
+    return {name: f"{base_url}/{path}/" for name, path in ENDPOINTS.items()}
+
+
+def _query(date=None, agent_id=None, page_size=PAGE_SIZE):
+    params = {'page_size': page_size}
+    if date is not None:
+        params[DATE_FILTER_PARAM] = date
+    if agent_id is not None:
+        params[AGENT_FILTER_PARAM] = agent_id
+    return params
+
+
+def _first_and_match(rows, agent_id):
+    """Consume rows until the agent's row is found; keeps at most two rows."""
+    first = None
+    key = str(agent_id)
+    try:
+        for row in rows:
+            if first is None:
+                first = row
+            if any(k in row and str(row.get(k)) == key for k in AGENT_KEYS):
+                return row
+    finally:
+        rows.close()  # stop streaming the rest of the response
+    return first if first is not None else {}
+
+
+# The five endpoint calls run concurrently over the pooled keep-alive session
+# (created on first use; see shutdown_fetch_pool)
+_fetch_pool = None
+_fetch_pool_lock = threading.Lock()
+
+
+def _get_fetch_pool() -> ThreadPoolExecutor:
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=len(ENDPOINTS), thread_name_prefix="sebo-fetch")
+        return _fetch_pool
+
+
+def shutdown_fetch_pool():
+    """Stop the fetch threads (waiting for running fetches); the next fetch
+    starts a new pool. Call before forking worker processes, so the children
+    do not inherit locks held by live threads."""
+    global _fetch_pool
+    with _fetch_pool_lock:
+        pool, _fetch_pool = _fetch_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+# Optional on-disk cache of full-date payloads, see `set_cache`
+_cache = None
+
+
+def set_cache(cache: MetricsCache = None):
+    """Route full-date downloads through `cache` (None disables caching)."""
+    global _cache
+    _cache = cache
+
+
+def _collect(name, rows, columnar):
+    if columnar:
+        return ColumnarTable.from_rows(SNAPSHOT_FIELDS[name], AGENT_KEYS, rows)
+    return list(rows)
+
+
+def _write_through(rows, writer):
+    for row in rows:
+        writer.write(row)
+        yield row
+
+
+def _load_table(name, base_url, url, params, columnar, date):
+    endpoint = ENDPOINTS[name]
+    cached = _cache.iter_rows(base_url, endpoint, date) if _cache else None
+    if cached is not None:
+        return _collect(name, cached, columnar)
+    rows = http_client.iter_rows(url, params)
+    if _cache is None:
+        return _collect(name, rows, columnar)
+    with _cache.writer(base_url, endpoint, date) as writer:
+        return _collect(name, _write_through(rows, writer), columnar)
+
+
+def _snapshot(date, tables, columnar):
+    return ColumnarSnapshot(date, tables) if columnar else MetricsSnapshot(date, tables)
+
+
+def fetch_snapshot(date, base_url: str = None, columnar: bool = False):
+    """Download each endpoint once (date-filtered, paginated, streamed) and
+    build the per-agent index. `columnar=True` parses rows straight into a
+    compact ColumnarSnapshot instead of keeping row dicts."""
+    base_url = base_url or BASE_URL
+    urls = _endpoint_urls(base_url)
+    params = _query(date)
+    tables = _get_fetch_pool().map(lambda name: _load_table(name, base_url, urls[name], params, columnar, date), urls)
+    return _snapshot(date, dict(zip(urls, tables)), columnar)
+
+
+def _cached_table(cache, name, base_url, columnar, date):
+    cached = cache.iter_rows(base_url, ENDPOINTS[name], date)
+    return _collect(name, cached, columnar) if cached is not None else None
+
+
+async def _aload_table(name, base_url, url, params, columnar, date):
+    endpoint = ENDPOINTS[name]
+    if _cache is not None:
+        # reading and gunzipping the entry blocks; keep it off the event loop
+        table = await asyncio.to_thread(_cached_table, _cache, name, base_url, columnar, date)
+        if table is not None:
+            return table
+    rows = http_client.aiter_rows(url, params)
+    table = ColumnarTable(SNAPSHOT_FIELDS[name], AGENT_KEYS) if columnar else []
+    add = table.append
+    if _cache is None:
+        async for row in rows:
+            add(row)
+        return table
+    with _cache.writer(base_url, endpoint, date) as writer:
+        async for row in rows:
+            writer.write(row)
+            add(row)
+    return table
+
+
+async def afetch_snapshot(date, base_url: str = None, columnar: bool = False):
+    """Async `fetch_snapshot`: all endpoints in flight at once."""
+    base_url = base_url or BASE_URL
+    urls = _endpoint_urls(base_url)
+    params = _query(date)
+    tables = await asyncio.gather(*(_aload_table(name, base_url, url, params, columnar, date)
+                                    for name, url in urls.items()))
+    return _snapshot(date, dict(zip(urls, tables)), columnar)
+
+
+def _agent_row(name, base_url, url, params, agent_id, date):
+    cached = _cache.iter_rows(base_url, ENDPOINTS[name], date) if _cache else None
+    if cached is None:
+        cached = http_client.iter_rows(url, params)
+    return _first_and_match(cached, agent_id)
+
+
+def fetch_agent_metrics(agent_id, date, base_url: str = None):
+    """Single-agent fetch: filtered requests, streamed until the agent's row
+    turns up, so memory stays bounded however large the tables are.
+
+    If the server ignores the filters this matches the full-list lookup. If it
+    applies them, a table without the agent yields {} instead of falling back
+    to another agent's first row. Cached full-date payloads are used first.
+    """
+    base_url = base_url or BASE_URL
+    urls = _endpoint_urls(base_url)
+    params = _query(date, agent_id)
+    rows = _get_fetch_pool().map(lambda name: _agent_row(name, base_url, urls[name], params, agent_id, date), urls)
+    return _build_raw_metrics(**dict(zip(urls, rows)))
+
+
+def _cached_match(cache, name, base_url, agent_id, date):
+    cached = cache.iter_rows(base_url, ENDPOINTS[name], date)
+    return _first_and_match(cached, agent_id) if cached is not None else None
+
+
+async def _afirst_and_match(name, base_url, url, params, agent_id, date):
+    if _cache is not None:
+        row = await asyncio.to_thread(_cached_match, _cache, name, base_url, agent_id, date)
+        if row is not None:
+            return row
+    rows = http_client.aiter_rows(url, params)
+    first = None
+    key = str(agent_id)
+    try:
+        async for row in rows:
+            if first is None:
+                first = row
+            if any(k in row and str(row.get(k)) == key for k in AGENT_KEYS):
+                return row
+    finally:
+        await rows.aclose()
+    return first if first is not None else {}
+
+
+async def afetch_agent_metrics(agent_id, date, base_url: str = None):
+    base_url = base_url or BASE_URL
+    urls = _endpoint_urls(base_url)
+    params = _query(date, agent_id)
+    rows = await asyncio.gather(*(_afirst_and_match(name, base_url, url, params, agent_id, date)
+                                  for name, url in urls.items()))
+    return _build_raw_metrics(**dict(zip(urls, rows)))
+
+
+# Batch mode: snapshots registered by `prefetch`, keyed by (base_url, date)
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def prefetch(date, base_url: str = None, columnar: bool = False):
+    """Enable batch mode for `date`: every later `fetch_data` call for that
+    date is served from one shared snapshot instead of refetching."""
+    base_url = base_url or BASE_URL
+    with _snapshots_lock:
+        snapshot = _snapshots.get((base_url, date))
+        if snapshot is None:
+            snapshot = _snapshots[(base_url, date)] = fetch_snapshot(date, base_url, columnar)
+    return snapshot
+
+
+async def aprefetch(date, base_url: str = None, columnar: bool = False):
+    """Async `prefetch`; concurrent first calls may both download, one wins."""
+    key = (base_url or BASE_URL, date)
+    snapshot = _snapshots.get(key)
+    if snapshot is None:
+        snapshot = await afetch_snapshot(date, key[0], columnar)
+        with _snapshots_lock:
+            snapshot = _snapshots.setdefault(key, snapshot)
+    return snapshot
+
+
+def warm_from_cache(dates=None, base_url: str = None, columnar: bool = False):
+    """Register batch snapshots for every cached date (or just `dates`) whose
+    endpoints are all cached and fresh, so a restarted worker does not
+    refetch. Returns the dates that were warmed."""
+    if _cache is None:
+        return []
+    base_url = base_url or BASE_URL
+    warmed = []
+    for date in (dates if dates is not None else _cache.dates(base_url)):
+        if not all(_cache.fresh(base_url, endpoint, date) for endpoint in ENDPOINTS.values()):
+            continue
+        tables = {name: _collect(name, _cache.iter_rows(base_url, endpoint, date), columnar)
+                  for name, endpoint in ENDPOINTS.items()}
+        with _snapshots_lock:
+            _snapshots[(base_url, date)] = _snapshot(date, tables, columnar)
+        warmed.append(date)
+    if warmed:
+        logger.info("Warmed batch snapshots from %s for %s", _cache.root, warmed)
+    return warmed
+
+
+def release(date=None, base_url: str = None):
+    """Drop the batch snapshot for `date` (or all snapshots when omitted)."""
+    with _snapshots_lock:
+        if date is None:
+            _snapshots.clear()
+        else:
+            _snapshots.pop((base_url or BASE_URL, date), None)
+
+
+@timed("fetch")
+def fetch_data(state: AgentState):
+    # Entry node: pin the run to the config snapshot it starts with
+    pin_config(state)
+
+    date = state.get('date')
+    agent_id = state.get('agent_id')
+    snapshot = _snapshots.get((BASE_URL, date))
+    if snapshot is not None:
+        count("fetch_snapshot_hits")
+        state['raw_metrics'] = snapshot.raw_metrics_for(agent_id)
+    else:
+        # Single-agent mode: filtered, streamed requests; nothing cached
+        state['raw_metrics'] = fetch_agent_metrics(agent_id, date)
+
+    return state
+
+
+@timed("fetch")
+async def afetch_data(state: AgentState):
+    """Async variant of `fetch_data` used by `app.ainvoke` / `app.abatch`."""
+    pin_config(state)
+
+    date = state.get('date')
+    agent_id = state.get('agent_id')
+    snapshot = _snapshots.get((BASE_URL, date))
+    if snapshot is not None:
+        count("fetch_snapshot_hits")
+        state['raw_metrics'] = snapshot.raw_metrics_for(agent_id)
+    else:
+        state['raw_metrics'] = await afetch_agent_metrics(agent_id, date)
+
+    return state
@@ -0,0 +1,159 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, NamedTuple, Sequence, Tuple
+
+from utils.config import CompiledConfig, ConditionalRule
+
+
+class RankedBatch(NamedTuple):
+    """`rank_batch` output: grade labels per BO and one priority order per agent."""
+    bos: Tuple[str, ...]
+    grades: Dict[str, Any]  # bo -> array of grade labels, one per agent
+    order: Any  # (n_agents, n_bos) array of indices into `bos`
+
+    def order_for(self, i: int) -> List[str]:
+        return [self.bos[j] for j in self.order[i]]
+
+
+class PriorityEngine(NamedTuple):
+    """Grading and prioritization rules compiled once per config snapshot."""
+    thresholds: Mapping[str, Tuple[Tuple[str, float], ...]]  # per BO, highest first
+    default_thresholds: Tuple[Tuple[str, float], ...]
+    grade_rank: Mapping[str, int]  # lower threshold first: D=0 ... A=3
+    order_rank: Mapping[str, int]  # position in the default priority order
+    rules: Tuple[ConditionalRule, ...]  # grade-changing rules only, in config order
+    explicit_order: Tuple[str, ...]
+    apply_only_when_all_d: bool
+    evaluate_on_initial_grades: bool
+
+    def grade(self, bo: str, ratio: float) -> str:
+        # Choose the highest grade whose threshold <= ratio
+        for grade, th in self.thresholds.get(bo, self.default_thresholds):
+            if ratio >= th:
+                return grade
+        return "D"
+
+    def evaluate(self, bo_results: Mapping[str, Mapping[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Grade and order one agent's BOs. Returns new (bo_results, order);
+        the input is not modified."""
+        grades = {bo: self.grade(bo, data.get("ratio", 0)) for bo, data in bo_results.items()}
+        all_d_initially = all(g == "D" for g in grades.values())
+
+        for rule in self.rules:
+            if grades.get(rule.if_bo) == rule.if_grade and rule.target_bo in grades:
+                grades[rule.target_bo] = rule.grade
+
+        grade_rank, order_rank = self.grade_rank, self.order_rank
+        order = sorted(grades, key=lambda bo: (grade_rank.get(grades[bo], 0), order_rank.get(bo, 999)))
+
+        if self.explicit_order and self._apply_explicit(all_d_initially, lambda: all(g == "D" for g in grades.values())):
+            head = [bo for bo in self.explicit_order if bo in grades]
+            order = head + [bo for bo in order if bo not in head]
+
+        results = {bo: {**data, "grade": grades[bo]} for bo, data in bo_results.items()}
+        return results, order
+
+    def _apply_explicit(self, all_d_initially, all_d_now) -> Any:
+        if not self.apply_only_when_all_d:
+            return True
+        return all_d_initially if self.evaluate_on_initial_grades else all_d_now()
+
+    def rank_batch(self, ratios: Mapping[str, Sequence[float]]) -> RankedBatch:
+        """Vectorized `evaluate` over N agents sharing the same BOs.
+
+        `ratios` maps each BO to an array of N ratios (e.g. the "ratio"
+        columns from batch_scores.score_batch); key order plays the role of
+        bo_results key order for tie-breaking.
+        """
+        import numpy as np
+
+        bos = tuple(ratios)
+        labels = ["D"]  # grade code -> label
+        codes = {"D": 0}
+
+        def code(label):
+            if label not in codes:
+                codes[label] = len(labels)
+                labels.append(label)
+            return codes[label]
+
+        n = len(ratios[bos[0]]) if bos else 0
+        grades = {}
+        for bo in bos:
+            ratio = np.asarray(ratios[bo], dtype=np.float64)
+            g = np.zeros(n, dtype=np.int64)
+            # lowest threshold first so the highest satisfied grade wins
+            for label, th in reversed(self.thresholds.get(bo, self.default_thresholds)):
+                g[ratio >= th] = code(label)
+            grades[bo] = g
+        d = codes["D"]
+        all_d_initially = np.logical_and.reduce([grades[bo] == d for bo in bos]) if bos else np.ones(n, bool)
+
+        for rule in self.rules:
+            if rule.target_bo not in grades:
+                continue
+            if rule.if_bo in grades:
+                hit = grades[rule.if_bo] == code(rule.if_grade)
+            elif rule.if_grade is None:
+                hit = np.ones(n, bool)
+            else:
+                continue
+            grades[rule.target_bo] = np.where(hit, code(rule.grade), grades[rule.target_bo])
+
+        rank = np.array([self.grade_rank.get(label, 0) for label in labels], dtype=np.int64)
+        keys = np.stack([rank[grades[bo]] * 1000 + self.order_rank.get(bo, 999) for bo in bos], axis=1) \
+            if bos else np.zeros((n, 0), np.int64)
+        order = np.argsort(keys, axis=1, kind="stable")
+
+        if self.explicit_order and bos:
+            if not self.apply_only_when_all_d:
+                use = np.ones(n, bool)
+            elif self.evaluate_on_initial_grades:
+                use = all_d_initially
+            else:
+                use = np.logical_and.reduce([grades[bo] == d for bo in bos])
+            head = [bos.index(bo) for bo in self.explicit_order if bo in bos]
+            for i in np.flatnonzero(use):
+                order[i] = head + [j for j in order[i] if j not in head]
+
+        label_arr = np.array(labels, dtype=object)
+        return RankedBatch(bos, {bo: label_arr[grades[bo]] for bo in bos}, order)
+
+
+def compile_engine(cfg: CompiledConfig) -> PriorityEngine:
+    # Lower thresholds rank first (D, C, B, A), from the global thresholds
+    ascending = sorted(cfg.grade_thresholds, key=lambda x: x[1])
+    order_rank = {}
+    for i, bo in enumerate(cfg.default_order):
+        order_rank.setdefault(bo, i)
+    rules = tuple(
+        r for r in cfg.conditional_rules
+        if r.if_bo and r.target_bo and (r.action == "SET_GRADE" or (r.action == "CAP_GRADE" and r.grade))
+    )
+    return PriorityEngine(
+        thresholds={code: bo.thresholds for code, bo in cfg.bos.items()},
+        default_thresholds=cfg.grade_thresholds,
+        grade_rank={g: i for i, (g, _) in enumerate(ascending)},
+        order_rank=order_rank,
+        rules=rules,
+        explicit_order=cfg.explicit_order,
+        apply_only_when_all_d=cfg.apply_only_when_all_d,
+        evaluate_on_initial_grades=cfg.evaluate_on_initial_grades,
+    )
+
+
+_engines: "OrderedDict[str, PriorityEngine]" = OrderedDict()
+_engines_lock = threading.Lock()
+_MAX_ENGINES = 8
+
+
+def engine_for(cfg: CompiledConfig) -> PriorityEngine:
+    """The compiled engine for a config snapshot (compiled once per version)."""
+    engine = _engines.get(cfg.snapshot_id)
+    if engine is None:
+        engine = compile_engine(cfg)
+        with _engines_lock:
+            _engines[cfg.snapshot_id] = engine
+            while len(_engines) > _MAX_ENGINES:
+                _engines.popitem(last=False)
+    return engine
@@ -1,5 +1,4 @@
 import argparse
-import json
 import logging
 import os
 from dotenv import load_dotenv
@@ -11,6 +10,8 @@ from nodes.b03 import b03
 from nodes.b04 import b04
 from nodes.b05 import b05
 from nodes.merge_bo_results import merge_bo_results
+from utils.instrumentation import write_report
+from utils.snapshots import COMPRESSIONS, load_snapshot, save_snapshot
 
 # load env for optional tracing integrations (e.g. LANGCHAIN_API_KEY or LANGSMITH_API_KEY)
 # load_dotenv() loads from .env file in current directory or parent directories
@@ -22,19 +23,21 @@ logger = logging.getLogger("workflow-mock")
 # Use main.py for LangGraph-based workflows that will generate traces.
 
 
-def _save_state(state: dict, thread_id: str, path: str = None):
-    """Persist a JSON snapshot of the workflow state for debugging and resume."""
-    if path is None:
-        path = f"mock_state_{thread_id}.json"
+def _save_state(state: dict, thread_id: str, path: str = None, compression: str = None):
+    """Persist a snapshot of the workflow state for debugging and resume.
+
+    JSON by default; a path ending in .seg appends to a binary snapshot
+    segment instead (see utils/snapshots.py).
+    """
     try:
-        with open(path, "w", encoding="utf-8") as fh:
-            json.dump(state, fh, indent=2, ensure_ascii=False)
+        path = save_snapshot(state, thread_id, path, "mock_state_{thread_id}.json", compression)
         logger.info("Saved state snapshot to %s", path)
     except Exception as e:
         logger.warning("Failed to save state snapshot: %s", e)
 
 
-def run_mock():
+def run_mock(replay: dict = None):
+    """Run the BO nodes over mocked metrics, or over a saved snapshot's inputs (`replay`)."""
     # Provide mocked metrics to avoid external API dependency
     state = {
         "agent_id": "123",
@@ -64,14 +67,16 @@ def run_mock():
         "bo_results": {},
         "final_priority_order": []
     }
+    if replay is not None:
+        state.update(agent_id=replay["agent_id"], date=replay["date"], raw_metrics=replay["raw_metrics"])
 
     # Simulate parallel partial updates by invoking each BO node and merging partials
     def _merge(state, partial):
         if not partial:
             return state
         for k, v in partial.items():
-            if k == "bo_results":
-                state.setdefault("bo_results", {}).update(v)
+            if k in ("bo_results", "bo_fingerprints"):
+                state.setdefault(k, {}).update(v)
             else:
                 state[k] = v
         return state
@@ -101,7 +106,14 @@ def run_mock():
 if __name__ == "__main__":
     p = argparse.ArgumentParser(description="Run the mock workflow with optional persistence and tracing")
     p.add_argument("--thread-id", default=os.environ.get("THREAD_ID", "session_1"), help="thread/session id to tag persisted state")
-    p.add_argument("--persist-path", default=None, help="optional path to save state snapshot (JSON)")
+    p.add_argument("--persist-path", default=None,
+                   help="optional path to save state snapshot (JSON; *.seg appends to a binary snapshot segment)")
+    p.add_argument("--compress", choices=[c for c in COMPRESSIONS if c], default=None,
+                   help="compress records when creating a new .seg segment")
+    p.add_argument("--replay-from", default=None,
+                   help="re-run from the inputs of a saved snapshot (JSON file, or the --thread-id record of a .seg)")
+    p.add_argument("--timings-out", default=None,
+                   help="optional path for per-node timings (*.prom: Prometheus text, else JSON)")
     args = p.parse_args()
 
     # Check for LangSmith/LangChain API key (LangSmith uses LANGCHAIN_API_KEY)
@@ -110,5 +122,8 @@ if __name__ == "__main__":
     logger.info("LangSmith/LangChain API key present: %s", bool(api_key))
     logger.info("Note: Mock workflows don't use LangGraph, so they won't generate LangSmith traces.")
     logger.info("Use 'python main.py' for workflows that generate LangSmith traces.")
-    final_state = run_mock()
-    _save_state(final_state, args.thread_id, args.persist_path)
+    replay = load_snapshot(args.replay_from, args.thread_id) if args.replay_from else None
+    final_state = run_mock(replay)
+    _save_state(final_state, args.thread_id, args.persist_path, args.compress)
+    if args.timings_out:
+        write_report(args.timings_out)
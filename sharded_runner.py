@@ -0,0 +1,170 @@
+import argparse
+import contextlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+from batch_runner import AgentOutcome, BatchReport, thread_id_for
+from nodes import fetch_data
+from nodes.calculate_scores import calculate_scores
+from nodes.resolve_priority import prioritize
+from utils.config import get_registry as get_config_registry, pinned_config
+from utils.helpers import BOResultCache, get_result_cache, set_result_cache
+from utils.instrumentation import get_registry, write_report
+from utils.results_sink import COLUMNAR_SUFFIXES, results_sink
+
+logger = logging.getLogger("sharded-runner")
+
+DEFAULT_SHARD_SIZE = 500
+
+# Read-only per-worker state, installed by _init_worker. With the fork start
+# method the snapshot is inherited copy-on-write rather than pickled; the
+# columnar snapshot keeps its data in flat arrays, so those pages stay shared.
+_snapshot = None
+
+
+class ShardResult(NamedTuple):
+    shard: int
+    pid: int
+    outcomes: List[AgentOutcome]
+    elapsed: float
+    memo: Optional[Dict[str, Any]] = None  # the worker's BO result cache stats after the shard
+    timings: Optional[Dict[str, Any]] = None  # the shard's instrumentation snapshot, merged by iter_sharded
+
+    @property
+    def agents_per_s(self) -> float:
+        return len(self.outcomes) / self.elapsed if self.elapsed else 0.0
+
+
+def _init_worker(snapshot, memo: bool, config_source: Dict[str, Any], config_digest: Optional[str]):
+    global _snapshot
+    _snapshot = snapshot
+    # the parent's pinned config: a spawned worker reads the file as it is now, which may have changed since
+    get_config_registry().adopt(config_source, config_digest)
+    # a memo per worker, empty, if the parent has one (forked workers would inherit its entries)
+    set_result_cache(BOResultCache() if memo else None)
+    # forked workers start with a copy of the parent's timings; report only their own
+    registry = get_registry()
+    if registry is not None:
+        registry.reset()
+
+
+def _take_timings() -> Optional[Dict[str, Any]]:
+    registry = get_registry()
+    if registry is None:
+        return None
+    timings = registry.snapshot()
+    registry.reset()
+    return timings
+
+
+def _score_shard(task) -> ShardResult:
+    shard, agents, date, config_version = task
+    start = time.perf_counter()
+    outcomes = []
+    for agent_id in agents:
+        thread_id = thread_id_for(agent_id, date)
+        try:
+            state = {
+                "agent_id": agent_id,
+                "date": date,
+                "config_version": config_version,
+                "raw_metrics": _snapshot.raw_metrics_for(agent_id),
+                "bo_results": {},
+                "final_priority_order": [],
+            }
+            state = prioritize(calculate_scores(state))
+            outcomes.append(AgentOutcome(agent_id, thread_id, True, state["final_priority_order"], state["bo_results"], None))
+        except Exception as e:
+            outcomes.append(AgentOutcome(agent_id, thread_id, False, None, None, f"{type(e).__name__}: {e}"))
+    memo = get_result_cache()
+    return ShardResult(shard, os.getpid(), outcomes, time.perf_counter() - start, memo.stats() if memo else None,
+                       _take_timings())
+
+
+def _mp_context():
+    # fork shares the snapshot without pickling; spawn (Windows/macOS) pickles it once per worker
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("fork" if "fork" in methods else None)
+
+
+def iter_sharded(date: str, agent_ids: Sequence[str] = None, workers: int = None,
+                 shard_size: int = DEFAULT_SHARD_SIZE, columnar: bool = True) -> Iterator[ShardResult]:
+    """Score agents across a process pool, yielding shard results in order.
+
+    Each worker runs the same node functions as the graph (b01..b05, merge,
+    prioritize) without LangGraph or checkpointing, pinned to the parent's
+    config snapshot. The workers' node timings are merged into this
+    process's instrumentation registry as shards complete.
+    """
+    snapshot = fetch_data.prefetch(date, columnar=columnar)
+    try:
+        agents = [str(a) for a in agent_ids] if agent_ids is not None else snapshot.agent_ids()
+        with pinned_config() as config_version:
+            pinned = get_config_registry().get(config_version)
+            tasks = [(i, agents[off:off + shard_size], date, config_version)
+                     for i, off in enumerate(range(0, len(agents), shard_size))]
+            workers = workers or os.cpu_count() or 1
+            # Forking with live fetch threads could copy a lock they hold into the workers
+            fetch_data.shutdown_fetch_pool()
+            logger.info("Scoring %d agents for %s in %d shards on %d processes", len(agents), date, len(tasks), workers)
+            initargs = (snapshot, get_result_cache() is not None, pinned.source(), pinned.digest)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context(),
+                                     initializer=_init_worker, initargs=initargs) as pool:
+                for result in pool.map(_score_shard, tasks):
+                    registry = get_registry()
+                    if registry is not None and result.timings is not None:
+                        registry.merge(result.timings)
+                    yield result
+    finally:
+        fetch_data.release(date)
+
+
+def run_sharded(date: str, agent_ids: Sequence[str] = None, workers: int = None,
+                shard_size: int = DEFAULT_SHARD_SIZE, columnar: bool = True, sink=None) -> BatchReport:
+    start = time.perf_counter()
+    outcomes = []
+    for result in iter_sharded(date, agent_ids, workers, shard_size, columnar):
+        outcomes.extend(result.outcomes)
+        if sink is not None:
+            for o in result.outcomes:
+                sink.add_outcome(o, date)
+        logger.info("Shard %d (pid %d): %d agents in %.3fs (%.0f agents/s), memo hit rate %s",
+                    result.shard, result.pid, len(result.outcomes), result.elapsed, result.agents_per_s,
+                    result.memo and result.memo["hit_rate"])
+    return BatchReport(date, outcomes, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    p = argparse.ArgumentParser(description="Score a fleet for one date across a process pool")
+    p.add_argument("--date", required=True, help="workflow date (YYYY-MM-DD)")
+    p.add_argument("--agents", default=None, help="comma-separated agent ids (default: every agent in the snapshot)")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    p.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="agents per shard")
+    p.add_argument("--report", default=None, help="optional path to write the per-agent JSON report")
+    p.add_argument("--results-db", action="store_true",
+                   help="upsert each agent's summary into workflow_runs (POSTGRES_* settings) in bulk")
+    p.add_argument("--results-file", default=None,
+                   help=f"optional columnar results file ({', '.join(COLUMNAR_SUFFIXES)}; needs pyarrow)")
+    p.add_argument("--timings-out", default=None,
+                   help="optional path for per-node timings and counters (*.prom: Prometheus text, else JSON)")
+    args = p.parse_args()
+
+    # Agents with identical inputs share BO results within each worker
+    set_result_cache(BOResultCache())
+    agents = args.agents.split(",") if args.agents else None
+    with results_sink(args.results_db, args.results_file) or contextlib.nullcontext() as sink:
+        report = run_sharded(args.date, agents, args.workers, args.shard_size, sink=sink)
+    logger.info("Sharded run summary: %s", report.summary())
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump({"summary": report.summary(), "agents": [o._asdict() for o in report.outcomes]}, fh, indent=2)
+        logger.info("Wrote sharded run report to %s", args.report)
+    if args.timings_out:
+        write_report(args.timings_out)
+        logger.info("Wrote timings to %s", args.timings_out)
@@ -9,9 +9,17 @@ class AgentState(TypedDict):
     agent_id: str
     date: str
     raw_metrics: Dict[str, Any]
+
+    # Config snapshot id (config_meta.config_version + content hash) the run
+    # is pinned to; set by the fetch node, read by every BO node.
+    config_version: str
     
     # FIX: Use Annotated with merge_dicts so parallel nodes add to this dict 
     # instead of overwriting each other.
     bo_results: Annotated[Dict[str, Dict], merge_dicts]
+
+    # Per-BO fingerprint of the inputs each bo_results entry was computed
+    # from (see utils.helpers.depends_on); unchanged inputs reuse the entry.
+    bo_fingerprints: Annotated[Dict[str, str], merge_dicts]
     
     final_priority_order: List[str]
\ No newline at end of file
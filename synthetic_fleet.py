@@ -0,0 +1,222 @@
+"""Synthetic agent fleets and a local stub of the sebo API.
+
+`generate_fleet(n, seed)` builds `n` agents deterministically. Each agent
+gets raw_metrics covering every field the BO nodes read
+(nodes.batch_scores.METRIC_FIELDS) plus the ones fetch fills in. Values
+follow rough real-world shapes: log-normal sales and receivables scaled by a
+per-agent activity level, and counts bounded by portfolio size. Edge cases
+are mixed in at fixed rates:
+
+* zero values (4% of fields) and missing fields (4%);
+* missing sections (1%) and brand-new agents with all-zero metrics (0.5%);
+* negative receivables (2%);
+* agents absent from an endpoint (2% per endpoint except sales);
+* the alternate keys fetch falls back to (`total_dcs`, `ar_composite_score`).
+
+`fleet.rows` is the same fleet as the five sebo endpoints would return it, so
+`fetch_data` maps it back to the fields it knows. `serve(fleet)` starts a
+local HTTP stub of the API on a free port (paginated, honours the date and
+agent filters) for the runners to fetch from:
+
+    fleet = generate_fleet(10_000)
+    server, base_url = serve(fleet)
+"""
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, NamedTuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from nodes import fetch_data
+
+DEFAULT_DATE = "2024-01-01"
+FIRST_AGENT_ID = 100000
+
+ZERO_RATE = 0.04
+MISSING_FIELD_RATE = 0.04
+MISSING_SECTION_RATE = 0.01
+NEW_AGENT_RATE = 0.005
+NEGATIVE_AR_RATE = 0.02
+ABSENT_FROM_ENDPOINT_RATE = 0.02
+
+
+class Fleet(NamedTuple):
+    date: str
+    agent_ids: List[str]
+    metrics: Dict[str, Dict[str, Any]]  # agent id -> raw_metrics (every field the nodes read)
+    rows: Dict[str, List[Dict[str, Any]]]  # sebo endpoint -> rows
+
+
+def _agent_metrics(rng: random.Random) -> Dict[str, Dict[str, Any]]:
+    if rng.random() < NEW_AGENT_RATE:
+        return {"performance": {"mtd_sales_value": 0, "active_days_mtd": 0, "mtd_order_count": 0},
+                "dc_activity": {"total_dcs": 0, "unique_dcs_visited": 0, "check_ins_count": 0}}
+
+    level = rng.lognormvariate(0, 0.6)
+    total_dcs = rng.randint(5, 60)
+    last_month_sales = round(rng.lognormvariate(3.4, 0.8) * level, 2)
+    mtd_sales = round(last_month_sales * rng.uniform(0.3, 1.6), 2)
+    active_dcs = rng.randint(0, total_dcs)
+    expected_check_ins = rng.randint(10, 80)
+    outstanding = round(rng.lognormvariate(10.5, 1.0) * level, 2)
+    if rng.random() < NEGATIVE_AR_RATE:
+        outstanding = -outstanding / 10  # credit balance
+
+    metrics = {
+        "performance": {
+            "mtd_sales_value": mtd_sales,
+            "last_month_sales": last_month_sales,
+            "pl_sales_last_12m": round(last_month_sales * 12 * rng.uniform(0.7, 1.3), 2),
+            "active_days_mtd": rng.randint(0, 26),
+            "mtd_order_count": rng.randint(0, 40),
+            "last12m_order_count": rng.randint(0, 500),
+            "unique_transacting_dcs_mtd": active_dcs,
+            "last_month_active_dcs": rng.randint(0, total_dcs),
+            "pl_active_dcs_last_quarter": rng.randint(0, total_dcs),
+        },
+        "dc_activity": {
+            "total_dcs": total_dcs,
+            "unique_dcs_visited": rng.randint(0, total_dcs),
+            "last_month_unique_dcs": rng.randint(0, total_dcs),
+            "check_ins_count": rng.randint(0, 2 * expected_check_ins),
+            "expected_check_ins": expected_check_ins,
+            "last_month_checkins": rng.randint(0, 2 * expected_check_ins),
+        },
+        "outstanding": {
+            "outstanding_amount": outstanding,
+            "last_month_ar": round(abs(outstanding) * rng.uniform(0.5, 1.5), 2),
+            "ageing_index": round(rng.uniform(0, 120), 1),
+        },
+        "onboarding": {
+            "new_retailers_mtd": rng.randint(0, 5),
+            "new_retailers_last_month": rng.randint(0, 6),
+            "new_retailers_last12m": rng.randint(0, 60),
+        },
+        "meetings": {"farmer_meetings_mtd": rng.randint(0, 12)},
+    }
+    for section in list(metrics):
+        if rng.random() < MISSING_SECTION_RATE:
+            del metrics[section]
+            continue
+        fields = metrics[section]
+        for field in list(fields):
+            roll = rng.random()
+            if roll < MISSING_FIELD_RATE:
+                del fields[field]
+            elif roll < MISSING_FIELD_RATE + ZERO_RATE:
+                fields[field] = 0
+    return metrics
+
+
+def _put(row: Dict[str, Any], key: str, section: Dict[str, Any], field: str) -> None:
+    if field in section:
+        row[key] = section[field]
+
+
+def _endpoint_rows(agent_id: str, metrics: Dict[str, Dict[str, Any]], rng: random.Random) -> Dict[str, Dict[str, Any]]:
+    """The agent's row per sebo endpoint (the inverse of fetch's field mapping)."""
+    perf = metrics.get("performance", {})
+    dc = metrics.get("dc_activity", {})
+    ar = metrics.get("outstanding", {})
+    onboarding = metrics.get("onboarding", {})
+    # identifier keys and types differ between endpoints, as in the real API
+    rows = {
+        "perf": {"se_id": int(agent_id)},
+        "dc_perf": {"ff_agent_id": agent_id},
+        "dc_base": {"agent_id": int(agent_id)},
+        "ar": {"se_id": int(agent_id)},
+        "pl_perf": {"se_id": int(agent_id)},
+    }
+    _put(rows["perf"], "sales_mtd", perf, "mtd_sales_value")
+    _put(rows["perf"], "active_days_mtd", perf, "active_days_mtd")
+    _put(rows["perf"], "unique_transacting_dcs_mtd", perf, "mtd_order_count")
+    _put(rows["perf"], "last12m_order_count", perf, "last12m_order_count")
+    _put(rows["dc_perf"], "unique_dcs_checked_in_mtd", dc, "unique_dcs_visited")
+    _put(rows["dc_perf"], "total_checkins_mtd", dc, "check_ins_count")
+    _put(rows["dc_base"], "total_dcs" if rng.random() < 0.1 else "total_dcs_in_portfolio", dc, "total_dcs")
+    _put(rows["dc_base"], "effort_benchmark_checkins", dc, "expected_check_ins")
+    _put(rows["ar"], "ar_composite_score" if rng.random() < 0.05 else "net_ar_today", ar, "outstanding_amount")
+    _put(rows["pl_perf"], "pl_unique_cart_orders_mtd", onboarding, "new_retailers_mtd")
+    return {name: row for name, row in rows.items()
+            if name == "perf" or rng.random() >= ABSENT_FROM_ENDPOINT_RATE}
+
+
+def generate_fleet(n: int, seed: int = 0, date: str = DEFAULT_DATE) -> Fleet:
+    """`n` synthetic agents; the same (n, seed) always gives the same fleet."""
+    rng = random.Random(seed)
+    agent_ids = [str(FIRST_AGENT_ID + i) for i in range(n)]
+    metrics = {}
+    rows = {endpoint: [] for endpoint in fetch_data.ENDPOINTS.values()}
+    for agent_id in agent_ids:
+        metrics[agent_id] = _agent_metrics(rng)
+        for name, row in _endpoint_rows(agent_id, metrics[agent_id], rng).items():
+            rows[fetch_data.ENDPOINTS[name]].append(row)
+    return Fleet(date, agent_ids, metrics, rows)
+
+
+class _StubSeboAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the FastAPI backend
+    fleet: Fleet = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.strip("/").split("/")[-1]
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        rows = self.fleet.rows.get(endpoint)
+        if rows is None:
+            return self._send(404, {"detail": "Not Found"})
+        if query.get(fetch_data.DATE_FILTER_PARAM, self.fleet.date) != self.fleet.date:
+            rows = []
+        agent = query.get(fetch_data.AGENT_FILTER_PARAM)
+        if agent is not None:
+            rows = [r for r in rows if any(str(r.get(k)) == agent for k in fetch_data.AGENT_KEYS if k in r)]
+        size = int(query.get("page_size", fetch_data.PAGE_SIZE))
+        page = int(query.get("page", 1))
+        nxt = None
+        if page * size < len(rows):
+            nxt = f"http://{self.headers['Host']}{url.path}?{urlencode({**query, 'page': page + 1})}"
+        self._send(200, {"count": len(rows), "next": nxt, "results": rows[(page - 1) * size:page * size]})
+
+    def _send(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(fleet: Fleet, host: str = "127.0.0.1", port: int = 0):
+    """Serve `fleet` as the sebo API on a background thread; returns (server, base_url).
+
+    Stop it with `server.shutdown()`.
+    """
+    handler = type("StubSeboAPI", (_StubSeboAPI,), {"fleet": fleet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api"
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    p = argparse.ArgumentParser(description="Serve a synthetic fleet as a local sebo API stub")
+    p.add_argument("--agents", type=int, default=1000, help="fleet size")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--date", default=DEFAULT_DATE, help="the date the stub serves data for")
+    p.add_argument("--port", type=int, default=8000)
+    args = p.parse_args()
+
+    server, base_url = serve(generate_fleet(args.agents, args.seed, args.date), port=args.port)
+    print(f"Serving {args.agents} synthetic agents for {args.date} at {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,82 @@
+import random
+
+from nodes.b01 import b01
+from nodes.b02 import b02
+from nodes.b03 import b03
+from nodes.b04 import b04
+from nodes.b05 import b05
+from nodes.batch_scores import METRIC_FIELDS, metrics_to_columns, score_batch, to_bo_results
+from nodes.priority_engine import compile_engine
+from nodes.resolve_priority import prioritize
+from utils.config import compile_config, get_compiled_config, get_config
+
+
+def _random_metrics(rng):
+    """Random raw_metrics with zeros, missing sections and missing fields mixed in."""
+    metrics = {}
+    for name in METRIC_FIELDS:
+        section, field = name.split(".")
+        roll = rng.random()
+        if roll < 0.15:
+            continue
+        value = 0 if roll < 0.3 else rng.choice([rng.randint(1, 500), rng.uniform(0.01, 2e5)])
+        metrics.setdefault(section, {})[field] = value
+    return metrics
+
+
+def _node_results(metrics):
+    results = {}
+    for fn in (b01, b02, b03, b04, b05):
+        results.update(fn({"raw_metrics": metrics})["bo_results"])
+    return results
+
+
+def test_batch_matches_per_agent_nodes():
+    rng = random.Random(7)
+    fleet = [_random_metrics(rng) for _ in range(500)] + [{}]
+    scores = score_batch(metrics_to_columns(fleet))
+    for i, metrics in enumerate(fleet):
+        assert to_bo_results(scores, i) == _node_results(metrics), metrics
+
+
+def _engines():
+    yield compile_engine(get_compiled_config())
+    raw = dict(get_config())
+    rules = [
+        {"if": {"bo_code": "BO1", "grade": "A"}, "then": {"set_grade": {"bo": "BO5", "grade": "C"}}},
+        {"if": {"bo_code": "BO3", "grade": "D"}, "then": {"action": "CAP_GRADE", "target_bo": "BO4", "cap_to": "B"}},
+        {"if": {"all_bos_grade": "D"}, "then": {"priority_override": ["BO5", "BO3"]}},
+    ]
+    for initial in (True, False):
+        yield compile_engine(compile_config({**raw, "priority_rules": {**raw["priority_rules"], "conditional_rules": rules},
+                                             "priority_overrides": {"evaluate_on_initial_grades": initial}}))
+
+
+def test_rank_batch_matches_evaluate():
+    rng = random.Random(11)
+    bos = ("BO1", "BO2", "BO3", "BO4", "BO5")
+    n = 400
+    ratios = {bo: [rng.choice([0.0, 0.0, 0.25, 0.5, 0.74, 0.75, 1.0, rng.uniform(0, 2)]) for _ in range(n)] for bo in bos}
+    for engine in _engines():
+        ranked = engine.rank_batch(ratios)
+        for i in range(n):
+            results, order = engine.evaluate({bo: {"ratio": ratios[bo][i]} for bo in bos})
+            assert ranked.order_for(i) == order
+            assert {bo: ranked.grades[bo][i] for bo in bos} == {bo: r["grade"] for bo, r in results.items()}
+
+
+def test_prioritize_does_not_mutate_input():
+    bo_results = {"BO3": {"ratio": 0.0}, "BO4": {"ratio": 2.0}}
+    state = {"agent_id": "1", "bo_results": bo_results, "final_priority_order": []}
+    out = prioritize(state)
+    assert bo_results == {"BO3": {"ratio": 0.0}, "BO4": {"ratio": 2.0}}
+    assert state["final_priority_order"] == []
+    assert out["bo_results"] == {"BO3": {"ratio": 0.0, "grade": "D"}, "BO4": {"ratio": 2.0, "grade": "B"}}
+    assert out["final_priority_order"] == ["BO3", "BO4"]
+
+
+if __name__ == "__main__":
+    test_batch_matches_per_agent_nodes()
+    test_rank_batch_matches_evaluate()
+    test_prioritize_does_not_mutate_input()
+    print("batch scoring matches per-agent nodes")
@@ -0,0 +1,58 @@
+from benchmark import compare, results_digest, same_machine
+from nodes import fetch_data
+from synthetic_fleet import generate_fleet, serve
+
+
+def test_fleet_is_deterministic_with_edge_cases():
+    fleet = generate_fleet(2000, seed=3)
+    assert generate_fleet(2000, seed=3) == fleet and generate_fleet(2000, seed=4) != fleet
+    sections = [m.get("performance", {}) for m in fleet.metrics.values()]
+    assert any(s.get("mtd_sales_value") == 0 for s in sections)
+    assert any("last_month_sales" not in s for s in sections)
+    assert any(m.get("outstanding", {}).get("outstanding_amount", 0) < 0 for m in fleet.metrics.values())
+    assert any("total_dcs" in r for r in fleet.rows[fetch_data.ENDPOINTS["dc_base"]])
+
+
+def test_stub_round_trips_through_prefetch():
+    fleet = generate_fleet(300, seed=1)
+    server, base_url = serve(fleet)
+    try:
+        snapshot = fetch_data.prefetch(fleet.date, base_url, columnar=True)
+        assert sorted(snapshot.agent_ids()) == fleet.agent_ids
+        for agent in fleet.agent_ids[:50]:
+            raw = snapshot.raw_metrics_for(agent)
+            expected = fleet.metrics[agent].get("performance", {}).get("active_days_mtd", 1)
+            assert raw["performance"]["active_days_mtd"] == expected
+        assert fetch_data.fetch_snapshot("1999-01-01", base_url).agent_ids() == []
+    finally:
+        fetch_data.release(fleet.date, base_url)
+        server.shutdown()
+
+
+def test_compare_flags_regressions():
+    results = {"1": (["BO1", "BO2"], {"BO1": {"ratio": 0.5, "grade": "C"}})}
+    digest = results_digest(results)
+    assert digest == results_digest({"1": (("BO1", "BO2"), {"BO1": {"grade": "C", "ratio": 0.5}})})
+    assert digest != results_digest({"1": (["BO1", "BO2"], {"BO1": {"ratio": 0.5 + 1e-12, "grade": "C"}})})
+
+    # The committed baseline gates results only; throughput needs this machine's own numbers
+    base = {"cases": {"fast/1000": {"digest": digest}}}
+    perf = {"cases": {"fast/1000": {"agents_per_s": 1000.0, "peak_rss_mb": 100.0, "digest": digest}}}
+    ok = {"cases": {"fast/1000": {"agents_per_s": 900.0, "peak_rss_mb": 110.0, "digest": digest}}}
+    slow = {"cases": {"fast/1000": {"agents_per_s": 700.0, "peak_rss_mb": 130.0, "digest": digest}}}
+    bad = {"cases": {"fast/1000": {"agents_per_s": 700.0, "peak_rss_mb": 130.0, "digest": "x"}}}
+    assert compare(ok, base) == [] and compare(ok, base, perf_baseline=perf) == []
+    assert compare(slow, base) == []
+    assert len(compare(slow, base, perf_baseline=perf)) == 2
+    assert len(compare(bad, base)) == 1 and len(compare(bad, base, perf_baseline=perf)) == 3
+
+    meta = {"machine": "ci-1", "platform": "Linux", "cpu_count": 8, "python": "3.11.7", "seed": 0}
+    assert same_machine(meta, dict(meta, seed=1))
+    assert not same_machine(meta, dict(meta, machine="laptop")) and not same_machine(meta, None)
+
+
+if __name__ == "__main__":
+    test_fleet_is_deterministic_with_edge_cases()
+    test_stub_round_trips_through_prefetch()
+    test_compare_flags_regressions()
+    print("benchmark checks passed")
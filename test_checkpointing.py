@@ -0,0 +1,166 @@
+import asyncio
+import os
+from unittest import mock
+
+os.environ["LANGCHAIN_TRACING_V2"] = "false"  # keep test runs out of LangSmith
+
+from langgraph.checkpoint.memory import MemorySaver
+
+import batch_runner
+import main
+from main import workflow
+from nodes import fetch_data
+from test_fetch_data import _serve
+from utils.checkpointing import BufferedCheckpointSaver, DeltaCheckpointSaver, diff, patch
+
+DATE = "2024-03-01"
+AGENTS = ("1", "2", "9")
+
+
+class _BatchingStandIn(MemorySaver):
+    """Local stand-in for BatchPostgresSaver: records each batch it is handed."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def put_many(self, ops):
+        self.batches.append(len(ops))
+        for op in ops:
+            (self.put if op[0] == "put" else self.put_writes)(*op[1:])
+
+    async def aput_many(self, ops):
+        self.batches.append(len(ops))
+        for op in ops:
+            await (self.aput if op[0] == "put" else self.aput_writes)(*op[1:])
+
+
+def _cfg(thread_id, **extra):
+    return {"configurable": {"thread_id": thread_id, **extra}}
+
+
+def _history(saver, thread_id):
+    return list(saver.list(_cfg(thread_id)))
+
+
+def test_buffered_checkpoints_final_batched_and_debug():
+    server, base_url = _serve()
+    try:
+        with mock.patch.object(fetch_data, "BASE_URL", base_url):
+            fetch_data.prefetch(DATE)
+            reference = workflow.compile(checkpointer=MemorySaver())
+            expected = {a: reference.invoke(batch_runner._initial_state(a, DATE), _cfg(a)) for a in AGENTS}
+            per_run = len(_history(reference.checkpointer, "1"))
+
+            # final: nothing is written until the flush, then one checkpoint per thread in one batch
+            inner = _BatchingStandIn()
+            saver = BufferedCheckpointSaver(inner, durability="final", debug_threads=["debug"])
+            app = workflow.compile(checkpointer=saver)
+            for a in AGENTS:
+                assert app.invoke(batch_runner._initial_state(a, DATE), _cfg(a)) == expected[a]
+            assert saver.pending == len(AGENTS) and not inner.batches
+            assert app.get_state(_cfg("1")).values == reference.get_state(_cfg("1")).values  # served from the buffer
+            assert saver.flush() == len(AGENTS) and len(inner.batches) == 1
+            for a in AGENTS:
+                assert len(_history(inner, a)) == 1
+                assert app.get_state(_cfg(a)).values == reference.get_state(_cfg(a)).values
+                assert app.get_state(_cfg(a)).next == ()
+            # A rerun resumes from the flushed checkpoint, like the reference thread
+            assert app.invoke(batch_runner._initial_state("1", DATE), _cfg("1")) == \
+                reference.invoke(batch_runner._initial_state("1", DATE), _cfg("1"))
+
+            # debug threads and per-run overrides keep every per-node checkpoint
+            app.invoke(batch_runner._initial_state("2", DATE), _cfg("debug"))
+            app.invoke(batch_runner._initial_state("2", DATE), _cfg("x", durability="full"))
+            assert len(_history(inner, "debug")) == len(_history(inner, "x")) == per_run
+
+            # batched: full history, written in batches of `batch_size` checkpoints
+            inner = _BatchingStandIn()
+            saver = BufferedCheckpointSaver(inner, durability="batched", batch_size=per_run)
+            app = workflow.compile(checkpointer=saver)
+            for a in AGENTS:
+                asyncio.run(app.ainvoke(batch_runner._initial_state(a, DATE), _cfg(a)))
+            saver.flush()
+            assert len(inner.batches) == len(AGENTS)
+            for a in AGENTS:
+                assert len(_history(inner, a)) == per_run
+                assert app.get_state(_cfg(a)).values == reference.get_state(_cfg(a)).values
+    finally:
+        fetch_data.release()
+        server.shutdown()
+
+
+def _blob_bytes(saver):
+    return sum(len(blob) for _, blob in saver.blobs.values())
+
+
+def test_diff_patch_roundtrip_keeps_types():
+    old = {"BO1": {"ratio": 1, "actual": 2.0}, "BO2": {"ratio": 0.5}, "gone": 1}
+    new = {"BO1": {"ratio": 1.0, "actual": 2.0, "grade": "A"}, "BO2": {"ratio": 0.5}, "BO3": {}}
+    p = diff(old, new)
+    assert p == {"set": {"BO3": {}}, "sub": {"BO1": {"set": {"ratio": 1.0, "grade": "A"}}}, "del": ["gone"]}
+    assert patch(old, p) == new and isinstance(patch(old, p)["BO1"]["ratio"], float)
+
+
+def test_delta_checkpoints_reconstruct_every_step():
+    server, base_url = _serve()
+    try:
+        with mock.patch.object(fetch_data, "BASE_URL", base_url):
+            fetch_data.prefetch(DATE)
+            reference = workflow.compile(checkpointer=MemorySaver())
+            inner = MemorySaver()
+            app = workflow.compile(checkpointer=DeltaCheckpointSaver(inner, max_depth=3))
+            for rerun in range(3):
+                if rerun == 2:
+                    # A restarted process starts with an empty cache and reads its bases back
+                    app = workflow.compile(checkpointer=DeltaCheckpointSaver(inner, max_depth=3))
+                for a in AGENTS:
+                    state = batch_runner._initial_state(a, DATE)
+                    assert app.invoke(state, _cfg(a)) == reference.invoke(state, _cfg(a))
+            for a in AGENTS:
+                got = [c.checkpoint["channel_values"] for c in app.checkpointer.list(_cfg(a))]
+                assert got == [c.checkpoint["channel_values"] for c in reference.checkpointer.list(_cfg(a))]
+            assert _blob_bytes(inner) < _blob_bytes(reference.checkpointer)
+
+            # Underneath the final-only buffer: coalesced checkpoints still resolve
+            inner = MemorySaver()
+            saver = BufferedCheckpointSaver(DeltaCheckpointSaver(inner), durability="final")
+            app = workflow.compile(checkpointer=saver)
+            for _ in range(2):
+                for a in AGENTS:
+                    app.invoke(batch_runner._initial_state(a, DATE), _cfg(a))
+                saver.flush()
+            for a in AGENTS:
+                assert app.get_state(_cfg(a)).values == reference.get_state(_cfg(a)).values
+    finally:
+        fetch_data.release()
+        server.shutdown()
+
+
+def test_checkpoint_backend_never_falls_back_silently():
+    unconfigured = {"POSTGRES_CONNECTION_STRING": "", "POSTGRES_PASSWORD": ""}
+    with mock.patch.dict(os.environ, {**unconfigured, "CHECKPOINT_BACKEND": "auto"}):
+        saver = main.make_checkpointer()
+    while hasattr(saver, "inner"):
+        saver = saver.inner
+    assert isinstance(saver, MemorySaver)
+
+    # Postgres that is asked for but missing or unreachable is an error, not a MemorySaver
+    unreachable = {"POSTGRES_CONNECTION_STRING": "postgresql://postgres@127.0.0.1:9/bos_workflow_db",
+                   "CHECKPOINT_CONNECT_TIMEOUT": "0.5"}
+    for env in ({**unconfigured, "CHECKPOINT_BACKEND": "postgres"}, unreachable, {"CHECKPOINT_BACKEND": "sqlite"}):
+        with mock.patch.dict(os.environ, env):
+            try:
+                main.make_checkpointer()
+            except (RuntimeError, ValueError):
+                pass
+            else:
+                raise AssertionError(f"make_checkpointer() did not fail with {env}")
+
+
+if __name__ == "__main__":
+    test_buffered_checkpoints_final_batched_and_debug()
+    test_diff_patch_roundtrip_keeps_types()
+    test_delta_checkpoints_reconstruct_every_step()
+    test_checkpoint_backend_never_falls_back_silently()
+    print("buffered checkpointing checks passed")
@@ -0,0 +1,104 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from utils.config import ConfigError, ConfigRegistry, compile_config, get_compiled_config, get_config
+
+
+def test_compiled_config_matches_raw():
+    raw = get_config()
+    cfg = get_compiled_config()
+    assert cfg.version == raw["config_meta"]["config_version"]
+    assert cfg.bo("BO2").factor("B2B")["multiplier"] == 1.25
+    assert cfg.bo("BO3").thresholds == (("A", 1.0), ("B", 0.75), ("C", 0.5), ("D", 0.0))
+    assert cfg.default_order == ("BO1", "BO2", "BO4", "BO3", "BO5")
+    assert cfg.explicit_order == ("BO2", "BO1", "BO4", "BO3", "BO5")
+    assert cfg.apply_only_when_all_d
+    cap = cfg.conditional_rules[0]
+    assert (cap.if_bo, cap.if_grade, cap.action, cap.target_bo, cap.grade) == ("BO3", "D", "CAP_GRADE", "BO4", "B")
+
+
+def test_compiled_config_is_read_only():
+    cfg = compile_config({"business_objectives": [{"bo_code": "BO1", "benchmark": {"growth_multiplier": 3.0}}]})
+    assert cfg.bo("BO1").benchmark["growth_multiplier"] == 3.0
+    try:
+        cfg.bo("BO1").benchmark["growth_multiplier"] = 1.0
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("compiled benchmark should be immutable")
+    # Unknown BOs and missing sections fall back to empty params and global thresholds
+    assert cfg.bo("BO9").factor("X") == {}
+    assert cfg.bo("BO9").thresholds == (("A", 1.0), ("B", 0.5), ("C", 0.25), ("D", 0.0))
+
+
+def _write(path, cfg, mtime):
+    path.write_text(cfg if isinstance(cfg, str) else json.dumps(cfg), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+def test_registry_hot_reload_keeps_pinned_snapshots():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "enterprise_config.json"
+        v1 = {"config_meta": {"config_version": "V1"}, "business_objectives": [{"bo_code": "BO1", "benchmark": {"growth_multiplier": 2.0}}]}
+        _write(path, v1, 1_000)
+        registry = ConfigRegistry(path, poll_interval=0)
+        first = registry.current()
+        assert first.version == "V1"
+
+        v1["business_objectives"][0]["benchmark"]["growth_multiplier"] = 3.0
+        _write(path, v1, 2_000)
+        second = registry.current()
+        assert second.bo("BO1").benchmark["growth_multiplier"] == 3.0
+        # Same config_version, different contents: still distinct snapshots
+        assert second.snapshot_id != first.snapshot_id
+        assert registry.get(first.snapshot_id) is first
+
+        # A broken edit keeps serving the last good snapshot
+        _write(path, "{not json", 3_000)
+        assert registry.current() is second
+
+
+def test_pinned_snapshot_survives_reloads_and_evicted_one_raises():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "enterprise_config.json"
+        _write(path, {"config_meta": {"config_version": "V0"}}, 1_000)
+        registry = ConfigRegistry(path, poll_interval=0, keep=2)
+        pinned = registry.pin()
+        for i in range(1, 5):
+            _write(path, {"config_meta": {"config_version": f"V{i}"}}, 1_000 + i)
+            registry.current()
+        assert registry.get(pinned.snapshot_id) is pinned
+
+        registry.release(pinned.snapshot_id)
+        _write(path, {"config_meta": {"config_version": "V5"}}, 1_005)
+        registry.current()
+        assert not registry.available(pinned.snapshot_id)
+        try:
+            registry.get(pinned.snapshot_id)
+        except ConfigError:
+            pass
+        else:
+            raise AssertionError("an evicted snapshot must not be swapped for the current one")
+
+
+def test_registry_rejects_invalid_initial_config():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "enterprise_config.json"
+        _write(path, "{not json", 1_000)
+        try:
+            ConfigRegistry(path).current()
+        except ConfigError:
+            pass
+        else:
+            raise AssertionError("invalid config should not load as {}")
+
+
+if __name__ == "__main__":
+    test_compiled_config_matches_raw()
+    test_compiled_config_is_read_only()
+    test_registry_hot_reload_keeps_pinned_snapshots()
+    test_pinned_snapshot_survives_reloads_and_evicted_one_raises()
+    test_registry_rejects_invalid_initial_config()
+    print("config tests passed")
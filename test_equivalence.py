@@ -0,0 +1,49 @@
+import math
+import os
+
+os.environ["LANGCHAIN_TRACING_V2"] = "false"  # keep test runs out of LangSmith
+
+from equivalence_check import check_fleet, compare_results, ulps
+
+
+def test_compare_results_classifies_differences():
+    ratio = 0.1 + 0.2
+    reference = {
+        "1": (["BO1", "BO2"], {"BO1": {"ratio": ratio, "grade": "B"}, "BO2": {"ratio": 1.0, "grade": "A"}}),
+        "2": (["BO1"], {"BO1": {"ratio": 0.5, "grade": "C"}}),
+        "3": (["BO1"], {"BO1": {"ratio": 0.5, "grade": "C"}}),
+    }
+    results = {
+        "1": (("BO1", "BO2"), {"BO1": {"ratio": 0.3, "grade": "B"}, "BO2": {"ratio": 1, "grade": "A"}}),
+        "2": (["BO1"], {"BO1": {"ratio": 0.5, "grade": "D"}}),
+        "4": (["BO1"], {"BO1": {"ratio": 0.5, "grade": "C"}}),
+    }
+    report = compare_results(reference, results, "candidate")
+    assert (report.identical, report.within_tolerance, report.mismatched) == (0, 1, 3)
+    assert report.max_ulps == ulps(ratio, 0.3) == 1
+    assert {d.field for d in report.differences} == {"BO1.ratio", "BO1.grade", "agent"}
+    assert compare_results(reference, reference, "same").identical == 3
+
+    strict = compare_results(reference, results, "candidate", rel_tol=0.0, abs_tol=0.0)
+    assert strict.within_tolerance == 0 and strict.mismatched == 4
+
+    signed = compare_results({"1": ([], {"BO1": {"ratio": 0.0, "score": float("inf")}})},
+                             {"1": ([], {"BO1": {"ratio": -0.0, "score": float("-inf")}})}, "signed")
+    by_field = {d.field: d for d in signed.differences}
+    assert (by_field["BO1.ratio"].abs_diff, by_field["BO1.ratio"].rel_diff) == (0.0, 0.0)
+    assert by_field["BO1.ratio"].within_tolerance
+    assert by_field["BO1.score"].rel_diff == math.inf and not by_field["BO1.score"].within_tolerance
+    assert signed.mismatched == 1 and signed.max_rel_diff == math.inf
+
+
+def test_every_path_scores_a_fleet_identically():
+    reports = check_fleet(300, seed=5, workers=2)
+    assert len(reports) == 7
+    for report in reports:
+        assert report.identical == report.agents == 300, report
+
+
+if __name__ == "__main__":
+    test_compare_results_classifies_differences()
+    test_every_path_scores_a_fleet_identically()
+    print("equivalence checks passed")
@@ -0,0 +1,48 @@
+import asyncio
+import os
+from unittest import mock
+
+os.environ["LANGCHAIN_TRACING_V2"] = "false"  # keep test runs out of LangSmith
+
+from langgraph.checkpoint.memory import MemorySaver
+
+import batch_runner
+import fast_path
+from main import workflow
+from nodes import fetch_data
+from test_fetch_data import _serve
+
+DATE = "2024-03-01"
+
+
+def test_fast_path_matches_langgraph_including_checkpoints():
+    server, base_url = _serve()
+    try:
+        with mock.patch.object(fetch_data, "BASE_URL", base_url):
+            app = workflow.compile(checkpointer=MemorySaver())
+            fetch_data.prefetch(DATE)
+            for agent in ("1", "2", "9"):
+                state = batch_runner._initial_state(agent, DATE)
+                graph_cfg = {"configurable": {"thread_id": f"graph:{agent}"}}
+                fast_cfg = {"configurable": {"thread_id": f"fast:{agent}"}}
+                for _ in range(2):  # second pass reruns on an existing thread
+                    expected = app.invoke(state, graph_cfg)
+                    assert fast_path.invoke(state, fast_cfg, app=app) == expected
+                    assert app.get_state(fast_cfg).values == app.get_state(graph_cfg).values
+                    assert app.get_state(fast_cfg).next == ()
+                assert asyncio.run(fast_path.ainvoke(state, {"configurable": {"thread_id": f"afast:{agent}"}}, app=app)) == expected
+            assert fast_path.run_pipeline(batch_runner._initial_state("1", DATE)) == \
+                app.invoke(batch_runner._initial_state("1", DATE), {"configurable": {"thread_id": "graph:1"}})
+
+            graph = batch_runner.run_batch(DATE, app=app)
+            fast = batch_runner.run_batch(DATE, app=app, fast=True)
+            assert fast.outcomes == graph.outcomes
+            assert not fast.failed
+    finally:
+        fetch_data.release()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_fast_path_matches_langgraph_including_checkpoints()
+    print("fast path matches LangGraph")
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import nodes.fetch_data as fd
+
+ROWS = {
+    "sebo4overallsalesperformancedaily": [
+        {"se_id": 1, "sales_mtd": 10, "unique_transacting_dcs_mtd": 3},
+        {"se_id": 2, "sales_mtd": 0, "unique_transacting_dcs_mtd": 4},
+    ],
+    "sebo2dccheckinsperformancedaily": [
+        {"ff_agent_id": "2", "unique_dcs_checked_in_mtd": 7, "total_checkins_mtd": 9},
+    ],
+    "sebo2dccheckinsbaselinemonthly": [
+        {"agent_id": 1, "total_dcs_in_portfolio": 30},
+        {"agent_id": 2, "total_dcs": 12},
+    ],
+    "sebo3arcontrolperformancedaily": [],
+    "sebo1plperformancedaily": [
+        {"se_id": 2, "pl_unique_cart_orders_mtd": 5},
+    ],
+}
+
+
+class _StubSeboAPI(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the FastAPI backend
+    hits = {}
+    fail_once = set()
+    honor_filters = False
+    paginate = False
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        name = url.path.strip("/").split("/")[-1]
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        _StubSeboAPI.hits[name] = _StubSeboAPI.hits.get(name, 0) + 1
+        if name in _StubSeboAPI.fail_once:
+            _StubSeboAPI.fail_once.discard(name)
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        rows = ROWS.get(name, [])
+        if self.honor_filters and fd.AGENT_FILTER_PARAM in query:
+            rows = [r for r in rows if any(str(r.get(k)) == query[fd.AGENT_FILTER_PARAM] for k in fd.AGENT_KEYS)]
+        payload = rows
+        if self.paginate:
+            page, size = int(query.get("page", 1)), 1
+            nxt = f"http://{self.headers['Host']}{url.path}?page={page + 1}" if page * size < len(rows) else None
+            payload = {"count": len(rows), "next": nxt, "results": rows[(page - 1) * size:page * size]}
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubSeboAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api"
+
+
+def test_index_matches_linear_scan():
+    for rows in ROWS.values():
+        index = fd._index_rows(rows)
+        for agent_id in ("1", "2", "3"):
+            expected = fd._find_for_agent(rows, list(fd.AGENT_KEYS), agent_id)
+            got = index.get(agent_id, rows[0] if rows else {})
+            assert got == expected
+
+
+def test_null_agent_ids_are_not_indexed():
+    from utils.columnar import ColumnarTable
+    rows = [{"se_id": None, "sales_mtd": 1}, {"se_id": 2, "sales_mtd": 2}, {"agent_id": None, "se_id": 3}]
+    assert list(fd._index_rows(rows)) == ["2", "3"]
+    table = ColumnarTable.from_rows(["sales_mtd"], fd.AGENT_KEYS, rows)
+    assert list(table.index) == ["2", "3"]
+    assert table.row_index("None") == 0  # unknown, so the first row, as for any other id
+
+
+def test_prefetch_downloads_each_endpoint_once():
+    server, base_url = _serve()
+    old_base, fd.BASE_URL = fd.BASE_URL, base_url
+    _StubSeboAPI.hits.clear()
+    try:
+        fd.prefetch("2024-01-01")
+        states = [fd.fetch_data({"agent_id": a, "date": "2024-01-01"}) for a in ("1", "2", "3")]
+        assert set(_StubSeboAPI.hits.values()) == {1}
+
+        m2 = states[1]["raw_metrics"]
+        assert m2["performance"]["mtd_sales_value"] == 5  # falls back to PL orders
+        assert m2["dc_activity"] == {"unique_dcs_visited": 7, "total_dcs": 12, "check_ins_count": 9, "expected_check_ins": 1}
+        assert states[0]["raw_metrics"]["dc_activity"]["total_dcs"] == 30
+        assert fd.prefetch("2024-01-01").agent_ids() == ["1", "2"]
+
+        # What sharded_runner does before forking: no fetch threads left, the next fetch restarts them
+        fd.shutdown_fetch_pool()
+        assert not [t for t in threading.enumerate() if t.name.startswith("sebo-fetch")]
+        assert fd.fetch_agent_metrics("1", "2024-01-01")["dc_activity"]["total_dcs"] == 30
+    finally:
+        fd.release()
+        fd.BASE_URL = old_base
+        server.shutdown()
+
+
+def test_async_fetch_runs_endpoints_concurrently_with_retry():
+    server, base_url = _serve()
+    _StubSeboAPI.hits.clear()
+    _StubSeboAPI.fail_once = {"sebo3arcontrolperformancedaily"}
+    try:
+        async def run():
+            try:
+                sync = fd.fetch_snapshot("2024-01-01", base_url)
+                _StubSeboAPI.fail_once = {"sebo2dccheckinsbaselinemonthly"}
+                snap = await fd.afetch_snapshot("2024-01-01", base_url)
+                return sync, snap
+            finally:
+                await fd.http_client.aclose()
+
+        sync, snap = asyncio.run(run())
+        for agent_id in ("1", "2"):
+            assert snap.raw_metrics_for(agent_id) == sync.raw_metrics_for(agent_id)
+        # each 503 was retried once: by the pooled session, then by the async client
+        assert _StubSeboAPI.hits["sebo3arcontrolperformancedaily"] == 3
+        assert _StubSeboAPI.hits["sebo2dccheckinsbaselinemonthly"] == 3
+    finally:
+        _StubSeboAPI.fail_once = set()
+        server.shutdown()
+
+
+def test_json_array_stream_handles_split_chunks():
+    from utils.helpers import iter_json_array
+    data = json.dumps([{"se_id": 1, "x": "a,]"}, 12345, [1, {"y": None}], "s"]).encode()
+    for size in (1, 2, 7, len(data)):
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        assert list(iter_json_array(chunks)) == json.loads(data)
+
+
+def test_single_agent_fetch_filters_and_paginates():
+    server, base_url = _serve()
+    try:
+        expected = fd.fetch_snapshot("2024-01-01", base_url)
+        for honor, paginate in ((False, False), (True, False), (False, True), (True, True)):
+            _StubSeboAPI.honor_filters, _StubSeboAPI.paginate = honor, paginate
+            assert fd.fetch_snapshot("2024-01-01", base_url).agent_ids() == expected.agent_ids()
+            # a server that honours the filter has no other agent's row to fall back to
+            for agent_id in (("2",) if honor else ("1", "2")):
+                assert fd.fetch_agent_metrics(agent_id, "2024-01-01", base_url) == expected.raw_metrics_for(agent_id)
+            async def run():
+                try:
+                    return await fd.afetch_agent_metrics("2", "2024-01-01", base_url)
+                finally:
+                    await fd.http_client.aclose()
+            assert asyncio.run(run()) == expected.raw_metrics_for("2")
+    finally:
+        _StubSeboAPI.honor_filters = _StubSeboAPI.paginate = False
+        server.shutdown()
+
+
+def test_columnar_snapshot_matches_row_snapshot():
+    from nodes.batch_scores import score_batch, to_bo_results
+    server, base_url = _serve()
+    try:
+        rows = fd.fetch_snapshot("2024-01-01", base_url)
+        cols = fd.fetch_snapshot("2024-01-01", base_url, columnar=True)
+    finally:
+        server.shutdown()
+    agents = ["1", "2", "3"]
+    assert cols.agent_ids() == rows.agent_ids()
+    for agent_id in agents:
+        assert cols.raw_metrics_for(agent_id) == rows.raw_metrics_for(agent_id)
+    from_rows, from_cols = score_batch(rows.metric_columns(agents)), score_batch(cols.metric_columns(agents))
+    for i in range(len(agents)):
+        assert to_bo_results(from_cols, i) == to_bo_results(from_rows, i)
+
+
+def test_metrics_cache_write_through_offline_replay_and_warm():
+    import tempfile
+    from utils.metrics_cache import CacheMiss, MetricsCache
+    server, base_url = _serve()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            fd.set_cache(MetricsCache(tmp))
+            online = fd.fetch_snapshot("2024-01-01", base_url)
+        finally:
+            server.shutdown()
+        # backend is gone: everything below is served from disk
+        fd.set_cache(MetricsCache(tmp, offline=True))
+        try:
+            assert fd.fetch_agent_metrics("2", "2024-01-01", base_url) == online.raw_metrics_for("2")
+            assert asyncio.run(fd.afetch_agent_metrics("2", "2024-01-01", base_url)) == online.raw_metrics_for("2")
+            replayed = asyncio.run(fd.afetch_snapshot("2024-01-01", base_url, columnar=True))
+            assert replayed.raw_metrics_for("1") == online.raw_metrics_for("1")
+            assert fd.warm_from_cache(base_url=base_url, columnar=True) == ["2024-01-01"]
+            assert fd.prefetch("2024-01-01", base_url).raw_metrics_for("1") == online.raw_metrics_for("1")
+            # another backend sharing the cache dir does not see these payloads
+            assert fd._cache.dates("http://127.0.0.1:1/api") == []
+            try:
+                fd.fetch_agent_metrics("2", "2024-01-01", "http://127.0.0.1:1/api")
+            except CacheMiss:
+                pass
+            else:
+                raise AssertionError("payloads cached for one base_url must not serve another")
+            try:
+                fd.fetch_snapshot("2024-01-02", base_url)
+            except CacheMiss:
+                pass
+            else:
+                raise AssertionError("offline cache miss should raise")
+            assert fd._cache.invalidate(date="2024-01-01") == len(fd.ENDPOINTS)
+            assert fd._cache.dates(base_url) == []
+        finally:
+            fd.set_cache(None)
+            fd.release()
+
+
+if __name__ == "__main__":
+    test_index_matches_linear_scan()
+    test_null_agent_ids_are_not_indexed()
+    test_prefetch_downloads_each_endpoint_once()
+    test_async_fetch_runs_endpoints_concurrently_with_retry()
+    test_json_array_stream_handles_split_chunks()
+    test_single_agent_fetch_filters_and_paginates()
+    test_columnar_snapshot_matches_row_snapshot()
+    test_metrics_cache_write_through_offline_replay_and_warm()
+    print("fetch_data tests passed")
@@ -0,0 +1,103 @@
+import copy
+import random
+
+from nodes.b01 import b01
+from nodes.b02 import b02
+from nodes.b03 import b03
+from nodes.b04 import b04
+from nodes.b05 import b05
+from nodes.batch_scores import METRIC_FIELDS
+from nodes.calculate_scores import calculate_scores
+from utils.helpers import BOResultCache, get_result_cache, set_result_cache
+
+NODES = (b01, b02, b03, b04, b05)
+
+
+def _metrics(rng):
+    metrics = {}
+    for name in METRIC_FIELDS:
+        section, field = name.split(".")
+        metrics.setdefault(section, {})[field] = rng.randint(1, 500)
+    return metrics
+
+
+def test_declared_inputs_cover_every_metric_read():
+    assert set().union(*(fn.metric_inputs for fn in NODES)) == set(METRIC_FIELDS)
+    rng = random.Random(3)
+    for _ in range(50):
+        metrics = _metrics(rng)
+        for fn in NODES:
+            # Changing any field the node did not declare must not change its result
+            other = copy.deepcopy(metrics)
+            for name in METRIC_FIELDS:
+                if name not in fn.metric_inputs:
+                    section, field = name.split(".")
+                    other[section][field] = rng.randint(1, 500)
+            assert fn({"raw_metrics": other})["bo_results"] == fn({"raw_metrics": metrics})["bo_results"]
+
+
+def test_unchanged_inputs_reuse_prior_results():
+    # Exercise the checkpoint-carried reuse on its own, without the memo
+    memo = get_result_cache()
+    set_result_cache(None)
+    try:
+        _check_reuse()
+    finally:
+        set_result_cache(memo)
+
+
+def _check_reuse():
+    metrics = _metrics(random.Random(5))
+    first = calculate_scores({"raw_metrics": copy.deepcopy(metrics), "bo_results": {}})
+    assert set(first["bo_fingerprints"]) == {"BO1", "BO2", "BO3", "BO4", "BO5"}
+
+    # Mark the prior entries so reuse is observable, then update one DC feed field
+    prior = {bo: {**r, "reused": True, "grade": "A"} for bo, r in first["bo_results"].items()}
+    metrics["dc_activity"]["check_ins_count"] += 7
+    rerun = calculate_scores({"raw_metrics": metrics, "bo_results": prior,
+                              "bo_fingerprints": dict(first["bo_fingerprints"])})
+
+    recomputed = {bo for bo, r in rerun["bo_results"].items() if "reused" not in r}
+    assert recomputed == {"BO2"}
+    assert all("grade" not in r for r in rerun["bo_results"].values())
+    assert rerun["bo_fingerprints"]["BO2"] != first["bo_fingerprints"]["BO2"]
+    fresh = calculate_scores({"raw_metrics": copy.deepcopy(metrics), "bo_results": {}})
+    assert rerun["bo_results"]["BO2"] == fresh["bo_results"]["BO2"]
+
+
+def test_result_memo_hits_and_bounds():
+    memo = get_result_cache()
+    assert memo is None  # opt-in: only the bulk runner CLIs install one
+    cache = BOResultCache(maxsize=4)
+    set_result_cache(cache)
+    try:
+        metrics = _metrics(random.Random(9))
+        first = b01({"raw_metrics": metrics})
+        assert cache.stats()["misses"] == 1 and len(cache) == 1
+        # A different agent with the same inputs is served from the memo
+        assert b01({"agent_id": "other", "raw_metrics": copy.deepcopy(metrics)}) == first
+        assert cache.hits == 1
+
+        # Same value, different type: a separate entry, echoed type preserved
+        metrics["performance"]["mtd_sales_value"] = float(metrics["performance"]["mtd_sales_value"])
+        assert isinstance(b01({"raw_metrics": metrics})["bo_results"]["BO1"]["actual"], float)
+        assert cache.misses == 2
+
+        for i in range(10):
+            b03({"raw_metrics": {"outstanding": {"outstanding_amount": i}}})
+        assert len(cache) == 4 and cache.evictions == 8
+
+        expiring = BOResultCache(ttl=0)
+        set_result_cache(expiring)
+        b01({"raw_metrics": metrics})
+        b01({"raw_metrics": metrics})
+        assert expiring.hits == 0 and expiring.misses == 2
+    finally:
+        set_result_cache(memo)
+
+
+if __name__ == "__main__":
+    test_declared_inputs_cover_every_metric_read()
+    test_unchanged_inputs_reuse_prior_results()
+    test_result_memo_hits_and_bounds()
+    print("incremental re-scoring checks passed")
@@ -0,0 +1,67 @@
+import asyncio
+import random
+
+from utils.instrumentation import Histogram, Registry, get_registry, set_registry, timed
+
+
+def test_histogram_quantiles_within_a_bucket():
+    rng = random.Random(7)
+    values = sorted(rng.lognormvariate(-9, 1) for _ in range(20000))  # ~0.1 ms median
+    h = Histogram()
+    for v in values:
+        h.observe(v)
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * len(values)) - 1]
+        assert abs(h.quantile(q) - exact) / exact < 0.34  # 8 buckets per decade
+    assert h.count == 20000 and h.min == values[0] and h.max == values[-1]
+    assert Histogram().quantile(0.5) is None
+
+
+def test_timed_nodes_report_and_merge():
+    previous = get_registry()
+    registry = Registry()
+    set_registry(registry)
+    try:
+        @timed("prioritize")
+        def node(state):
+            if state.get("fail"):
+                raise ValueError("boom")
+            return state
+
+        @timed("fetch")
+        async def anode(state):
+            return state
+
+        for i in range(9):
+            node({})
+        try:
+            node({"fail": True})
+        except ValueError:
+            pass
+        asyncio.run(anode({}))
+        registry.count("http_bytes", 2048)
+        assert node.__name__ == "node"
+
+        worker = Registry()
+        worker.observe("prioritize", 1.0, 1.5)
+        worker.count("http_bytes", 1024)
+        registry.merge(worker.snapshot())
+
+        report = registry.report()
+        assert report["agents"] == 11 and report["counters"] == {"http_bytes": 3072}
+        assert report["nodes"]["prioritize"]["errors"] == 1 and report["nodes"]["fetch"]["calls"] == 1
+        assert report["nodes"]["prioritize"]["max_ms"] == 500.0
+        text = registry.prometheus()
+        assert 'bos_node_duration_seconds_count{node="prioritize"} 11' in text
+        assert 'bos_node_errors_total{node="prioritize"} 1' in text and "bos_http_bytes_total 3072" in text
+
+        set_registry(None)
+        assert node({}) == {}  # recording off
+    finally:
+        set_registry(previous)
+
+
+if __name__ == "__main__":
+    test_histogram_quantiles_within_a_bucket()
+    test_timed_nodes_report_and_merge()
+    print("instrumentation checks passed")
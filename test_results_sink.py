@@ -0,0 +1,41 @@
+import datetime
+
+from batch_runner import AgentOutcome
+from utils.results_sink import ResultsSink, run_summary, summarize_bo_results
+
+
+class _Recorder:
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def write(self, rows):
+        self.batches.append(list(rows))
+
+    def close(self):
+        self.closed = True
+
+
+def test_summaries_and_batched_flushes():
+    bo_results = {"BO1": {"ratio": 0.75, "actual": 30.0, "benchmark": 40.0, "grade": "B"}, "BO2": {"ratio": 1}}
+    assert summarize_bo_results(bo_results) == {"BO1": {"ratio": 0.75, "grade": "B"}, "BO2": {"ratio": 1.0, "grade": None}}
+
+    s = run_summary("2024-01-01:7", 7, "2024-01-01", bo_results, ("BO2", "BO1"))
+    assert (s.agent_id, s.workflow_date, s.status, s.error_message) == ("7", datetime.date(2024, 1, 1), "completed", None)
+    assert s.final_priority_order == ["BO2", "BO1"]
+
+    writer = _Recorder()
+    with ResultsSink([writer], batch_size=3) as sink:
+        for i in range(4):
+            sink.add(run_summary(f"2024-01-01:{i}", i, "2024-01-01", bo_results, ["BO1"]))
+        # a rerun before the flush replaces the pending summary
+        sink.add_outcome(AgentOutcome("3", "2024-01-01:3", False, None, None, "ValueError: boom"), "2024-01-01")
+    assert [len(b) for b in writer.batches] == [3, 1] and writer.closed
+    failed = writer.batches[1][0]
+    assert (failed.status, failed.error_message, failed.bo_results_summary) == ("failed", "ValueError: boom", None)
+    assert sink.written == 4 and sink.flushes == 2
+
+
+if __name__ == "__main__":
+    test_summaries_and_batched_flushes()
+    print("results sink checks passed")
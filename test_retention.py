@@ -0,0 +1,140 @@
+import datetime
+import os
+import sys
+import uuid
+from pathlib import Path
+from unittest import mock
+
+import pytest
+
+os.environ["LANGCHAIN_TRACING_V2"] = "false"  # keep test runs out of LangSmith
+
+sys.path.insert(0, str(Path(__file__).parent / "database"))
+from retention import (
+    _Archiver,
+    compact_batch,
+    decode_archive,
+    encode_archive,
+    expired_partitions,
+    final_checkpoint,
+    load_archive,
+    materialize,
+    thread_date,
+)
+from utils.checkpointing import diff
+
+# A scratch database to run the retention job against (loaded from schema.sql by the test)
+TEST_DSN = os.getenv("TEST_POSTGRES_DSN")
+
+
+def test_materialize_resolves_delta_chains():
+    v0 = {"BO1": {"ratio": 0.1, "actual": 1}, "BO2": {"ratio": 0.2}}
+    v1 = {"BO1": {"ratio": 0.5, "actual": 1}, "BO2": {"ratio": 0.2}}
+    v2 = {"BO1": {"ratio": 0.5, "actual": 2.0}, "BO3": {"ratio": 0.9}}
+    states = {
+        "c0": {"agent_id": "7", "bo_results": v0},
+        "c1": {"agent_id": "7", "bo_results": {"__delta__": 1, "base": "c0", "patch": diff(v0, v1)}},
+    }
+    final = {"agent_id": "7", "bo_results": {"__delta__": 2, "base": "c1", "patch": diff(v1, v2)}}
+    out = materialize(final, states)
+    assert out == {"agent_id": "7", "bo_results": v2}
+    assert isinstance(out["bo_results"]["BO1"]["actual"], float)
+
+    # Once its base is gone a patch cannot be resolved, so compaction must not prune it
+    del states["c0"]
+    try:
+        materialize(final, states)
+    except LookupError:
+        pass
+    else:
+        raise AssertionError("missing delta base not detected")
+
+
+def test_archive_roundtrip_and_final_pick():
+    rows = [{"thread_id": "2025-01-05:7", "checkpoint_ns": "", "checkpoint_id": f"1f0-{i}",
+             "checkpoint": {"channel_versions": {"bo_results": str(i)}}, "metadata": {"step": i}} for i in range(3)]
+    blobs = [{"thread_id": "2025-01-05:7", "checkpoint_ns": "", "channel": "bo_results", "version": "0",
+              "type": "msgpack", "blob": b"\x81\xa3BO1\x00"}]
+    doc = decode_archive(encode_archive("2025-01-05:7", datetime.date(2025, 1, 5), rows, blobs))
+    assert doc["thread_id"] == "2025-01-05:7" and doc["workflow_date"] == "2025-01-05"
+    assert doc["checkpoints"] == rows and doc["blobs"] == blobs and doc["writes"] == []
+
+    assert final_checkpoint(rows) is rows[2]
+    assert final_checkpoint(rows, rows[1]["checkpoint_id"]) is rows[1]
+    assert final_checkpoint(rows, uuid.uuid4()) is rows[2]
+    assert final_checkpoint([]) is None
+
+    assert thread_date("2025-01-05:7") == datetime.date(2025, 1, 5)
+    assert thread_date("session_1") is None and thread_date("2025-13-05:7") is None
+
+
+def test_expired_partitions():
+    names = ["checkpoints_default", "checkpoints_p2024_11", "checkpoints_p2024_12", "checkpoints_p2025_01", "other"]
+    assert expired_partitions(names, datetime.date(2025, 1, 1)) == ["checkpoints_p2024_11", "checkpoints_p2024_12"]
+    assert expired_partitions(names, datetime.date(2024, 12, 31)) == ["checkpoints_p2024_11"]
+
+
+def test_compaction_keeps_the_saver_readable():
+    if not TEST_DSN:
+        pytest.skip("set TEST_POSTGRES_DSN to a scratch database to run the retention job against Postgres")
+    import psycopg
+
+    from main import workflow
+    from nodes import fetch_data
+    from test_fetch_data import _serve
+    from utils.checkpointing import DeltaCheckpointSaver, PooledPostgresSaver, _is_delta
+
+    date, agents = "2024-03-01", ("1", "2", "9")
+    threads = {a: f"{date}:{a}-{uuid.uuid4().hex[:8]}" for a in agents}
+    with psycopg.connect(TEST_DSN, autocommit=True) as conn:
+        conn.execute((Path(__file__).parent / "database" / "schema.sql").read_text(encoding="utf-8"))
+        conn.execute("SELECT langgraph.create_checkpoint_partitions(%s, %s)", (date, date))
+
+        server, base_url = _serve()
+        saver = PooledPostgresSaver(TEST_DSN, max_size=2)
+        try:
+            with mock.patch.object(fetch_data, "BASE_URL", base_url):
+                fetch_data.prefetch(date)
+                app = workflow.compile(checkpointer=DeltaCheckpointSaver(saver, max_depth=8))
+                for _ in range(2):
+                    for a, t in threads.items():
+                        app.invoke({"agent_id": a, "date": date}, {"configurable": {"thread_id": t}})
+            expected = {t: app.get_state({"configurable": {"thread_id": t}}).values for t in threads.values()}
+            before = {t: len(list(saver.list({"configurable": {"thread_id": t}}))) for t in threads.values()}
+            conn.execute(
+                "INSERT INTO workflow_runs (thread_id, agent_id, workflow_date, status)"
+                " SELECT t, a, %s, 'completed' FROM unnest(%s::text[], %s::text[]) AS r(t, a)",
+                (date, list(threads.values()), list(threads)),
+            )
+
+            archiver = _Archiver("blobs")
+            while compact_batch(conn, datetime.date(2024, 4, 1), archiver, batch_size=2)[0]:
+                pass
+
+            # A fresh delta saver (no cache) reads the kept checkpoint back from rebased blobs alone
+            reader = DeltaCheckpointSaver(saver)
+            for t in threads.values():
+                cfg = {"configurable": {"thread_id": t}}
+                assert [c.checkpoint["id"] for c in saver.list(cfg)] == [reader.get_tuple(cfg).checkpoint["id"]]
+                assert workflow.compile(checkpointer=reader).get_state(cfg).values == expected[t]
+                assert len(load_archive(conn, t)["checkpoints"]) == before[t] - 1
+                for (channel, version) in reader.get_tuple(cfg).checkpoint["channel_versions"].items():
+                    found = conn.execute("SELECT type, blob FROM langgraph.checkpoint_blobs"
+                                         " WHERE thread_id = %s AND channel = %s AND version = %s",
+                                         (t, channel, str(version))).fetchone()
+                    assert found is None or found[1] is None or not _is_delta(saver.serde.loads_typed((found[0], found[1])))
+            assert conn.execute("SELECT count(*) FROM workflow_runs WHERE thread_id = ANY(%s) AND compacted_at IS NOT NULL",
+                                (list(threads.values()),)).fetchone()[0] == len(threads)
+        finally:
+            saver.close()
+            fetch_data.release()
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    test_materialize_resolves_delta_chains()
+    test_archive_roundtrip_and_final_pick()
+    test_expired_partitions()
+    if TEST_DSN:
+        test_compaction_keeps_the_saver_readable()
+    print("retention checks passed")
@@ -0,0 +1,19 @@
+import re
+from pathlib import Path
+
+DATABASE = Path(__file__).parent / "database"
+
+
+def test_schema_records_every_migration():
+    # schema.sql is the fresh-install result of all migrations, so it must
+    # record each one as applied (otherwise migrate.py would re-run it)
+    versions = sorted(p.name.split("_", 1)[0] for p in (DATABASE / "migrations").glob("[0-9][0-9][0-9]_*.sql"))
+    assert versions and versions == [f"{i:03d}" for i in range(1, len(versions) + 1)]
+    schema = (DATABASE / "schema.sql").read_text(encoding="utf-8")
+    recorded = re.findall(r"\('(\d{3})', '\w+'\)", schema)
+    assert recorded == versions
+
+
+if __name__ == "__main__":
+    test_schema_records_every_migration()
+    print("schema checks passed")
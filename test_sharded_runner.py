@@ -0,0 +1,53 @@
+import json
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+
+os.environ["LANGCHAIN_TRACING_V2"] = "false"  # keep test runs out of LangSmith
+
+import sharded_runner
+from nodes import fetch_data
+from synthetic_fleet import generate_fleet, serve
+from utils import config
+
+
+def test_spawned_workers_keep_the_pinned_config_after_an_edit():
+    fleet = generate_fleet(40, seed=3)
+    server, base_url = serve(fleet)
+    raw = json.loads(config.DEFAULT_CONFIG_PATH.read_text(encoding="utf-8"))
+    previous_base, fetch_data.BASE_URL = fetch_data.BASE_URL, base_url
+    previous_registry = config._registries.get(config.DEFAULT_CONFIG_PATH)
+    previous_context, previous_shutdown = sharded_runner._mp_context, fetch_data.shutdown_fetch_pool
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "enterprise_config.json"
+        raw["config_meta"]["config_version"] = "pinned"
+        path.write_text(json.dumps(raw), encoding="utf-8")
+        registry = config.ConfigRegistry(path, poll_interval=0)
+        config._registries[config.DEFAULT_CONFIG_PATH] = registry
+
+        def edit_then_shutdown():
+            # runs after iter_sharded pinned the config and before the pool starts
+            raw["config_meta"]["config_version"] = "edited"
+            path.write_text(json.dumps(raw), encoding="utf-8")
+            assert registry.current().version == "edited"
+            previous_shutdown()
+
+        sharded_runner._mp_context = lambda: multiprocessing.get_context("spawn")
+        fetch_data.shutdown_fetch_pool = edit_then_shutdown
+        try:
+            report = sharded_runner.run_sharded(fleet.date, workers=2, shard_size=20)
+        finally:
+            sharded_runner._mp_context, fetch_data.shutdown_fetch_pool = previous_context, previous_shutdown
+            config._registries.pop(config.DEFAULT_CONFIG_PATH)
+            if previous_registry is not None:
+                config._registries[config.DEFAULT_CONFIG_PATH] = previous_registry
+            fetch_data.BASE_URL = previous_base
+            server.shutdown()
+    assert len(report.outcomes) == 40
+    assert all(o.ok for o in report.outcomes), [o.error for o in report.outcomes if not o.ok][:3]
+
+
+if __name__ == "__main__":
+    test_spawned_workers_keep_the_pinned_config_after_an_edit()
+    print("sharded runner checks passed")
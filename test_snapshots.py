@@ -0,0 +1,91 @@
+import json
+import os
+import tempfile
+
+from utils.snapshots import (
+    SegmentReader,
+    SegmentSnapshotWriter,
+    load_snapshot,
+    save_snapshot,
+)
+
+
+def _state(agent_id, ratio):
+    return {"agent_id": agent_id, "date": "2024-01-01", "raw_metrics": {"outstanding": {"outstanding_amount": 5.0}},
+            "bo_results": {"BO1": {"ratio": ratio, "grade": "A"}}, "final_priority_order": ["BO1"]}
+
+
+def test_segment_roundtrip_single_reads_and_recovery():
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec_name in ("msgpack", "json"):
+            for compression in (None, "zlib"):
+                path = os.path.join(tmp, f"{codec_name}-{compression}.seg")
+                with SegmentSnapshotWriter(path, codec_name, compression) as w:
+                    for i in range(50):
+                        w.write(f"t{i}", _state(str(i), i / 10))
+                    w.write("t3", _state("3", 99.0))  # later snapshot supersedes
+                reader = SegmentReader(path)
+                assert (reader.codec, reader.compression, len(reader)) == (codec_name, compression, 50)
+                assert reader.get("t7") == _state("7", 0.7)
+                assert reader.get("t3")["bo_results"]["BO1"]["ratio"] == 99.0
+                assert [k for k, _ in reader][-1] == "t3"
+
+        # Reopen appends with the segment's own settings
+        path = os.path.join(tmp, "msgpack-zlib.seg")
+        with SegmentSnapshotWriter(path) as w:
+            w.write("t50", _state("50", 5.0))
+        assert SegmentReader(path).get("t50") == _state("50", 5.0)
+        try:
+            SegmentSnapshotWriter(path, "json")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("codec mismatch on reopen not detected")
+
+        # Crash before the index was written, plus a torn trailing record
+        os.remove(path + ".idx")
+        with open(path, "ab") as fh:
+            fh.write(b"\x02\x00\xff\x00\x00\x00t9")
+        reader = SegmentReader(path)
+        assert reader.stale and len(reader) == 51 and reader.get("t49") == _state("49", 4.9)
+        with SegmentSnapshotWriter(path) as w:
+            w.write("t51", _state("51", 5.1))
+        reader = SegmentReader(path)
+        assert not reader.stale and reader.get("t51") == _state("51", 5.1) and reader.get("t0") == _state("0", 0.0)
+
+
+def test_new_segment_replaces_a_leftover_index():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "day.seg")
+        with SegmentSnapshotWriter(path, "json") as w:
+            for i in range(20):
+                w.write(f"old{i}", _state(str(i), i / 10))
+        os.remove(path)  # segment deleted, its index left behind
+        with SegmentSnapshotWriter(path, "json") as w:
+            w.write("new", _state("1", 0.5))
+        with open(path + ".idx", encoding="utf-8") as fh:
+            assert [json.loads(line)[0] for line in fh] == ["new"]
+        reader = SegmentReader(path)
+        assert not reader.stale and len(reader) == 1 and "old3" not in reader
+        assert reader.get("new") == _state("1", 0.5)
+
+
+def test_json_snapshots_and_load():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.json")
+        assert save_snapshot(_state("1", 0.5), "s1", path) == path
+        with open(path, encoding="utf-8") as fh:
+            assert fh.read() == json.dumps(_state("1", 0.5), indent=2, ensure_ascii=False)
+        assert load_snapshot(path) == _state("1", 0.5)
+
+        seg = os.path.join(tmp, "states.seg")
+        assert save_snapshot(_state("1", 0.5), "s1", seg) == seg + "#s1"
+        save_snapshot(_state("2", 0.6), "s2", seg)
+        assert load_snapshot(seg, "s1") == _state("1", 0.5)
+
+
+if __name__ == "__main__":
+    test_segment_roundtrip_single_reads_and_recovery()
+    test_new_segment_replaces_a_leftover_index()
+    test_json_snapshots_and_load()
+    print("snapshot checks passed")
@@ -0,0 +1,45 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Loaded only when a graph is built, a checkpointer connects, the network is used or a batch is vectorized
+HEAVY = ("langgraph", "langchain_core", "dotenv", "psycopg", "psycopg_pool", "requests", "httpx", "numpy", "pyarrow")
+ENTRY_POINTS = ("main", "nodes.b01", "sharded_runner", "batch_runner")
+
+_PROBE = """
+import json, sys
+import {module}
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def _modules_after_import(module):
+    # A fresh interpreter, so nothing imported by other tests leaks in
+    proc = subprocess.run([sys.executable, "-c", _PROBE.format(module=module)], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    return {m.split(".")[0] for m in json.loads(proc.stdout.strip().splitlines()[-1])}
+
+
+def test_entry_points_import_without_heavy_dependencies():
+    for module in ENTRY_POINTS:
+        loaded = _modules_after_import(module) & set(HEAVY)
+        assert not loaded, f"import {module} loads {sorted(loaded)}"
+
+
+def test_app_is_built_on_first_access():
+    probe = ("import sys, main; assert 'langgraph' not in sys.modules; "
+             "from main import app, workflow; assert main.get_app() is app and main.get_workflow() is workflow; "
+             "print(type(app).__name__)")
+    env = {**os.environ, "LANGCHAIN_TRACING_V2": "false", "POSTGRES_CONNECTION_STRING": "", "POSTGRES_PASSWORD": ""}
+    proc = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True, env=env)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip().splitlines()[-1] == "CompiledStateGraph"
+
+
+if __name__ == "__main__":
+    test_entry_points_import_without_heavy_dependencies()
+    test_app_is_built_on_first_access()
+    print("startup checks passed")
@@ -0,0 +1,879 @@
+"""Buffered checkpoint writes for bulk runs.
+
+LangGraph checkpoints every superstep: for this graph that is five
+checkpoint writes (input, fetch, BO fan-out, merge, prioritize) plus the
+pending writes of every task, each a separate round-trip on
+PostgresSaver. `BufferedCheckpointSaver` wraps any saver and keeps those
+writes in memory, flushing them to the wrapped saver in batches of
+`batch_size` checkpoints. Durability levels:
+
+* ``"full"``    - pass every write straight through (debug runs);
+* ``"batched"`` - keep every checkpoint, but write them in batches;
+* ``"final"``   - keep only the latest checkpoint per thread: the
+  intermediate ones of a run are coalesced away before they are written.
+
+The level can be overridden per thread (`debug_threads`) or per run via
+``config["configurable"]["durability"]``. Buffered checkpoints are served
+to readers from memory until flushed; call `flush()` (or use the saver as
+a context manager) before the process exits.
+
+`DeltaCheckpointSaver` sits below the buffer and stores each new version
+of a dict channel (bo_results, bo_fingerprints, raw_metrics on reruns) as a
+patch against the parent checkpoint's value, with a full base value every
+`max_depth` hops. Reads resolve the patches, so any stored step can still
+be reconstructed.
+
+At the bottom, `PooledPostgresSaver` and `PooledAsyncPostgresSaver` are the
+Postgres savers main.py connects: connection-pooled, lock-free, with health
+checks and a retry on dropped connections, so concurrent runs scale with
+the pool size.
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_metadata,
+)
+
+DURABILITY_LEVELS = ("full", "batched", "final")
+DEFAULT_BATCH_SIZE = 500  # buffered checkpoints per flush
+
+logger = logging.getLogger(__name__)
+
+
+class _Pending:
+    """Buffered operations of one (thread_id, checkpoint_ns), in call order."""
+
+    __slots__ = ("ops", "n_puts")
+
+    def __init__(self):
+        self.ops: List[tuple] = []  # ("put", config, checkpoint, metadata, versions) | ("writes", config, writes, task_id, task_path)
+        self.n_puts = 0
+
+    def latest(self) -> Optional[tuple]:
+        return next((op for op in reversed(self.ops) if op[0] == "put"), None)
+
+
+def _key(config) -> Tuple[str, str]:
+    c = config["configurable"]
+    return str(c["thread_id"]), c.get("checkpoint_ns", "")
+
+
+def _next_config(config, checkpoint) -> Dict[str, Any]:
+    c = config["configurable"]
+    return {"configurable": {"thread_id": c["thread_id"], "checkpoint_ns": c.get("checkpoint_ns", ""),
+                             "checkpoint_id": checkpoint["id"]}}
+
+
+class BufferedCheckpointSaver(BaseCheckpointSaver):
+    """Checkpoint saver that buffers and batch-flushes writes to `inner`.
+
+    Batches go through `inner.put_many(ops)` / `inner.aput_many(ops)` when
+    the wrapped saver has them (see BatchPostgresSaver), otherwise through
+    its put/put_writes one by one. A failed flush puts the operations back
+    in the buffer; the wrapped saver's upserts make the retry idempotent.
+    """
+
+    def __init__(self, inner: BaseCheckpointSaver, durability: str = "final",
+                 batch_size: int = DEFAULT_BATCH_SIZE, debug_threads: Iterable[str] = ()):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"durability must be one of {DURABILITY_LEVELS}, got {durability!r}")
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.durability = durability
+        self.batch_size = batch_size
+        self.debug_threads = {str(t) for t in debug_threads}
+        self._buffer: "OrderedDict[Tuple[str, str], _Pending]" = OrderedDict()
+        self._n_puts = 0
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.flushed_checkpoints = 0
+        self.coalesced_checkpoints = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def level(self, config) -> str:
+        c = config["configurable"]
+        if str(c.get("thread_id")) in self.debug_threads:
+            return "full"
+        return c.get("durability") or self.durability
+
+    @property
+    def pending(self) -> int:
+        """Checkpoints buffered and not yet written."""
+        return self._n_puts
+
+    # -- buffering --------------------------------------------------------
+
+    def _buffer_put(self, config, checkpoint, metadata, new_versions) -> Tuple[Dict[str, Any], bool]:
+        level = self.level(config)
+        checkpoint = copy_checkpoint(checkpoint)
+        with self._lock:
+            pending = self._buffer.setdefault(_key(config), _Pending())
+            latest = pending.latest() if level == "final" else None
+            if latest is not None:
+                # Coalesce: the new checkpoint replaces the run's previous one,
+                # keeps its parent (the last checkpoint actually written) and
+                # carries every channel version written since, so the wrapped
+                # saver stores the values those intermediate checkpoints held.
+                parent = latest[1]["configurable"].get("checkpoint_id")
+                config = {**config, "configurable": {**config["configurable"], "checkpoint_id": parent}}
+                versions = {**latest[4], **new_versions}
+                new_versions = {k: checkpoint["channel_versions"][k] for k in versions if k in checkpoint["channel_versions"]}
+                pending.ops = [("put", config, checkpoint, metadata, new_versions)]
+                self.coalesced_checkpoints += 1
+            else:
+                pending.ops.append(("put", config, checkpoint, metadata, dict(new_versions)))
+                pending.n_puts += 1
+                self._n_puts += 1
+            full = self._n_puts >= self.batch_size
+        return _next_config(config, checkpoint), full
+
+    def _buffer_writes(self, config, writes, task_id, task_path) -> bool:
+        with self._lock:
+            pending = self._buffer.get(_key(config))
+            if pending is None:
+                return False
+            pending.ops.append(("writes", config, list(writes), task_id, task_path))
+            return True
+
+    def _take(self, keys: Optional[Sequence[Tuple[str, str]]] = None):
+        with self._lock:
+            if keys is None:
+                taken, self._buffer = self._buffer, OrderedDict()
+            else:
+                taken = OrderedDict((k, self._buffer.pop(k)) for k in keys if k in self._buffer)
+            n = sum(p.n_puts for p in taken.values())
+            self._n_puts -= n
+        return taken, n
+
+    def _requeue(self, taken):
+        with self._lock:
+            for key, newer in self._buffer.items():
+                if key in taken:
+                    taken[key].ops.extend(newer.ops)
+                    taken[key].n_puts += newer.n_puts
+                else:
+                    taken[key] = newer
+            self._buffer = taken
+            self._n_puts = sum(p.n_puts for p in taken.values())
+
+    def _thread_keys(self, thread_id) -> List[Tuple[str, str]]:
+        with self._lock:
+            return [k for k in self._buffer if k[0] == str(thread_id)]
+
+    # -- flushing ---------------------------------------------------------
+
+    def flush(self, keys: Optional[Sequence[Tuple[str, str]]] = None) -> int:
+        """Write buffered operations to the wrapped saver. Returns the number of checkpoints written."""
+        taken, n = self._take(keys)
+        if not taken:
+            return 0
+        ops = [op for pending in taken.values() for op in pending.ops]
+        try:
+            put_many = getattr(self.inner, "put_many", None)
+            if put_many is not None:
+                put_many(ops)
+            else:
+                for op in ops:
+                    (self.inner.put if op[0] == "put" else self.inner.put_writes)(*op[1:])
+        except BaseException:
+            self._requeue(taken)
+            raise
+        self.flushes += 1
+        self.flushed_checkpoints += n
+        return n
+
+    async def aflush(self, keys: Optional[Sequence[Tuple[str, str]]] = None) -> int:
+        taken, n = self._take(keys)
+        if not taken:
+            return 0
+        ops = [op for pending in taken.values() for op in pending.ops]
+        try:
+            aput_many = getattr(self.inner, "aput_many", None)
+            if aput_many is not None:
+                await aput_many(ops)
+            else:
+                for op in ops:
+                    await (self.inner.aput if op[0] == "put" else self.inner.aput_writes)(*op[1:])
+        except BaseException:
+            self._requeue(taken)
+            raise
+        self.flushes += 1
+        self.flushed_checkpoints += n
+        return n
+
+    # -- reads ------------------------------------------------------------
+
+    def _buffered_tuple(self, config) -> Optional[CheckpointTuple]:
+        wanted = config["configurable"].get("checkpoint_id")
+        with self._lock:
+            pending = self._buffer.get(_key(config))
+            latest = pending.latest() if pending is not None else None
+            if latest is None or (wanted and wanted != latest[2]["id"]):
+                return None
+            _, put_config, checkpoint, metadata, _ = latest
+            writes = []
+            for op in pending.ops:
+                if op[0] == "writes" and op[1]["configurable"].get("checkpoint_id") == checkpoint["id"]:
+                    writes.extend((op[3], channel, value) for channel, value in op[2])
+        parent = put_config["configurable"].get("checkpoint_id")
+        c = put_config["configurable"]
+        return CheckpointTuple(
+            config=_next_config(put_config, checkpoint),
+            checkpoint=checkpoint,
+            metadata=get_checkpoint_metadata(put_config, metadata),
+            parent_config={"configurable": {"thread_id": c["thread_id"], "checkpoint_ns": c.get("checkpoint_ns", ""),
+                                            "checkpoint_id": parent}} if parent else None,
+            pending_writes=writes,
+        )
+
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        found = self._buffered_tuple(config)
+        if found is not None:
+            return found
+        if config["configurable"].get("checkpoint_id"):
+            self.flush(self._thread_keys(config["configurable"]["thread_id"]))
+        return self.inner.get_tuple(config)
+
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        found = self._buffered_tuple(config)
+        if found is not None:
+            return found
+        if config["configurable"].get("checkpoint_id"):
+            await self.aflush(self._thread_keys(config["configurable"]["thread_id"]))
+        return await self.inner.aget_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        self.flush()
+        yield from self.inner.list(config, filter=filter, before=before, limit=limit)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        await self.aflush()
+        async for item in self.inner.alist(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    # -- writes -----------------------------------------------------------
+
+    def put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions):
+        if self.level(config) == "full":
+            self.flush(self._thread_keys(config["configurable"]["thread_id"]))
+            return self.inner.put(config, checkpoint, metadata, new_versions)
+        next_config, full = self._buffer_put(config, checkpoint, metadata, new_versions)
+        if full:
+            self.flush()
+        return next_config
+
+    async def aput(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions):
+        if self.level(config) == "full":
+            await self.aflush(self._thread_keys(config["configurable"]["thread_id"]))
+            return await self.inner.aput(config, checkpoint, metadata, new_versions)
+        next_config, full = self._buffer_put(config, checkpoint, metadata, new_versions)
+        if full:
+            await self.aflush()
+        return next_config
+
+    def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if self.level(config) == "full" or not self._buffer_writes(config, writes, task_id, task_path):
+            self.inner.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if self.level(config) == "full" or not self._buffer_writes(config, writes, task_id, task_path):
+            await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._take(self._thread_keys(thread_id))
+        self.inner.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._take(self._thread_keys(thread_id))
+        await self.inner.adelete_thread(thread_id)
+
+    async def aclose(self) -> None:
+        """Flush, then release the wrapped saver's event-loop resources (PooledPostgresSaver's async pool)."""
+        await self.aflush()
+        aclose = getattr(self.inner, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+
+_DELTA = "__delta__"
+
+
+def _same(a: Any, b: Any) -> bool:
+    # Strict equality: 1 == 1.0, but the stored value must keep its type
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(v, b[k]) for k, v in a.items())
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Recursive patch turning `old` into `new` (see `patch`)."""
+    sets, subs = {}, {}
+    for k, v in new.items():
+        if k not in old:
+            sets[k] = v
+        elif isinstance(v, dict) and isinstance(old[k], dict):
+            if not _same(old[k], v):
+                subs[k] = diff(old[k], v)
+        elif not _same(old[k], v):
+            sets[k] = v
+    out = {}
+    if sets:
+        out["set"] = sets
+    if subs:
+        out["sub"] = subs
+    dels = [k for k in old if k not in new]
+    if dels:
+        out["del"] = dels
+    return out
+
+
+def patch(base: Dict[str, Any], p: Dict[str, Any]) -> Dict[str, Any]:
+    out = dict(base)
+    for k in p.get("del", ()):
+        out.pop(k, None)
+    for k, sub in p.get("sub", {}).items():
+        out[k] = patch(out.get(k) or {}, sub)
+    out.update(p.get("set", {}))
+    return out
+
+
+def _is_delta(value: Any) -> bool:
+    return isinstance(value, dict) and _DELTA in value
+
+
+def _encodable(channel: str, value: Any) -> bool:
+    return isinstance(value, dict) and not channel.startswith(("__", "branch:"))
+
+
+class DeltaCheckpointSaver(BaseCheckpointSaver):
+    """Stores changed dict channels as patches against the parent checkpoint.
+
+    A patch is stored as ``{"__delta__": depth, "base": <parent checkpoint
+    id>, "patch": {...}}`` in place of the channel value, so it lands in the
+    wrapped saver's channel blobs (langgraph.checkpoint_blobs on Postgres)
+    like any other value. The first version of a channel, and every version
+    `max_depth` hops after the last full one, is stored in full. Reads
+    resolve patches by walking back through the base checkpoints; values
+    written without deltas read back unchanged. The last written values per
+    thread are cached (up to `cache_size` threads) so encoding rarely reads.
+    """
+
+    def __init__(self, inner: BaseCheckpointSaver, max_depth: int = 8, cache_size: int = 10_000):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.max_depth = max_depth
+        self.cache_size = cache_size
+        # (thread_id, ns) -> (checkpoint_id, {channel: (value, depth)}) of the last put
+        self._last: "OrderedDict[Tuple[str, str], Tuple[str, Dict[str, Tuple[Any, int]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # -- encoding ---------------------------------------------------------
+
+    @staticmethod
+    def _base_from(found: Optional[CheckpointTuple]) -> Dict[str, Tuple[Any, int]]:
+        if found is None:
+            return {}
+        return {ch: (v, found.checkpoint["channel_values"].get(_DELTA + ch, 0))
+                for ch, v in found.checkpoint["channel_values"].items() if not ch.startswith(_DELTA)}
+
+    def _cached_base(self, config) -> Optional[Dict[str, Tuple[Any, int]]]:
+        parent = config["configurable"].get("checkpoint_id")
+        if not parent:
+            return {}
+        with self._lock:
+            last = self._last.get(_key(config))
+        return last[1] if last is not None and last[0] == parent else None
+
+    def _encode(self, config, checkpoint: Checkpoint, new_versions: ChannelVersions, base) -> Checkpoint:
+        parent = config["configurable"].get("checkpoint_id")
+        values = dict(checkpoint["channel_values"])
+        record = dict(base)
+        for ch in new_versions:
+            value = values.get(ch)
+            if not _encodable(ch, value):
+                record.pop(ch, None)
+                continue
+            old = base.get(ch)
+            if old is None or not old[0] or not isinstance(old[0], dict) or old[1] >= self.max_depth:
+                record[ch] = (value, 0)
+                continue
+            values[ch] = {_DELTA: old[1] + 1, "base": parent, "patch": diff(old[0], value)}
+            record[ch] = (value, old[1] + 1)
+        with self._lock:
+            self._last[_key(config)] = (checkpoint["id"], record)
+            self._last.move_to_end(_key(config))
+            while len(self._last) > self.cache_size:
+                self._last.popitem(last=False)
+        return {**checkpoint, "channel_values": values}
+
+    # -- resolving --------------------------------------------------------
+
+    def _resolve(self, found: Optional[CheckpointTuple]) -> Optional[CheckpointTuple]:
+        if found is None:
+            return None
+        values = found.checkpoint["channel_values"]
+        if not any(_is_delta(v) for v in values.values()):
+            return found
+        resolved = dict(values)
+        for ch, v in values.items():
+            if _is_delta(v):
+                resolved[ch] = patch(self._channel_at(found.config, v["base"], ch), v["patch"])
+                resolved[_DELTA + ch] = v[_DELTA]  # depth, used when encoding on top of this checkpoint
+        return found._replace(checkpoint={**found.checkpoint, "channel_values": resolved})
+
+    def _channel_at(self, config, checkpoint_id: str, channel: str) -> Dict[str, Any]:
+        # Walk back through delta bases for one channel, then apply patches oldest first
+        chain = []
+        c = config["configurable"]
+        while True:
+            found = self.inner.get_tuple({"configurable": {"thread_id": c["thread_id"], "checkpoint_ns": c.get("checkpoint_ns", ""),
+                                                            "checkpoint_id": checkpoint_id}})
+            if found is None:
+                raise LookupError(f"delta base checkpoint {checkpoint_id} for {channel!r} is missing")
+            value = found.checkpoint["channel_values"].get(channel) or {}
+            if not _is_delta(value):
+                break
+            chain.append(value["patch"])
+            checkpoint_id = value["base"]
+        for p in reversed(chain):
+            value = patch(value, p)
+        return value
+
+    async def _achannel_at(self, config, checkpoint_id: str, channel: str) -> Dict[str, Any]:
+        chain = []
+        c = config["configurable"]
+        while True:
+            found = await self.inner.aget_tuple({"configurable": {"thread_id": c["thread_id"], "checkpoint_ns": c.get("checkpoint_ns", ""),
+                                                                   "checkpoint_id": checkpoint_id}})
+            if found is None:
+                raise LookupError(f"delta base checkpoint {checkpoint_id} for {channel!r} is missing")
+            value = found.checkpoint["channel_values"].get(channel) or {}
+            if not _is_delta(value):
+                break
+            chain.append(value["patch"])
+            checkpoint_id = value["base"]
+        for p in reversed(chain):
+            value = patch(value, p)
+        return value
+
+    async def _aresolve(self, found: Optional[CheckpointTuple]) -> Optional[CheckpointTuple]:
+        if found is None:
+            return None
+        values = found.checkpoint["channel_values"]
+        if not any(_is_delta(v) for v in values.values()):
+            return found
+        resolved = dict(values)
+        for ch, v in values.items():
+            if _is_delta(v):
+                resolved[ch] = patch(await self._achannel_at(found.config, v["base"], ch), v["patch"])
+                resolved[_DELTA + ch] = v[_DELTA]
+        return found._replace(checkpoint={**found.checkpoint, "channel_values": resolved})
+
+    @staticmethod
+    def _public(found: Optional[CheckpointTuple]) -> Optional[CheckpointTuple]:
+        # Drop the depth bookkeeping before handing the tuple to LangGraph
+        if found is None or not any(ch.startswith(_DELTA) for ch in found.checkpoint["channel_values"]):
+            return found
+        values = {ch: v for ch, v in found.checkpoint["channel_values"].items() if not ch.startswith(_DELTA)}
+        return found._replace(checkpoint={**found.checkpoint, "channel_values": values})
+
+    # -- BaseCheckpointSaver ----------------------------------------------
+
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        return self._public(self._resolve(self.inner.get_tuple(config)))
+
+    async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+        return self._public(await self._aresolve(await self.inner.aget_tuple(config)))
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        for found in self.inner.list(config, filter=filter, before=before, limit=limit):
+            yield self._public(self._resolve(found))
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        async for found in self.inner.alist(config, filter=filter, before=before, limit=limit):
+            yield self._public(await self._aresolve(found))
+
+    def _encoded(self, config, checkpoint, new_versions) -> Checkpoint:
+        base = self._cached_base(config)
+        if base is None:
+            base = self._base_from(self._resolve(self.inner.get_tuple(config)))
+        return self._encode(config, checkpoint, new_versions, base)
+
+    async def _aencoded(self, config, checkpoint, new_versions) -> Checkpoint:
+        base = self._cached_base(config)
+        if base is None:
+            base = self._base_from(await self._aresolve(await self.inner.aget_tuple(config)))
+        return self._encode(config, checkpoint, new_versions, base)
+
+    def put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions):
+        return self.inner.put(config, self._encoded(config, checkpoint, new_versions), metadata, new_versions)
+
+    async def aput(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions):
+        return await self.inner.aput(config, await self._aencoded(config, checkpoint, new_versions), metadata, new_versions)
+
+    def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        self.inner.put_writes(config, writes, task_id, task_path)
+
+    async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        await self.inner.aput_writes(config, writes, task_id, task_path)
+
+    def put_many(self, ops: Sequence[tuple]) -> None:
+        ops = [("put", op[1], self._encoded(op[1], op[2], op[4]), op[3], op[4]) if op[0] == "put" else op for op in ops]
+        put_many = getattr(self.inner, "put_many", None)
+        if put_many is not None:
+            put_many(ops)
+        else:
+            for op in ops:
+                (self.inner.put if op[0] == "put" else self.inner.put_writes)(*op[1:])
+
+    async def aput_many(self, ops: Sequence[tuple]) -> None:
+        ops = [("put", op[1], await self._aencoded(op[1], op[2], op[4]), op[3], op[4]) if op[0] == "put" else op
+               for op in ops]
+        aput_many = getattr(self.inner, "aput_many", None)
+        if aput_many is not None:
+            await aput_many(ops)
+        else:
+            for op in ops:
+                await (self.inner.aput if op[0] == "put" else self.inner.aput_writes)(*op[1:])
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._last if k[0] == str(thread_id)]:
+                del self._last[key]
+        self.inner.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._last if k[0] == str(thread_id)]:
+                del self._last[key]
+        await self.inner.adelete_thread(thread_id)
+
+    async def aclose(self) -> None:
+        aclose = getattr(self.inner, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+
+try:
+    from langgraph.checkpoint.postgres import PostgresSaver
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+    from psycopg import OperationalError, sql
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool, ConnectionPool, PoolTimeout
+except ImportError:  # langgraph-checkpoint-postgres / psycopg-pool not installed; the Postgres savers are not defined
+    PostgresSaver = None
+
+DEFAULT_POOL_SIZE = 16  # connections; matches batch_runner's default max_concurrency
+DEFAULT_POOL_TIMEOUT = 30.0  # seconds a caller waits for a free connection
+DEFAULT_CONNECT_TIMEOUT = 10.0  # seconds for the pool's first connections when it opens
+# LangGraph's checkpoints/checkpoint_blobs/checkpoint_writes live in their own schema, created by
+# database/migrations/004; public.checkpoints and public.checkpoint_blobs are the repo's own JSONB store
+CHECKPOINT_SCHEMA = "langgraph"
+_SAVER_TABLES = ("checkpoints", "checkpoint_blobs", "checkpoint_writes")
+
+if PostgresSaver is not None:
+    # Connection settings of PostgresSaver.from_conn_string
+    _CONNECTION_KWARGS = {"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row}
+
+    def _pool_options(max_size: int, min_size: int, timeout: float, schema: str) -> Dict[str, Any]:
+        # search_path pins every pooled connection to the saver's schema
+        kwargs = dict(_CONNECTION_KWARGS, options=f"-c search_path={schema}")
+        return dict(min_size=min(min_size, max_size), max_size=max_size, timeout=timeout, kwargs=kwargs, open=False)
+
+    _TABLES_QUERY = "SELECT " + ", ".join(f"to_regclass('{t}') AS {t}" for t in _SAVER_TABLES)
+
+    def _missing_tables(row: Dict[str, Any], schema: str) -> None:
+        missing = [t for t in _SAVER_TABLES if row[t] is None]
+        if missing:
+            raise RuntimeError(f"Checkpoint tables {', '.join(missing)} not found in schema {schema!r}: "
+                               "run `python database/migrate.py` first (or open the saver with setup=True)")
+
+    class BatchPostgresSaver(PostgresSaver):
+        """PostgresSaver that writes a batch of checkpoints and pending
+        writes through one pipelined cursor, so a flush of N checkpoints
+        costs one pipeline sync instead of N round-trips. Row encoding is
+        PostgresSaver's own (checkpoint, blob and write upserts)."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._batch = threading.local()
+
+        def _open_cursor(self, pipeline: bool):
+            return super()._cursor(pipeline=pipeline)
+
+        @contextmanager
+        def _cursor(self, *, pipeline: bool = False):
+            cur = getattr(self._batch, "cur", None)
+            if cur is not None:
+                yield cur
+                return
+            with self._open_cursor(pipeline) as cur:
+                yield cur
+
+        def put_many(self, ops: Sequence[tuple]) -> None:
+            with self._open_cursor(True) as cur:
+                self._batch.cur = cur
+                try:
+                    for op in ops:
+                        (self.put if op[0] == "put" else self.put_writes)(*op[1:])
+                finally:
+                    self._batch.cur = None
+
+    class PooledPostgresSaver(BatchPostgresSaver):
+        """BatchPostgresSaver over a psycopg `ConnectionPool` of up to
+        `max_size` connections.
+
+        PostgresSaver serializes every call on one lock, even when given a
+        pool; here each caller checks out its own connection, so concurrent
+        graph runs read and write checkpoints in parallel. Connections are
+        health-checked on checkout and replaced when broken, and the pool
+        keeps reconnecting in the background while the database is away. A
+        call that fails on a dropped connection is retried once on a fresh
+        one (the upserts are idempotent). Opening waits up to
+        `connect_timeout` for the first connection and raises
+        `psycopg_pool.PoolTimeout` if the database cannot be reached.
+
+        The tables are read and written in `schema` (search_path of every
+        pooled connection). They are created by `python database/migrate.py`
+        and opening raises RuntimeError if they are missing; `setup=True`
+        instead runs LangGraph's own migrations there (scratch databases).
+
+        `ainvoke`/`abatch` go through a `PooledAsyncPostgresSaver` with an
+        `AsyncConnectionPool` of the same size, opened on first use in each
+        event loop; `aclose()` closes the running loop's one and `close()`
+        the sync pool.
+        """
+
+        def __init__(self, dsn: str, max_size: int = DEFAULT_POOL_SIZE, min_size: int = 1,
+                     timeout: float = DEFAULT_POOL_TIMEOUT, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                     schema: str = CHECKPOINT_SCHEMA, setup: bool = False, serde=None):
+            pool = ConnectionPool(dsn, check=ConnectionPool.check_connection, name="checkpoints",
+                                  **_pool_options(max_size, min_size, timeout, schema))
+            try:
+                pool.open(wait=True, timeout=connect_timeout)
+                super().__init__(pool, serde=serde)
+                self.schema = schema
+                if setup:
+                    self.setup()
+                with pool.connection() as conn:
+                    _missing_tables(conn.execute(_TABLES_QUERY).fetchone(), schema)
+            except BaseException:
+                pool.close()
+                raise
+            self.dsn = dsn
+            self._options = dict(max_size=max_size, min_size=min_size, timeout=timeout, connect_timeout=connect_timeout,
+                                 schema=schema)
+            self._aio: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PooledAsyncPostgresSaver]" = (
+                weakref.WeakKeyDictionary())
+
+        @contextmanager
+        def _open_cursor(self, pipeline: bool):
+            # One pooled connection per caller, no saver-wide lock
+            with self.conn.connection() as conn:
+                if pipeline and self.supports_pipeline:
+                    with conn.pipeline(), conn.cursor(binary=True, row_factory=dict_row) as cur:
+                        yield cur
+                elif pipeline:
+                    with conn.transaction(), conn.cursor(binary=True, row_factory=dict_row) as cur:
+                        yield cur
+                else:
+                    with conn.cursor(binary=True, row_factory=dict_row) as cur:
+                        yield cur
+
+        def _retrying(self, fn, *args, **kwargs):
+            if getattr(self._batch, "cur", None) is not None:
+                return fn(*args, **kwargs)  # inside put_many, which retries the whole batch
+            try:
+                return fn(*args, **kwargs)
+            except OperationalError as e:
+                # The pool has discarded the broken connection; the next checkout is health-checked
+                logger.warning("Checkpoint %s failed (%s), retrying on a fresh connection", fn.__name__, e)
+                return fn(*args, **kwargs)
+
+        def setup(self) -> None:
+            with self.conn.connection() as conn:
+                conn.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(self.schema)))
+            super().setup()
+
+        def get_tuple(self, config) -> Optional[CheckpointTuple]:
+            return self._retrying(super().get_tuple, config)
+
+        def put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions):
+            return self._retrying(super().put, config, checkpoint, metadata, new_versions)
+
+        def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+            return self._retrying(super().put_writes, config, writes, task_id, task_path)
+
+        def put_many(self, ops: Sequence[tuple]) -> None:
+            return self._retrying(super().put_many, ops)
+
+        def delete_thread(self, thread_id: str) -> None:
+            return self._retrying(super().delete_thread, thread_id)
+
+        def stats(self) -> Dict[str, int]:
+            """The sync pool's counters (pool_size, pool_available, requests_waiting, connections_lost, ...)."""
+            return self.conn.get_stats()
+
+        def healthy(self) -> bool:
+            """Whether a pooled connection answers a query within the pool timeout."""
+            try:
+                with self.conn.connection() as conn:
+                    conn.execute("SELECT 1")
+            except (OperationalError, PoolTimeout):
+                return False
+            return True
+
+        def close(self) -> None:
+            self.conn.close()
+
+        async def _async_saver(self) -> "PooledAsyncPostgresSaver":
+            loop = asyncio.get_running_loop()
+            saver = self._aio.get(loop)
+            if saver is None:
+                opened = await PooledAsyncPostgresSaver.open(self.dsn, setup=False, serde=self.serde, **self._options)
+                saver = self._aio.setdefault(loop, opened)
+                if saver is not opened:  # a concurrent first call won
+                    await opened.aclose()
+            return saver
+
+        async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+            return await (await self._async_saver()).aget_tuple(config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+            saver = await self._async_saver()
+            async for item in saver.alist(config, filter=filter, before=before, limit=limit):
+                yield item
+
+        async def aput(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions):
+            return await (await self._async_saver()).aput(config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+            await (await self._async_saver()).aput_writes(config, writes, task_id, task_path)
+
+        async def aput_many(self, ops: Sequence[tuple]) -> None:
+            await (await self._async_saver()).aput_many(ops)
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            await (await self._async_saver()).adelete_thread(thread_id)
+
+        async def aclose(self) -> None:
+            """Close the running event loop's async pool (call before the loop shuts down)."""
+            saver = self._aio.pop(asyncio.get_running_loop(), None)
+            if saver is not None:
+                await saver.aclose()
+
+    class PooledAsyncPostgresSaver(AsyncPostgresSaver):
+        """AsyncPostgresSaver over an `AsyncConnectionPool`, without the
+        saver-wide lock, with `aput_many` (one pipelined cursor per batch)
+        and the same health checks and single retry as
+        `PooledPostgresSaver`. Create it with `await
+        PooledAsyncPostgresSaver.open(dsn, ...)` in the event loop it serves."""
+
+        def __init__(self, pool: "AsyncConnectionPool", schema: str = CHECKPOINT_SCHEMA, serde=None):
+            super().__init__(pool, serde=serde)
+            self.schema = schema
+            self._batch: "contextvars.ContextVar[Any]" = contextvars.ContextVar("checkpoint_batch_cursor", default=None)
+
+        @classmethod
+        async def open(cls, dsn: str, max_size: int = DEFAULT_POOL_SIZE, min_size: int = 1,
+                       timeout: float = DEFAULT_POOL_TIMEOUT, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                       schema: str = CHECKPOINT_SCHEMA, setup: bool = False, serde=None) -> "PooledAsyncPostgresSaver":
+            pool = AsyncConnectionPool(dsn, check=AsyncConnectionPool.check_connection, name="checkpoints-async",
+                                       **_pool_options(max_size, min_size, timeout, schema))
+            try:
+                await pool.open(wait=True, timeout=connect_timeout)
+                saver = cls(pool, schema=schema, serde=serde)
+                if setup:
+                    await saver.setup()
+                async with pool.connection() as conn:
+                    _missing_tables(await (await conn.execute(_TABLES_QUERY)).fetchone(), schema)
+            except BaseException:
+                await pool.close()
+                raise
+            return saver
+
+        @asynccontextmanager
+        async def _cursor(self, *, pipeline: bool = False):
+            cur = self._batch.get()
+            if cur is not None:
+                yield cur
+                return
+            async with self.conn.connection() as conn:
+                if pipeline and self.supports_pipeline:
+                    async with conn.pipeline(), conn.cursor(binary=True, row_factory=dict_row) as cur:
+                        yield cur
+                elif pipeline:
+                    async with conn.transaction(), conn.cursor(binary=True, row_factory=dict_row) as cur:
+                        yield cur
+                else:
+                    async with conn.cursor(binary=True, row_factory=dict_row) as cur:
+                        yield cur
+
+        async def _retrying(self, fn, *args, **kwargs):
+            if self._batch.get() is not None:
+                return await fn(*args, **kwargs)
+            try:
+                return await fn(*args, **kwargs)
+            except OperationalError as e:
+                logger.warning("Checkpoint %s failed (%s), retrying on a fresh connection", fn.__name__, e)
+                return await fn(*args, **kwargs)
+
+        async def setup(self) -> None:
+            async with self.conn.connection() as conn:
+                await conn.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(self.schema)))
+            await super().setup()
+
+        async def aget_tuple(self, config) -> Optional[CheckpointTuple]:
+            return await self._retrying(super().aget_tuple, config)
+
+        async def aput(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, new_versions: ChannelVersions):
+            return await self._retrying(super().aput, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+            return await self._retrying(super().aput_writes, config, writes, task_id, task_path)
+
+        async def _aput_many(self, ops: Sequence[tuple]) -> None:
+            async with self._cursor(pipeline=True) as cur:
+                token = self._batch.set(cur)
+                try:
+                    for op in ops:
+                        await (self.aput if op[0] == "put" else self.aput_writes)(*op[1:])
+                finally:
+                    self._batch.reset(token)
+
+        async def aput_many(self, ops: Sequence[tuple]) -> None:
+            await self._retrying(self._aput_many, ops)
+
+        async def adelete_thread(self, thread_id: str) -> None:
+            await self._retrying(super().adelete_thread, thread_id)
+
+        async def aclose(self) -> None:
+            await self.conn.close()
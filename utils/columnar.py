@@ -0,0 +1,80 @@
+import math
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+_NAN = float("nan")
+
+
+def _to_float(value: Any) -> float:
+    if value is None or isinstance(value, bool):
+        return _NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+class ColumnarTable:
+    """Compact per-endpoint store: one float64 array per numeric field plus an
+    interned agent-id -> row index.
+
+    Rows are appended one at a time as they are parsed, and only rows that
+    can ever be looked up are kept: the first row (the fallback for unknown
+    agents) and the first row for each agent id; a null id indexes nothing.
+    Missing or non-numeric values are stored as NaN.
+    """
+
+    __slots__ = ("fields", "id_keys", "columns", "index", "n_rows")
+
+    def __init__(self, fields: Sequence[str], id_keys: Sequence[str]):
+        self.fields = tuple(fields)
+        self.id_keys = tuple(id_keys)
+        self.columns: Dict[str, array] = {f: array("d") for f in self.fields}
+        self.index: Dict[str, int] = {}
+        self.n_rows = 0
+
+    @classmethod
+    def from_rows(cls, fields: Sequence[str], id_keys: Sequence[str], rows: Iterable[Dict[str, Any]]) -> "ColumnarTable":
+        table = cls(fields, id_keys)
+        for row in rows:
+            table.append(row)
+        return table
+
+    def append(self, row: Dict[str, Any]):
+        new_ids = [str(row[k]) for k in self.id_keys if row.get(k) is not None]
+        new_ids = [i for i in new_ids if i not in self.index]
+        if self.n_rows and not new_ids:
+            return  # shadowed by an earlier row for the same agent
+        for agent_id in new_ids:
+            self.index.setdefault(sys.intern(agent_id), self.n_rows)
+        for f in self.fields:
+            self.columns[f].append(_to_float(row.get(f)))
+        self.n_rows += 1
+
+    def row_index(self, agent_id: Any) -> int:
+        """Stored row for the agent, the first row if unknown, -1 if empty."""
+        return self.index.get(str(agent_id), 0 if self.n_rows else -1)
+
+    def row(self, i: int) -> Dict[str, float]:
+        if i < 0:
+            return {}
+        return {f: v for f, v in ((f, self.columns[f][i]) for f in self.fields) if not math.isnan(v)}
+
+    def column(self, field: str, rows: Optional[Sequence[int]] = None):
+        """Field values as a NumPy array (zero-copy), optionally gathered by row
+        index where -1 yields NaN."""
+        import numpy as np
+
+        col = np.frombuffer(self.columns[field], dtype=np.float64) if self.n_rows else np.empty(0)
+        if rows is None:
+            return col
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.full(len(rows), np.nan)
+        present = rows >= 0
+        out[present] = col[rows[present]]
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.buffer_info()[1] * c.itemsize for c in self.columns.values())
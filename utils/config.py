@@ -1,25 +1,347 @@
+import hashlib
 import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
-
-_config: Dict[str, Any] = {}
-
-def load_config(path: str = None) -> Dict[str, Any]:
-	global _config
-	if _config:
-		return _config
-	# default file alongside project
-	base = Path(__file__).parent.parent
-	cfg_path = Path(path) if path else base / "enterprise_config.json"
-	if cfg_path.exists():
-		try:
-			with open(cfg_path, "r", encoding="utf-8") as f:
-				_config = json.load(f)
-		except Exception:
-			_config = {}
-	else:
-		_config = {}
-	return _config
-
-def get_config() -> Dict[str, Any]:
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, Mapping, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+DEFAULT_GRADE_THRESHOLDS = {"A": 1.0, "B": 0.5, "C": 0.25, "D": 0.0}
+DEFAULT_PRIORITY_ORDER = ["BO1", "BO2", "BO4", "BO3", "BO5"]
+# default file alongside project
+DEFAULT_CONFIG_PATH = Path(__file__).parent.parent / "enterprise_config.json"
+
+
+class ConfigError(Exception):
+	"""The enterprise config file could not be read or parsed."""
+
+
+def load_config(path: str = None) -> Mapping[str, Any]:
+	"""Current raw config for `path` (read-only; reloaded when the file changes)."""
+	return get_registry(path).current().raw
+
+def get_config() -> Mapping[str, Any]:
 	return load_config()
+
+
+def _freeze(value: Any) -> Any:
+	"""Read-only deep copy: dicts become mapping proxies, lists become tuples."""
+	if isinstance(value, dict):
+		return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+	if isinstance(value, list):
+		return tuple(_freeze(v) for v in value)
+	return value
+
+def _thaw(value: Any) -> Any:
+	"""Plain dicts and lists back from a `_freeze`d value (picklable, compilable)."""
+	if isinstance(value, Mapping):
+		return {k: _thaw(v) for k, v in value.items()}
+	if isinstance(value, tuple):
+		return [_thaw(v) for v in value]
+	return value
+
+def _sorted_thresholds(thresholds: Mapping[str, float]) -> Tuple[Tuple[str, float], ...]:
+	# Highest threshold first so the first match is the best grade (A, B, C, D)
+	return tuple(sorted(thresholds.items(), key=lambda x: -x[1]))
+
+
+class BOConfig(NamedTuple):
+	"""One business objective with its factor parameters pre-indexed."""
+	code: str
+	benchmark: Mapping[str, Any]
+	factors: Mapping[str, Mapping[str, Any]]  # factor_code -> benchmark params
+	combine_logic: Mapping[str, Any]
+	thresholds: Tuple[Tuple[str, float], ...]  # (grade, threshold), highest first
+
+	def factor(self, factor_code: str) -> Mapping[str, Any]:
+		return self.factors.get(factor_code, _EMPTY)
+
+
+class ConditionalRule(NamedTuple):
+	"""A parsed `priority_rules.conditional_rules` entry."""
+	if_bo: Optional[str]
+	if_grade: Optional[str]
+	all_bos_grade: Optional[str]
+	action: Optional[str]  # "SET_GRADE", "CAP_GRADE" or None
+	target_bo: Optional[str]
+	grade: Optional[str]
+	priority_override: Tuple[str, ...]
+
+
+class CompiledConfig(NamedTuple):
+	"""Immutable, pre-indexed view of enterprise_config.json."""
+	version: Optional[str]  # config_meta.config_version
+	digest: Optional[str]  # sha256 of the file contents
+	raw: Mapping[str, Any]
+	bos: Mapping[str, BOConfig]
+	grade_thresholds: Tuple[Tuple[str, float], ...]  # global, highest first
+	default_order: Tuple[str, ...]
+	conditional_rules: Tuple[ConditionalRule, ...]
+	explicit_order: Tuple[str, ...]
+	apply_only_when_all_d: bool
+	evaluate_on_initial_grades: bool
+
+	def bo(self, bo_code: str) -> BOConfig:
+		return self.bos.get(bo_code) or _empty_bo(bo_code, self.grade_thresholds)
+
+	@property
+	def snapshot_id(self) -> str:
+		"""config_version plus a content hash, so unversioned edits still differ."""
+		if not self.digest:
+			return str(self.version)
+		return f"{self.version}#{self.digest[:12]}"
+
+	def source(self) -> Dict[str, Any]:
+		"""The raw config as plain dicts and lists; `compile_config(source, digest)`
+		rebuilds this snapshot, id included, in another process."""
+		return _thaw(self.raw)
+
+
+def _empty_bo(bo_code: str, thresholds: Tuple[Tuple[str, float], ...]) -> BOConfig:
+	return BOConfig(bo_code, _EMPTY, _EMPTY, _EMPTY, thresholds)
+
+def _compile_rule(rule: Dict[str, Any]) -> ConditionalRule:
+	cond = rule.get("if", {})
+	then = rule.get("then", {})
+	action = target = grade = None
+	set_grade = then.get("set_grade")
+	if set_grade:
+		action, target, grade = "SET_GRADE", set_grade.get("bo"), set_grade.get("grade")
+	elif then.get("action") == "CAP_GRADE":
+		action, target, grade = "CAP_GRADE", then.get("target_bo"), then.get("cap_to")
+	return ConditionalRule(
+		if_bo=cond.get("bo") or cond.get("bo_code"),
+		if_grade=cond.get("grade"),
+		all_bos_grade=cond.get("all_bos_grade"),
+		action=action,
+		target_bo=target,
+		grade=grade,
+		priority_override=tuple(then.get("priority_override") or ()),
+	)
+
+def compile_config(cfg: Dict[str, Any], digest: str = None) -> CompiledConfig:
+	"""Compile a raw config dict into a CompiledConfig (done once per config)."""
+	grade_thresholds = _sorted_thresholds(cfg.get("grade_thresholds", DEFAULT_GRADE_THRESHOLDS))
+
+	bos = {}
+	for b in cfg.get("business_objectives", []):
+		# First entry wins, matching the nodes' next(...) lookup
+		if b["bo_code"] in bos:
+			continue
+		thresholds = b.get("grading", {}).get("thresholds")
+		bos[b["bo_code"]] = BOConfig(
+			code=b["bo_code"],
+			benchmark=_freeze(b.get("benchmark", {})),
+			factors=MappingProxyType({f["factor_code"]: _freeze(f.get("benchmark", {})) for f in b.get("factors", [])}),
+			combine_logic=_freeze(b.get("combine_logic", {})),
+			thresholds=_sorted_thresholds(thresholds) if thresholds is not None else grade_thresholds,
+		)
+
+	priority_rules = cfg.get("priority_rules", {})
+	rules = tuple(_compile_rule(r) for r in priority_rules.get("conditional_rules", []))
+
+	# Explicit override: first priority_override rule, else priority_overrides section
+	po = cfg.get("priority_overrides", {})
+	explicit = next((r.priority_override for r in rules if r.priority_override), None)
+	if explicit is None:
+		explicit = tuple(po.get("explicit_order", []) or [])
+
+	return CompiledConfig(
+		version=cfg.get("config_meta", {}).get("config_version"),
+		digest=digest,
+		raw=_freeze(cfg),
+		bos=MappingProxyType(bos),
+		grade_thresholds=grade_thresholds,
+		default_order=tuple(priority_rules.get("default_priority_order", cfg.get("default_order", DEFAULT_PRIORITY_ORDER))),
+		conditional_rules=rules,
+		explicit_order=explicit,
+		apply_only_when_all_d=any(r.all_bos_grade == "D" for r in rules),
+		evaluate_on_initial_grades=po.get("evaluate_on_initial_grades", True),
+	)
+
+class ConfigRegistry:
+	"""Watches one config file and atomically swaps in recompiled snapshots.
+
+	The file's mtime/size is checked at most every `poll_interval` seconds and
+	the contents are re-hashed only when it changed. The last `keep` snapshots
+	stay addressable by `snapshot_id` so in-flight runs keep the config they
+	started with; a snapshot held with `pin()` (see `pinned_config`) is kept
+	however many reloads happen until it is released. A file that fails to
+	parse keeps the previous snapshot.
+	"""
+
+	def __init__(self, path: Path, poll_interval: float = 1.0, keep: int = 8):
+		self.path = Path(path)
+		self.poll_interval = poll_interval
+		self.keep = keep
+		self._lock = threading.Lock()
+		self._current: Optional[CompiledConfig] = None
+		self._snapshots: "OrderedDict[str, CompiledConfig]" = OrderedDict()
+		self._pins: Dict[str, int] = {}  # snapshot_id -> runs holding it
+		self._snapshots_lock = threading.Lock()
+		self._stamp = None
+		self._next_check = 0.0
+
+	def current(self) -> CompiledConfig:
+		if self._current is None or time.monotonic() >= self._next_check:
+			self.refresh()
+		return self._current
+
+	def available(self, snapshot_id: str) -> bool:
+		return snapshot_id in self._snapshots
+
+	def get(self, snapshot_id: str) -> CompiledConfig:
+		"""Snapshot pinned by a run. Raises ConfigError if it has been evicted:
+		a run never silently switches to another config halfway through."""
+		snapshot = self._snapshots.get(snapshot_id)
+		if snapshot is None:
+			raise ConfigError(f"Config snapshot {snapshot_id} is no longer loaded from {self.path} "
+			                  f"(more than {self.keep} reloads since); pin it with pinned_config() for long runs")
+		return snapshot
+
+	def pin(self, snapshot_id: str = None) -> CompiledConfig:
+		"""Hold `snapshot_id` (default: the current snapshot) until `release`."""
+		snapshot = self.current() if snapshot_id is None else None
+		with self._snapshots_lock:
+			if snapshot is None:
+				snapshot = self.get(snapshot_id)
+			else:
+				# a reload may have replaced (and evicted) it since current()
+				self._snapshots.setdefault(snapshot.snapshot_id, snapshot)
+			self._pins[snapshot.snapshot_id] = self._pins.get(snapshot.snapshot_id, 0) + 1
+		return snapshot
+
+	def adopt(self, source: Dict[str, Any], digest: str = None) -> CompiledConfig:
+		"""Compile and pin a snapshot pinned by another process, whatever the
+		file holds now, so `get` resolves its id here too."""
+		snapshot = compile_config(source, digest)
+		with self._snapshots_lock:
+			snapshot = self._snapshots.setdefault(snapshot.snapshot_id, snapshot)
+			self._pins[snapshot.snapshot_id] = self._pins.get(snapshot.snapshot_id, 0) + 1
+		return snapshot
+
+	def release(self, snapshot_id: str) -> None:
+		with self._snapshots_lock:
+			n = self._pins.get(snapshot_id, 0) - 1
+			if n > 0:
+				self._pins[snapshot_id] = n
+			else:
+				self._pins.pop(snapshot_id, None)
+			self._evict()
+
+	def refresh(self, force: bool = False) -> bool:
+		"""Reload the file if it changed. Returns True when a new snapshot was installed."""
+		if not self._lock.acquire(blocking=self._current is None):
+			return False  # another thread is already reloading
+		try:
+			self._next_check = time.monotonic() + self.poll_interval
+			try:
+				st = self.path.stat()
+				stamp = (st.st_mtime_ns, st.st_size)
+			except FileNotFoundError:
+				stamp = None
+			if self._current is not None and stamp == self._stamp and not force:
+				return False
+			self._stamp = stamp
+
+			if stamp is None:
+				if self._current is None:
+					logger.warning("Config file %s not found, using node defaults", self.path)
+					self._install(compile_config({}))
+					return True
+				return False
+
+			data = self.path.read_bytes()
+			digest = hashlib.sha256(data).hexdigest()
+			if self._current is not None and digest == self._current.digest:
+				return False
+			try:
+				raw = json.loads(data)
+			except ValueError as e:
+				if self._current is None:
+					raise ConfigError(f"Invalid config file {self.path}: {e}") from e
+				logger.error("Invalid config file %s, keeping %s: %s", self.path, self._current.snapshot_id, e)
+				return False
+			self._install(compile_config(raw, digest))
+			return True
+		finally:
+			self._lock.release()
+
+	def _install(self, snapshot: CompiledConfig):
+		with self._snapshots_lock:
+			self._snapshots[snapshot.snapshot_id] = snapshot
+			self._snapshots.move_to_end(snapshot.snapshot_id)
+			# Single reference assignment: readers see either the old or the new snapshot
+			self._current = snapshot
+			self._evict()
+		logger.info("Loaded config snapshot %s from %s", snapshot.snapshot_id, self.path)
+
+	def _evict(self):
+		# Oldest first, never a pinned snapshot or the current one (caller holds _snapshots_lock)
+		excess = len(self._snapshots) - self.keep
+		for snapshot_id in list(self._snapshots):
+			if excess <= 0:
+				break
+			if snapshot_id in self._pins or self._snapshots[snapshot_id] is self._current:
+				continue
+			del self._snapshots[snapshot_id]
+			excess -= 1
+
+
+_registries: Dict[Path, ConfigRegistry] = {}
+_registries_lock = threading.Lock()
+
+def get_registry(path: str = None) -> ConfigRegistry:
+	cfg_path = Path(path) if path else DEFAULT_CONFIG_PATH
+	registry = _registries.get(cfg_path)
+	if registry is None:
+		with _registries_lock:
+			registry = _registries.setdefault(cfg_path, ConfigRegistry(cfg_path))
+	return registry
+
+def get_compiled_config() -> CompiledConfig:
+	"""The current compiled snapshot of the default config file."""
+	return get_registry().current()
+
+def config_for(state: Optional[Mapping[str, Any]]) -> CompiledConfig:
+	"""Snapshot a workflow run is pinned to (state["config_version"]), else the current one."""
+	snapshot_id = state.get("config_version") if state else None
+	if snapshot_id:
+		return get_registry().get(snapshot_id)
+	return get_compiled_config()
+
+def pin_config(state: Dict[str, Any]) -> str:
+	"""Pin a run to the current snapshot unless it is already pinned.
+
+	Called by the entry node. A pin this process no longer knows (a
+	checkpointed thread from an earlier process) is replaced by the current
+	snapshot here, at the start of the run, never halfway through it.
+	"""
+	snapshot_id = state.get("config_version")
+	registry = get_registry()
+	if snapshot_id and not registry.available(snapshot_id):
+		logger.info("Config snapshot %s is not loaded, starting the run on the current one", snapshot_id)
+		snapshot_id = None
+	if not snapshot_id:
+		state["config_version"] = registry.current().snapshot_id
+	return state["config_version"]
+
+@contextmanager
+def pinned_config(snapshot_id: str = None) -> Iterator[str]:
+	"""Hold a snapshot (default: the current one) for the duration of a batch.
+
+	Yields its id for the runs' `config_version`; however often the file is
+	reloaded meanwhile, `config_for` keeps resolving it.
+	"""
+	registry = get_registry()
+	snapshot = registry.pin(snapshot_id)
+	try:
+		yield snapshot.snapshot_id
+	finally:
+		registry.release(snapshot.snapshot_id)
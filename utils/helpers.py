@@ -0,0 +1,256 @@
+import codecs
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from utils.config import config_for
+
+_WS = " \t\r\n"
+
+
+class JSONArrayStream:
+    """Incrementally decode a JSON response fed in byte chunks.
+
+    For a top-level array, each `feed` returns the items completed so far, so
+    only one partial item is ever buffered. A top-level object (e.g. a
+    paginated `{"count", "next", "results"}` envelope) is buffered whole and
+    exposed as `envelope` after the final feed.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self.kind: Optional[str] = None  # "[" or "{" once known
+        self.envelope: Any = None
+        self.done = False
+
+    def feed(self, data: bytes, final: bool = False) -> List[Any]:
+        self._buf += self._decoder.decode(data, final)
+        if self.kind is None:
+            stripped = self._buf.lstrip(_WS)
+            if not stripped:
+                return []
+            self.kind = stripped[0]
+            self._buf = stripped[1:] if self.kind == "[" else stripped
+        if self.kind != "[":
+            if final:
+                self.envelope = json.loads(self._buf)
+                self._buf = ""
+                self.done = True
+            return []
+        return self._drain(final)
+
+    def _drain(self, final: bool) -> List[Any]:
+        items = []
+        buf, pos = self._buf, 0
+        while not self.done:
+            while pos < len(buf) and buf[pos] in _WS + ",":
+                pos += 1
+            if pos == len(buf):
+                break
+            if buf[pos] == "]":
+                self.done = True
+                pos += 1
+                break
+            try:
+                item, end = self._json.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break  # incomplete item, wait for more data
+            if end == len(buf) and not final:
+                break  # a bare number may continue in the next chunk
+            items.append(item)
+            pos = end
+        self._buf = buf[pos:]
+        if final and not self.done:
+            raise ValueError("truncated JSON array")
+        return items
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array streamed as byte chunks."""
+    stream = JSONArrayStream()
+    for chunk in chunks:
+        yield from stream.feed(chunk)
+    yield from stream.feed(b"", final=True)
+    if stream.envelope is not None:
+        raise ValueError("expected a JSON array, got an object")
+
+
+_MISSING = object()
+
+
+def _lookup(obj: Any, path: str) -> Any:
+    # "performance.mtd_sales_value" on raw_metrics, "factors.B2A" on a BOConfig
+    for part in path.split("."):
+        obj = obj.get(part, _MISSING) if isinstance(obj, Mapping) else getattr(obj, part, _MISSING)
+        if obj is _MISSING:
+            break
+    return obj
+
+
+def _plain(obj: Any) -> Any:
+    if isinstance(obj, Mapping):
+        return {str(k): _plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(v) for v in obj]
+    return obj
+
+
+def fingerprint(values: Dict[str, Any]) -> str:
+    """Stable short hash of a JSON-like mapping (key order does not matter)."""
+    blob = json.dumps(_plain(values), sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.blake2b(blob.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def input_fingerprint(node: Callable, state: Mapping[str, Any]) -> str:
+    """Fingerprint of exactly the inputs a `depends_on` node declares.
+
+    Missing fields are left out rather than hashed as None, so "absent" and
+    "null" stay distinct (the nodes apply defaults only to absent fields).
+    """
+    metrics = state.get("raw_metrics") or {}
+    bo_conf = config_for(state).bo(node.bo_code)
+    values = {"bo": node.bo_code, "version": node.version}
+    for path in node.metric_inputs:
+        v = _lookup(metrics, path)
+        if v is not _MISSING:
+            values["m:" + path] = v
+    for path in node.config_inputs:
+        v = _lookup(bo_conf, path)
+        if v is not _MISSING:
+            values["c:" + path] = v
+    return fingerprint(values)
+
+
+class BOResultCache:
+    """Bounded in-process memo of BO node results.
+
+    Keys are (config snapshot_id, BO, node version, declared input values),
+    so agents and replays with identical inputs share one entry. At most
+    `maxsize` entries are kept (least recently used evicted first); with a
+    `ttl` entries also expire after that many seconds.
+    """
+
+    def __init__(self, maxsize: int = 50_000, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = self.misses = self.evictions = 0
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[tuple]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Any, value: tuple):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+# Off unless a runner opts in (the batch and sharded runner CLIs do)
+_result_cache: Optional[BOResultCache] = None
+
+
+def set_result_cache(cache: Optional[BOResultCache]):
+    """Install the BO result memo used by `depends_on` nodes (None, the default, disables it)."""
+    global _result_cache
+    _result_cache = cache
+
+
+def get_result_cache() -> Optional[BOResultCache]:
+    return _result_cache
+
+
+def memo_key(node: Callable, state: Mapping[str, Any]) -> Optional[tuple]:
+    """Cheap in-process key for a node's inputs; None if a value is unhashable."""
+    metrics = state.get("raw_metrics") or {}
+    # Value types are part of the key: 1 == 1.0, but the nodes echo some
+    # inputs back (e.g. BO1 "actual") and the output types must not change.
+    values = tuple((v.__class__, v) for v in (_lookup(metrics, path) for path in node.metric_inputs))
+    key = (config_for(state).snapshot_id, node.bo_code, node.version, values)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def depends_on(bo: str, metrics: Sequence[str] = (), config: Sequence[str] = (), version: int = 1):
+    """Declare the inputs of a BO node and skip it when they are unchanged.
+
+    `metrics` are "section.field" paths into raw_metrics and `config` are
+    paths into the BO's compiled config ("benchmark", "factors.B2A",
+    "combine_logic"). The wrapped node records the inputs' fingerprint in
+    `bo_fingerprints`; when the incoming state already holds a result for
+    `bo` under the same fingerprint (a rerun on a checkpointed thread, or a
+    state carried over by the caller) that result is returned without
+    recomputing. Otherwise the process-wide BOResultCache is consulted
+    before the node body runs. Bump `version` when the node's formula changes.
+    """
+    def wrap(fn):
+        @functools.wraps(fn)
+        def node(state):
+            cache = _result_cache
+            key = memo_key(node, state) if cache is not None else None
+            hit = cache.get(key) if key is not None else None
+            if hit is not None:
+                result, fp = hit
+                return {"bo_results": {bo: dict(result)}, "bo_fingerprints": {bo: fp}}
+
+            fp = input_fingerprint(node, state)
+            prior = (state.get("bo_results") or {}).get(bo)
+            if prior is not None and (state.get("bo_fingerprints") or {}).get(bo) == fp:
+                # grade is prioritize's output, not this node's
+                result = {k: v for k, v in prior.items() if k != "grade"}
+                partial = {"bo_results": {bo: result}}
+            else:
+                partial = fn(state)
+                result = partial["bo_results"][bo]
+            if key is not None:
+                cache.put(key, (dict(result), fp))
+            return {**partial, "bo_fingerprints": {bo: fp}}
+
+        node.bo_code = bo
+        node.metric_inputs = tuple(metrics)
+        node.config_inputs = tuple(config)
+        node.version = version
+        return node
+    return wrap
@@ -0,0 +1,209 @@
+"""Pooled HTTP access to the FastAPI backend.
+
+Sync callers share one keep-alive `requests.Session`; async callers share one
+`httpx.AsyncClient` per event loop (or fall back to the sync session in
+worker threads when httpx is not installed). Both paths apply the same
+timeout, bounded per-host concurrency and retry-with-backoff policy.
+requests and httpx are imported on first use, so processes that never hit
+the network (sharded scoring workers, offline runs) do not load them.
+"""
+import asyncio
+import functools
+import logging
+import random
+import threading
+import weakref
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+from utils.helpers import JSONArrayStream
+from utils.instrumentation import count
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 10.0          # seconds, connect + read
+RETRIES = 3             # extra attempts after the first one
+BACKOFF = 0.25          # base delay, doubled per attempt (with jitter)
+MAX_PER_HOST = 5        # concurrent requests per host (one per sebo endpoint)
+CHUNK_SIZE = 64 * 1024  # streamed response read size
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session: Optional["requests.Session"] = None
+_session_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def _httpx():
+    try:
+        import httpx
+    except ImportError:  # optional: async path falls back to the pooled session
+        return None
+    return httpx
+
+
+def get_session() -> "requests.Session":
+    """Process-wide keep-alive session with retry/backoff on idempotent GETs."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                retry = Retry(total=RETRIES, backoff_factor=BACKOFF, status_forcelist=RETRY_STATUSES,
+                              allowed_methods=["GET"], raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_PER_HOST, max_retries=retry)
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def get_json(url: str, params: Dict[str, Any] = None, timeout: float = TIMEOUT) -> Any:
+    count("http_requests")
+    resp = get_session().get(url, params=params, timeout=timeout)
+    resp.raise_for_status()
+    count("http_bytes", len(resp.content))
+    return resp.json()
+
+
+def iter_rows(url: str, params: Dict[str, Any] = None, timeout: float = TIMEOUT) -> Iterator[Any]:
+    """Stream the rows of a list endpoint without holding the whole payload.
+
+    A plain JSON array is decoded item by item as it arrives. A paginated
+    `{"results": [...], "next": url}` envelope is followed page by page.
+    Closing the generator early drops the connection mid-response.
+    """
+    while url:
+        stream = JSONArrayStream()
+        count("http_requests")
+        with get_session().get(url, params=params, timeout=timeout, stream=True) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                count("http_bytes", len(chunk))
+                yield from stream.feed(chunk)
+            yield from stream.feed(b"", final=True)
+        if stream.envelope is None:
+            return
+        page = _page(stream.envelope)
+        yield from page.get("results", [])
+        # the next link already carries the query string
+        url, params = page.get("next"), None
+
+
+def _page(envelope: Any) -> Dict[str, Any]:
+    if not isinstance(envelope, dict):
+        raise ValueError(f"unexpected list endpoint payload: {type(envelope).__name__}")
+    return envelope
+
+
+# Per event loop: an AsyncClient cannot be shared across loops
+_async_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_host_limits: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _host_semaphore(loop, url: str) -> asyncio.Semaphore:
+    limits = _host_limits.setdefault(loop, {})
+    host = urlsplit(url).netloc
+    if host not in limits:
+        limits[host] = asyncio.Semaphore(MAX_PER_HOST)
+    return limits[host]
+
+
+def _async_client(loop):
+    client = _async_clients.get(loop)
+    if client is None:
+        httpx = _httpx()
+        client = httpx.AsyncClient(
+            timeout=TIMEOUT,
+            limits=httpx.Limits(max_connections=MAX_PER_HOST * 4, max_keepalive_connections=MAX_PER_HOST * 4),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _backoff(attempt: int) -> float:
+    return BACKOFF * (2 ** attempt) * (0.5 + random.random() / 2)
+
+
+async def _aopen(client, url: str, params: Dict[str, Any], timeout: float):
+    """Send a streamed GET, retrying until the response status is usable."""
+    for attempt in range(RETRIES + 1):
+        last = attempt == RETRIES
+        try:
+            request = client.build_request("GET", url, params=params, timeout=timeout)
+            resp = await client.send(request, stream=True)
+            if resp.status_code in RETRY_STATUSES and not last:
+                await resp.aclose()
+                logger.warning("GET %s returned %s, retrying", url, resp.status_code)
+            elif resp.is_error:
+                await resp.aclose()
+                resp.raise_for_status()
+            else:
+                return resp
+        except _httpx().TransportError as e:
+            if last:
+                raise
+            logger.warning("GET %s failed (%s), retrying", url, e)
+        await asyncio.sleep(_backoff(attempt))
+
+
+async def aget_json(url: str, params: Dict[str, Any] = None, timeout: float = TIMEOUT) -> Any:
+    """Async GET returning decoded JSON, retried on connection errors and 429/5xx."""
+    loop = asyncio.get_running_loop()
+    if _httpx() is None:
+        async with _host_semaphore(loop, url):
+            return await loop.run_in_executor(None, functools.partial(get_json, url, params, timeout))
+
+    async with _host_semaphore(loop, url):
+        count("http_requests")
+        resp = await _aopen(_async_client(loop), url, params, timeout)
+        try:
+            count("http_bytes", len(await resp.aread()))
+        finally:
+            await resp.aclose()
+    return resp.json()
+
+
+async def aiter_rows(url: str, params: Dict[str, Any] = None, timeout: float = TIMEOUT) -> AsyncIterator[Any]:
+    """Async `iter_rows`: streamed, paginated rows over the loop's AsyncClient."""
+    loop = asyncio.get_running_loop()
+    if _httpx() is None:
+        rows = await loop.run_in_executor(None, lambda: list(iter_rows(url, params, timeout)))
+        for row in rows:
+            yield row
+        return
+
+    client = _async_client(loop)
+    while url:
+        stream = JSONArrayStream()
+        async with _host_semaphore(loop, url):
+            count("http_requests")
+            resp = await _aopen(client, url, params, timeout)
+            try:
+                async for chunk in resp.aiter_bytes(CHUNK_SIZE):
+                    count("http_bytes", len(chunk))
+                    for row in stream.feed(chunk):
+                        yield row
+                for row in stream.feed(b"", final=True):
+                    yield row
+            finally:
+                await resp.aclose()
+        if stream.envelope is None:
+            return
+        page = _page(stream.envelope)
+        for row in page.get("results", []):
+            yield row
+        url, params = page.get("next"), None
+
+
+async def aclose():
+    """Close the current loop's AsyncClient (call before the loop shuts down)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
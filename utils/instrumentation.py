@@ -0,0 +1,281 @@
+"""In-process latency and throughput instrumentation for the BO workflow.
+
+Nodes are wrapped with `timed(name)` (fetch, b01..b05, merge_bo_results,
+prioritize), so every execution path (LangGraph, fast_path, the mock and
+sharded runners) records into the process-wide `Registry`:
+
+* a latency histogram per node (p50/p95/p99 from fixed log-scale buckets,
+  8 per decade, so quantiles are within a bucket's width; about 1 µs of
+  overhead per call), with call and error counts;
+* named counters (`count(name, n)`): HTTP requests and bytes, metrics cache
+  hits/misses, batch snapshot hits. The BO result memo's stats are added at
+  export time.
+
+Agents are counted as completed `prioritize` calls; agents/sec is over the
+span from the first recorded call to the last. Export with
+`Registry.report()` (JSON-able dict), `Registry.prometheus()` (text
+exposition format) or `write_report(path)`. Worker processes ship
+`snapshot()`s that the parent folds in with `merge()`.
+`set_registry(None)` turns recording off.
+"""
+import bisect
+import functools
+import inspect
+import json
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Upper bucket bounds in seconds: 1.33 µs .. 100 s
+_BOUNDS = tuple(1e-6 * 10 ** (i / 8) for i in range(1, 65))
+QUANTILES = (0.5, 0.95, 0.99)
+AGENT_NODE = "prioritize"
+
+
+class Histogram:
+    __slots__ = ("buckets", "count", "sum", "min", "max")
+
+    def __init__(self):
+        self.buckets = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(_BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate of the q-quantile, interpolated within its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                lo = _BOUNDS[i - 1] if i else 0.0
+                hi = _BOUNDS[i] if i < len(_BOUNDS) else self.max
+                est = lo + (hi - lo) * (rank - seen) / n
+                return min(max(est, self.min), self.max)
+            seen += n
+        return self.max
+
+    def merge(self, other: "Histogram") -> None:
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def state(self) -> tuple:
+        return tuple(self.buckets), self.count, self.sum, self.min, self.max
+
+    @classmethod
+    def from_state(cls, state: tuple) -> "Histogram":
+        h = cls()
+        buckets, h.count, h.sum, h.min, h.max = state
+        h.buckets = list(buckets)
+        return h
+
+
+class Registry:
+    """Thread-safe per-node histograms and counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.latency: Dict[str, Histogram] = {}
+            self.errors: Dict[str, int] = {}
+            self.counters: Dict[str, float] = {}
+            self.first: Optional[float] = None  # perf_counter() span of the recorded calls
+            self.last: Optional[float] = None
+
+    def observe(self, node: str, start: float, end: float, error: bool = False) -> None:
+        with self._lock:
+            h = self.latency.get(node)
+            if h is None:
+                h = self.latency[node] = Histogram()
+                self.errors[node] = 0
+            h.observe(end - start)
+            if error:
+                self.errors[node] += 1
+            if self.first is None or start < self.first:
+                self.first = start
+            if self.last is None or end > self.last:
+                self.last = end
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Picklable copy of everything recorded, for `merge` in another process."""
+        with self._lock:
+            return {
+                "latency": {k: h.state() for k, h in self.latency.items()},
+                "errors": dict(self.errors),
+                "counters": dict(self.counters),
+                "span": (self.first, self.last),
+            }
+
+    def merge(self, snapshot: Dict[str, Any]) -> None:
+        with self._lock:
+            for node, state in snapshot["latency"].items():
+                h = Histogram.from_state(state)
+                if node in self.latency:
+                    self.latency[node].merge(h)
+                else:
+                    self.latency[node] = h
+                self.errors[node] = self.errors.get(node, 0) + snapshot["errors"].get(node, 0)
+            for name, n in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            first, last = snapshot["span"]
+            if first is not None and (self.first is None or first < self.first):
+                self.first = first
+            if last is not None and (self.last is None or last > self.last):
+                self.last = last
+
+    def report(self) -> Dict[str, Any]:
+        """Per-node latency (ms), error rates, throughput and counters."""
+        with self._lock:
+            nodes = {}
+            for node, h in sorted(self.latency.items()):
+                errors = self.errors.get(node, 0)
+                row = {"calls": h.count, "errors": errors, "error_rate": round(errors / h.count, 6),
+                       "total_s": round(h.sum, 6), "mean_ms": _ms(h.sum / h.count)}
+                for q in QUANTILES:
+                    row[f"p{int(q * 100)}_ms"] = _ms(h.quantile(q))
+                row["max_ms"] = _ms(h.max)
+                nodes[node] = row
+            agents = self.latency[AGENT_NODE].count if AGENT_NODE in self.latency else 0
+            elapsed = (self.last - self.first) if self.first is not None else 0.0
+            counters = dict(sorted(self.counters.items()))
+        report = {
+            "agents": agents,
+            "elapsed_s": round(elapsed, 6),
+            "agents_per_s": round(agents / elapsed, 1) if elapsed else None,
+            "nodes": nodes,
+            "counters": counters,
+        }
+        memo = _memo_stats()
+        if memo is not None:
+            report["bo_memo"] = memo
+        return report
+
+    def prometheus(self) -> str:
+        """The report in the Prometheus text exposition format."""
+        report = self.report()
+        with self._lock:
+            latency = {k: h for k, h in sorted(self.latency.items())}
+            lines = [
+                "# HELP bos_node_duration_seconds Node latency.",
+                "# TYPE bos_node_duration_seconds summary",
+            ]
+            for node, h in latency.items():
+                for q in QUANTILES:
+                    lines.append(f'bos_node_duration_seconds{{node="{node}",quantile="{q}"}} {h.quantile(q):.9g}')
+                lines.append(f'bos_node_duration_seconds_sum{{node="{node}"}} {h.sum:.9g}')
+                lines.append(f'bos_node_duration_seconds_count{{node="{node}"}} {h.count}')
+            lines += ["# HELP bos_node_errors_total Node calls that raised.", "# TYPE bos_node_errors_total counter"]
+            lines += [f'bos_node_errors_total{{node="{node}"}} {self.errors.get(node, 0)}' for node in latency]
+        lines += [
+            "# HELP bos_agents_total Agents scored (completed prioritize calls).",
+            "# TYPE bos_agents_total counter",
+            f"bos_agents_total {report['agents']}",
+            "# HELP bos_agents_per_second Agents scored per second over the recorded span.",
+            "# TYPE bos_agents_per_second gauge",
+            f"bos_agents_per_second {report['agents_per_s'] or 0}",
+        ]
+        for name, n in report["counters"].items():
+            lines += [f"# TYPE bos_{name}_total counter", f"bos_{name}_total {n:g}"]
+        for name, v in (report.get("bo_memo") or {}).items():
+            if name != "hit_rate":
+                lines += [f"# TYPE bos_bo_memo_{name} gauge", f"bos_bo_memo_{name} {v}"]
+        return "\n".join(lines) + "\n"
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 4)
+
+
+def _memo_stats() -> Optional[Dict[str, Any]]:
+    from utils.helpers import get_result_cache
+
+    cache = get_result_cache()
+    return cache.stats() if cache is not None else None
+
+
+_registry: Optional[Registry] = Registry()
+
+
+def set_registry(registry: Optional[Registry]) -> None:
+    """Install the registry nodes record into (None turns recording off)."""
+    global _registry
+    _registry = registry
+
+
+def get_registry() -> Optional[Registry]:
+    return _registry
+
+
+def count(name: str, n: float = 1) -> None:
+    """Add `n` to a process-wide counter (no-op when recording is off)."""
+    registry = _registry
+    if registry is not None:
+        registry.count(name, n)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Record each call of the wrapped node (sync or async) under `name`."""
+    def wrap(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def anode(*args, **kwargs):
+                registry = _registry
+                if registry is None:
+                    return await fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    registry.observe(name, start, time.perf_counter(), error=True)
+                    raise
+                registry.observe(name, start, time.perf_counter())
+                return result
+            return anode
+
+        @functools.wraps(fn)
+        def node(*args, **kwargs):
+            registry = _registry
+            if registry is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                registry.observe(name, start, time.perf_counter(), error=True)
+                raise
+            registry.observe(name, start, time.perf_counter())
+            return result
+        return node
+    return wrap
+
+
+def write_report(path: str, registry: Optional[Registry] = None) -> None:
+    """Prometheus text for a `.prom` path, otherwise the JSON report."""
+    registry = registry or _registry or Registry()
+    with open(path, "w", encoding="utf-8") as fh:
+        if path.endswith(".prom"):
+            fh.write(registry.prometheus())
+        else:
+            json.dump(registry.report(), fh, indent=2)
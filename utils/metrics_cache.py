@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+from utils.helpers import iter_json_array
+from utils.instrumentation import count
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".metrics_cache"
+DEFAULT_TTL = 24 * 3600  # seconds; a daily snapshot rarely changes within a day
+_READ_CHUNK = 64 * 1024
+
+
+class CacheMiss(LookupError):
+    """Raised in offline mode when a (base_url, endpoint, date) snapshot is not cached."""
+
+
+def source_key(base_url: str) -> str:
+    """Directory name of one API backend: its host plus a hash of the full URL."""
+    host = re.sub(r"[^A-Za-z0-9.-]", "_", urlsplit(base_url).netloc) or "local"
+    return f"{host}-{hashlib.sha256(base_url.rstrip('/').encode()).hexdigest()[:12]}"
+
+
+class MetricsCache:
+    """On-disk cache of each endpoint's daily payload, keyed by (base_url, endpoint, date).
+
+    Payloads are stored as gzip-compressed JSON arrays under
+    `<root>/<source>/<date>/<endpoint>.json.gz` (see `source_key`), so two
+    backends sharing a cache dir never serve each other's data. Entries are
+    written atomically and read back as a
+    row stream. Entries older than `ttl` seconds count as misses (ttl=None
+    never expires). With `offline=True` nothing is fetched: a miss raises
+    CacheMiss, which is what replays and debugging sessions want.
+    """
+
+    def __init__(self, root: Path = None, ttl: Optional[float] = DEFAULT_TTL, offline: bool = False):
+        self.root = Path(root or os.getenv("BOS_METRICS_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        self.ttl = ttl
+        self.offline = offline
+
+    def path(self, base_url: str, endpoint: str, date: Any) -> Path:
+        return self.root / source_key(base_url) / str(date) / f"{endpoint}.json.gz"
+
+    def fresh(self, base_url: str, endpoint: str, date: Any) -> bool:
+        try:
+            age = time.time() - self.path(base_url, endpoint, date).stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return self.ttl is None or age <= self.ttl
+
+    def iter_rows(self, base_url: str, endpoint: str, date: Any) -> Optional[Iterator[Dict[str, Any]]]:
+        """Stream the cached rows, or None on a miss (CacheMiss when offline)."""
+        if not self.fresh(base_url, endpoint, date):
+            count("metrics_cache_misses")
+            if self.offline:
+                raise CacheMiss(f"{endpoint} for {date} from {base_url} not in {self.root}")
+            return None
+        count("metrics_cache_hits")
+        return self._read(self.path(base_url, endpoint, date))
+
+    @staticmethod
+    def _read(path: Path) -> Iterator[Dict[str, Any]]:
+        with gzip.open(path, "rb") as fh:
+            yield from iter_json_array(iter(lambda: fh.read(_READ_CHUNK), b""))
+
+    @contextmanager
+    def writer(self, base_url: str, endpoint: str, date: Any):
+        """Write rows as they stream in; the entry appears only on success."""
+        path = self.path(base_url, endpoint, date)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=5) as fh:
+                writer = _RowWriter(fh)
+                yield writer
+                writer.close()
+            os.replace(tmp, path)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+
+    def put(self, base_url: str, endpoint: str, date: Any, rows: List[Dict[str, Any]]):
+        with self.writer(base_url, endpoint, date) as w:
+            for row in rows:
+                w.write(row)
+
+    def _sources(self, base_url: Optional[str]) -> List[Path]:
+        if base_url is not None:
+            return [self.root / source_key(base_url)]
+        return [d for d in self.root.iterdir() if d.is_dir()] if self.root.exists() else []
+
+    def invalidate(self, endpoint: str = None, date: Any = None, base_url: str = None) -> int:
+        """Drop cached entries matching `endpoint`, `date` and/or `base_url`
+        (all when every filter is omitted). Returns the number of files removed."""
+        removed = 0
+        for source in self._sources(base_url):
+            if date is not None and endpoint is None:
+                day = source / str(date)
+                removed += len(list(day.glob("*.json.gz"))) if day.exists() else 0
+                shutil.rmtree(day, ignore_errors=True)
+                continue
+            pattern = f"{endpoint or '*'}.json.gz"
+            days = [source / str(date)] if date is not None else source.glob("*")
+            for day in days:
+                for path in day.glob(pattern):
+                    path.unlink()
+                    removed += 1
+        return removed
+
+    def dates(self, base_url: str) -> List[str]:
+        """Dates with at least one cached endpoint from `base_url`, newest first."""
+        source = self.root / source_key(base_url)
+        if not source.exists():
+            return []
+        return sorted((d.name for d in source.iterdir() if d.is_dir()), reverse=True)
+
+
+class _RowWriter:
+    def __init__(self, fh):
+        self._fh = fh
+        self._first = True
+        fh.write("[")
+
+    def write(self, row: Dict[str, Any]):
+        if not self._first:
+            self._fh.write(",")
+        self._first = False
+        self._fh.write(json.dumps(row, separators=(",", ":")))
+
+    def close(self):
+        self._fh.write("]")
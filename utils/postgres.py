@@ -0,0 +1,22 @@
+import os
+from typing import Optional
+
+
+def postgres_dsn() -> Optional[str]:
+    """Postgres connection string from the environment, or None if not configured.
+
+    POSTGRES_CONNECTION_STRING wins; otherwise it is built from POSTGRES_HOST,
+    POSTGRES_PORT, POSTGRES_DB, POSTGRES_USER and POSTGRES_PASSWORD (the
+    password is required).
+    """
+    dsn = os.getenv("POSTGRES_CONNECTION_STRING")
+    if dsn:
+        return dsn
+    password = os.getenv("POSTGRES_PASSWORD")
+    if not password:
+        return None
+    host = os.getenv("POSTGRES_HOST", "localhost")
+    port = os.getenv("POSTGRES_PORT", "5432")
+    db = os.getenv("POSTGRES_DB", "bos_workflow_db")
+    user = os.getenv("POSTGRES_USER", "postgres")
+    return f"postgresql://{user}:{password}@{host}:{port}/{db}"
@@ -0,0 +1,217 @@
+"""Fleet results sink: per-agent run summaries into workflow_runs, in bulk.
+
+Runners add one `RunSummary` per scored agent (after `prioritize`) and the
+sink buffers them, keyed by thread id, until `batch_size` runs or `close()`.
+Each flush is one write per writer:
+
+* `PostgresResultsWriter` COPYs the batch into a temporary staging table and
+  upserts it into workflow_runs with a single
+  `INSERT ... SELECT ... ON CONFLICT (thread_id) DO UPDATE`, in one
+  transaction. A rerun of a thread replaces its summary and clears
+  `compacted_at` so the retention job looks at its new checkpoints.
+* `ColumnarResultsWriter` appends the batch as one record batch to a
+  Parquet (`.parquet`) or Arrow IPC (`.arrow` / `.feather`) file for
+  analytics. Needs pyarrow.
+
+`bo_results_summary` keeps each BO's ratio and grade; the full results stay
+in the checkpoints.
+"""
+import datetime
+import json
+import logging
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence
+
+from utils.postgres import postgres_dsn
+
+logger = logging.getLogger("results-sink")
+
+DEFAULT_BATCH_SIZE = 50000  # runs per flush; a nightly fleet fits in one
+COLUMNAR_SUFFIXES = {".parquet": "parquet", ".arrow": "ipc", ".feather": "ipc"}
+
+_COLUMNS = ("thread_id", "agent_id", "workflow_date", "status", "error_message", "completed_at",
+            "final_priority_order", "bo_results_summary")
+
+
+class RunSummary(NamedTuple):
+    thread_id: str
+    agent_id: str
+    workflow_date: datetime.date
+    status: str  # completed or failed
+    error_message: Optional[str]
+    completed_at: datetime.datetime
+    final_priority_order: Optional[List[str]]
+    bo_results_summary: Optional[Dict[str, Dict[str, Any]]]
+
+
+def summarize_bo_results(bo_results: Optional[Mapping[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """{bo: {"ratio", "grade"}} from a run's bo_results."""
+    if bo_results is None:
+        return None
+    return {bo: {"ratio": None if r.get("ratio") is None else float(r["ratio"]), "grade": r.get("grade")}
+            for bo, r in bo_results.items()}
+
+
+def run_summary(thread_id: str, agent_id: str, date: str, bo_results: Optional[Mapping[str, Any]] = None,
+                final_priority_order: Optional[Sequence[str]] = None, error: Optional[str] = None) -> RunSummary:
+    return RunSummary(
+        thread_id, str(agent_id), datetime.date.fromisoformat(date), "failed" if error else "completed", error,
+        datetime.datetime.now(datetime.timezone.utc),
+        list(final_priority_order) if final_priority_order is not None else None,
+        summarize_bo_results(bo_results),
+    )
+
+
+class PostgresResultsWriter:
+    """Upserts summaries into workflow_runs: COPY to a staging table, one INSERT ... ON CONFLICT."""
+
+    def __init__(self, dsn: Optional[str] = None, conn=None):
+        if conn is None:
+            import psycopg
+
+            dsn = dsn or postgres_dsn()
+            if not dsn:
+                raise ValueError("Postgres is not configured; set POSTGRES_CONNECTION_STRING or POSTGRES_*")
+            conn = psycopg.connect(dsn, autocommit=True)
+            self._owns_conn = True
+        else:
+            self._owns_conn = False
+        self.conn = conn
+
+    def write(self, rows: Sequence[RunSummary]) -> None:
+        with self.conn.transaction(), self.conn.cursor() as cur:
+            cur.execute(
+                "CREATE TEMPORARY TABLE IF NOT EXISTS workflow_runs_stage ("
+                " thread_id VARCHAR(255), agent_id VARCHAR(255), workflow_date DATE, status VARCHAR(50),"
+                " error_message TEXT, completed_at TIMESTAMP WITH TIME ZONE,"
+                " final_priority_order JSONB, bo_results_summary JSONB) ON COMMIT DELETE ROWS"
+            )
+            with cur.copy(f"COPY workflow_runs_stage ({', '.join(_COLUMNS)}) FROM STDIN") as copy:
+                for r in rows:
+                    copy.write_row(r[:6] + (_json(r.final_priority_order), _json(r.bo_results_summary)))
+            cur.execute(
+                f"INSERT INTO workflow_runs ({', '.join(_COLUMNS)})"
+                f" SELECT {', '.join(_COLUMNS)} FROM workflow_runs_stage"
+                " ON CONFLICT (thread_id) DO UPDATE SET"
+                " agent_id = EXCLUDED.agent_id, workflow_date = EXCLUDED.workflow_date,"
+                " status = EXCLUDED.status, error_message = EXCLUDED.error_message,"
+                " completed_at = EXCLUDED.completed_at, final_priority_order = EXCLUDED.final_priority_order,"
+                " bo_results_summary = EXCLUDED.bo_results_summary, compacted_at = NULL"
+            )
+
+    def close(self) -> None:
+        if self._owns_conn:
+            self.conn.close()
+
+
+def _json(value: Any) -> Optional[str]:
+    return None if value is None else json.dumps(value, separators=(",", ":"))
+
+
+class ColumnarResultsWriter:
+    """Appends summaries to a Parquet or Arrow IPC file, one record batch per flush."""
+
+    def __init__(self, path: str):
+        import pyarrow as pa
+
+        suffix = next((s for s in COLUMNAR_SUFFIXES if path.endswith(s)), None)
+        if suffix is None:
+            raise ValueError(f"unknown columnar format for {path}; expected one of {sorted(COLUMNAR_SUFFIXES)}")
+        self.path = path
+        self.format = COLUMNAR_SUFFIXES[suffix]
+        self._pa = pa
+        self.schema = pa.schema([
+            ("thread_id", pa.string()),
+            ("agent_id", pa.string()),
+            ("workflow_date", pa.date32()),
+            ("status", pa.string()),
+            ("error_message", pa.string()),
+            ("completed_at", pa.timestamp("us", tz="UTC")),
+            ("final_priority_order", pa.list_(pa.string())),
+            ("bo_results_summary", pa.map_(pa.string(), pa.struct([("ratio", pa.float64()), ("grade", pa.string())]))),
+        ])
+        self._writer = None
+
+    def write(self, rows: Sequence[RunSummary]) -> None:
+        columns = list(zip(*rows))
+        columns[-1] = [None if s is None else list(s.items()) for s in columns[-1]]
+        batch = self._pa.record_batch(
+            [self._pa.array(col, type=field.type) for col, field in zip(columns, self.schema)], schema=self.schema)
+        if self._writer is None:
+            if self.format == "parquet":
+                import pyarrow.parquet as pq
+
+                self._writer = pq.ParquetWriter(self.path, self.schema)
+            else:
+                self._writer = self._pa.ipc.new_file(self.path, self.schema)
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ResultsSink:
+    """Buffers run summaries and hands them to its writers in batches.
+
+    A thread added twice before a flush keeps its latest summary.
+    """
+
+    def __init__(self, writers: Sequence[Any], batch_size: int = DEFAULT_BATCH_SIZE):
+        self.writers = list(writers)
+        self.batch_size = batch_size
+        self._pending: Dict[str, RunSummary] = {}
+        self.written = 0
+        self.flushes = 0
+
+    def add(self, summary: RunSummary) -> None:
+        self._pending[summary.thread_id] = summary
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add_state(self, state: Mapping[str, Any], thread_id: str) -> None:
+        """Record a finished run from its final AgentState."""
+        self.add(run_summary(thread_id, state["agent_id"], state["date"], state.get("bo_results"),
+                             state.get("final_priority_order")))
+
+    def add_outcome(self, outcome, date: str) -> None:
+        """Record a batch/sharded runner AgentOutcome (failed ones too)."""
+        self.add(run_summary(outcome.thread_id, outcome.agent_id, date, outcome.bo_results,
+                             outcome.final_priority_order, outcome.error))
+
+    def flush(self) -> int:
+        rows = list(self._pending.values())
+        if not rows:
+            return 0
+        for writer in self.writers:
+            writer.write(rows)
+        self._pending.clear()
+        self.written += len(rows)
+        self.flushes += 1
+        logger.info("Wrote %d run summaries", len(rows))
+        return len(rows)
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            for writer in self.writers:
+                writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # Runs scored before an error are still written
+        self.close()
+
+
+def results_sink(db: bool = False, path: Optional[str] = None, dsn: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> Optional[ResultsSink]:
+    """A sink writing to workflow_runs (`db`) and/or a columnar file (`path`); None if neither."""
+    writers = []
+    if db:
+        writers.append(PostgresResultsWriter(dsn))
+    if path:
+        writers.append(ColumnarResultsWriter(path))
+    return ResultsSink(writers, batch_size) if writers else None
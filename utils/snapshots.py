@@ -0,0 +1,332 @@
+"""State snapshot writers for the runners.
+
+`JsonSnapshotWriter` is the original format: one pretty-printed JSON file
+per thread. `SegmentSnapshotWriter` appends every snapshot to a single
+segment file as a length-prefixed binary record (msgpack via ormsgpack or
+msgpack if installed, else compact JSON bytes), optionally zlib-compressed
+per record. It keeps an offset index next to it (`<segment>.idx`, one JSON
+line per record), so `SegmentReader.get(thread_id)` seeks straight to one
+agent's record without decoding the rest. A later snapshot for the same key
+supersedes the earlier one. If the index is missing or behind the segment
+(e.g. a crash before close), the reader rebuilds it from the record headers.
+
+Segment layout: a 10-byte header (magic, codec id, compression id), then
+records of `<key length: u16><payload length: u32><key utf-8><payload>`.
+"""
+import json
+import os
+import struct
+import threading
+import zlib
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+MAGIC = b"BOSSNAP\x01"
+_HEADER = struct.Struct("<8sBB")
+_RECORD = struct.Struct("<HI")
+
+CODECS = ("msgpack", "json")
+COMPRESSIONS = (None, "zlib")
+_CODEC_IDS = {"msgpack": 1, "json": 2}
+_COMPRESSION_IDS = {None: 0, "zlib": 1}
+
+
+def _default(obj: Any) -> Any:
+    # numpy scalars/arrays from the columnar snapshot path
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"{type(obj).__name__} is not snapshot serializable")
+
+
+def _msgpack() -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    try:
+        import ormsgpack
+        return partial(ormsgpack.packb, default=_default), ormsgpack.unpackb
+    except ImportError:
+        import msgpack
+        return partial(msgpack.packb, default=_default, use_bin_type=True), partial(msgpack.unpackb, raw=False)
+
+
+def _json() -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    try:
+        import orjson
+        return partial(orjson.dumps, default=_default), orjson.loads
+    except ImportError:
+        encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+        return (lambda obj: encoder.encode(obj).encode("utf-8")), json.loads
+
+
+def codec(name: str) -> Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    """(encode, decode) for a codec name; msgpack needs ormsgpack or msgpack."""
+    if name == "msgpack":
+        return _msgpack()
+    if name == "json":
+        return _json()
+    raise ValueError(f"unknown snapshot codec {name!r}; expected one of {CODECS}")
+
+
+def default_codec() -> str:
+    """msgpack when a msgpack library is installed, else json."""
+    try:
+        _msgpack()
+        return "msgpack"
+    except ImportError:
+        return "json"
+
+
+class JsonSnapshotWriter:
+    """One pretty-printed JSON file per key (the runners' original format)."""
+
+    def __init__(self, path: Optional[str] = None, template: str = "state_{thread_id}.json"):
+        self.path = path
+        self.template = template
+
+    def location(self, key: str) -> str:
+        return self.path or self.template.format(thread_id=key)
+
+    def write(self, key: str, state: Dict[str, Any]) -> None:
+        with open(self.location(key), "w", encoding="utf-8") as fh:
+            json.dump(state, fh, indent=2, ensure_ascii=False)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SegmentSnapshotWriter:
+    """Appends snapshots to one segment file with an offset index alongside.
+
+    Reopening an existing segment appends to it; its codec and compression
+    must match. Thread-safe. Call `close()` (or use it as a context manager)
+    to flush the segment and index.
+    """
+
+    def __init__(self, path: str, codec_name: Optional[str] = None, compression: Optional[str] = None,
+                 level: int = 6):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown snapshot compression {compression!r}; expected one of {COMPRESSIONS}")
+        self.path = Path(path)
+        self.level = level
+        self._lock = threading.Lock()
+        if self.path.exists() and self.path.stat().st_size:
+            existing = _read_header(self.path)
+            if codec_name is not None and codec_name != existing[0] or \
+                    compression is not None and compression != existing[1]:
+                raise ValueError(f"{self.path} was written with codec={existing[0]}, compression={existing[1]}")
+            codec_name, compression = existing
+            _repair(self.path)
+            self._fh = open(self.path, "ab")
+            index_mode = "a"
+        else:
+            codec_name = codec_name or default_codec()
+            self._fh = open(self.path, "wb")
+            self._fh.write(_HEADER.pack(MAGIC, _CODEC_IDS[codec_name], _COMPRESSION_IDS[compression]))
+            index_mode = "w"  # a new segment: drop any index left over from an earlier one
+        self.codec, self.compression = codec_name, compression
+        self._encode = codec(codec_name)[0]
+        self._offset = self._fh.tell()
+        self._index = open(str(self.path) + INDEX_SUFFIX, index_mode, encoding="utf-8")
+        self.records = 0
+
+    def location(self, key: str) -> str:
+        return f"{self.path}#{key}"
+
+    def write(self, key: str, state: Dict[str, Any]) -> None:
+        payload = self._encode(state)
+        if self.compression == "zlib":
+            payload = zlib.compress(payload, self.level)
+        k = key.encode("utf-8")
+        with self._lock:
+            self._fh.write(_RECORD.pack(len(k), len(payload)))
+            self._fh.write(k)
+            self._fh.write(payload)
+            start = self._offset + _RECORD.size + len(k)
+            self._offset = start + len(payload)
+            self._index.write(json.dumps([key, start, len(payload)]) + "\n")
+            self.records += 1
+
+    def flush(self) -> None:
+        # Segment before index; readers also ignore entries past the end of the data
+        with self._lock:
+            self._fh.flush()
+            self._index.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._fh.closed:
+                self._fh.close()
+                self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_header(path: Path) -> Tuple[str, Optional[str]]:
+    with open(path, "rb") as fh:
+        raw = fh.read(_HEADER.size)
+    if len(raw) < _HEADER.size:
+        raise ValueError(f"{path} is not a snapshot segment (truncated header)")
+    magic, codec_id, compression_id = _HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a snapshot segment")
+    codecs = {v: k for k, v in _CODEC_IDS.items()}
+    compressions = {v: k for k, v in _COMPRESSION_IDS.items()}
+    return codecs[codec_id], compressions[compression_id]
+
+
+def _repair(path: Path) -> None:
+    """Before appending: drop a torn trailing record and rewrite a stale index."""
+    reader = SegmentReader(str(path))
+    if not reader.stale:
+        return
+    with open(path, "r+b") as fh:
+        fh.truncate(reader.end)
+    with open(str(path) + INDEX_SUFFIX, "w", encoding="utf-8") as fh:
+        for key, (start, length) in reader._index.items():
+            fh.write(json.dumps([key, start, length]) + "\n")
+
+
+class SegmentReader:
+    """Random access to the snapshots in a segment file, by key."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.codec, self.compression = _read_header(self.path)
+        self._decode = codec(self.codec)[1]
+        self._index: Dict[str, Tuple[int, int]] = {}
+        # End of the last complete record; `stale` if the index file missed any
+        self.end = _HEADER.size
+        self.stale = False
+        self._load_index()
+
+    def _load_index(self) -> None:
+        index_path = Path(str(self.path) + INDEX_SUFFIX)
+        size = self.path.stat().st_size
+        if index_path.exists():
+            with open(index_path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        key, start, length = json.loads(line)
+                    except ValueError:
+                        break  # torn last line; the scan below picks the record up
+                    if start + length > size:
+                        break
+                    self._index[key] = (start, length)
+                    self.end = max(self.end, start + length)
+        if self.end < size:
+            self.stale = True
+            self._scan(size)
+
+    def _scan(self, size: int) -> None:
+        offset = self.end
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            while offset + _RECORD.size <= size:
+                key_len, length = _RECORD.unpack(fh.read(_RECORD.size))
+                start = offset + _RECORD.size + key_len
+                if start + length > size:
+                    break  # partial record at the end
+                key = fh.read(key_len).decode("utf-8")
+                self._index[key] = (start, length)
+                fh.seek(length, os.SEEK_CUR)
+                offset = start + length
+        self.end = offset
+
+    def keys(self):
+        return self._index.keys()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, key: str) -> Dict[str, Any]:
+        """The latest snapshot for `key`; KeyError if there is none."""
+        start, length = self._index[key]
+        with open(self.path, "rb") as fh:
+            fh.seek(start)
+            return self._payload(fh.read(length))
+
+    def _payload(self, data: bytes) -> Dict[str, Any]:
+        if self.compression == "zlib":
+            data = zlib.decompress(data)
+        return self._decode(data)
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(key, latest snapshot) pairs, in segment order."""
+        with open(self.path, "rb") as fh:
+            for key, (start, length) in sorted(self._index.items(), key=lambda kv: kv[1][0]):
+                fh.seek(start)
+                yield key, self._payload(fh.read(length))
+
+
+def snapshot_writer(path: Optional[str] = None, template: str = "state_{thread_id}.json",
+                    compression: Optional[str] = None):
+    """A segment writer for paths ending in .seg, else a JSON file writer."""
+    if path is not None and path.endswith(SEGMENT_SUFFIX):
+        return SegmentSnapshotWriter(path, compression=compression)
+    return JsonSnapshotWriter(path, template)
+
+
+_writer = None
+
+
+def set_snapshot_writer(writer) -> None:
+    """Route every `save_snapshot` in this process to `writer` (None restores the default)."""
+    global _writer
+    _writer = writer
+
+
+def get_snapshot_writer():
+    return _writer
+
+
+def save_snapshot(state: Dict[str, Any], key: str, path: Optional[str] = None,
+                  template: str = "state_{thread_id}.json", compression: Optional[str] = None) -> str:
+    """Persist one snapshot; returns where it went.
+
+    Uses the writer installed with `set_snapshot_writer` if there is one,
+    otherwise a one-off writer for `path` (see `snapshot_writer`).
+    """
+    if _writer is not None:
+        _writer.write(key, state)
+        return _writer.location(key)
+    with snapshot_writer(path, template, compression) as writer:
+        writer.write(key, state)
+        return writer.location(key)
+
+
+def load_snapshot(path: str, key: Optional[str] = None) -> Dict[str, Any]:
+    """Read a snapshot back: `key`'s record from a segment, or a JSON file."""
+    if path.endswith(SEGMENT_SUFFIX):
+        if key is None:
+            raise ValueError("a key (thread id) is needed to read from a segment")
+        return SegmentReader(path).get(key)
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser(description="List the keys in a snapshot segment, or print one snapshot")
+    p.add_argument("path", help="segment (.seg) or JSON snapshot file")
+    p.add_argument("key", nargs="?", help="thread id to print (default: list keys)")
+    args = p.parse_args()
+    if args.key is None and args.path.endswith(SEGMENT_SUFFIX):
+        for k in SegmentReader(args.path).keys():
+            print(k)
+    else:
+        print(json.dumps(load_snapshot(args.path, args.key), indent=2, ensure_ascii=False))